@@ -0,0 +1,81 @@
+#
+# File: bench_preprocessor.py
+#
+# Description: Benchmark of building the preprocessor tree (the
+#   PresentationPreprocessor only, no slides are created). Prints the
+#   elements plus attributes of each input processed per second.
+#
+# Example: python bench/bench_preprocessor.py
+#
+
+# The python XML parser is used, as when building a presentation
+import sys
+sys.modules["_elementtree"] = None
+
+import tempfile
+import xml.etree.ElementTree as ET
+
+import common
+
+def attribute_slides(num=2000):
+    # Slides with a table of 4x4 cells that have 3 attributes each
+    cell = '<cell a="1" b="2" c="3">x</cell>'
+    row = "<row>{}</row>".format(cell * 4)
+
+    return ['<slide layout="1content"><title>Slide {}</title>'\
+            '<content type="table">{}</content></slide>\n'.format(i, row * 4)
+            for i in range(num)]
+
+def text_slides(num=3000):
+    # Slides with a title and a list of 5 items with sub-items
+    item = "<item>Item text<item>Sub-item text</item></item>"
+
+    return ['<slide layout="1content"><title>Slide {}</title>'\
+            '<content>{}</content></slide>\n'.format(i, item * 5)
+            for i in range(num)]
+
+def nested_list(depth=3000):
+    # Slide with a list nested depth items deep
+    return ['<slide layout="1content"><title>Nested</title><content>{}'\
+            '{}</content></slide>\n'.format("<item>Item" * depth,
+                "</item>" * depth)]
+
+INPUTS = [
+    ("2000 slides, 3 attributes per cell", attribute_slides),
+    ("3000 text slides", text_slides),
+    ("list nested 3000 items deep", nested_list),
+]
+
+def count_nodes(path):
+    # Number of elements plus attributes of the input (without recursion,
+    # the nested list is deeper than the recursion limit)
+    count = 0
+    stack = [ET.parse(str(path)).getroot()]
+    while len(stack) > 0:
+        elem = stack.pop()
+        count += 1 + len(elem.attrib)
+        stack.extend(elem)
+
+    return count
+
+def main():
+    args = common.parse_arguments("Benchmark the preprocessor tree builder")
+    module = common.load(args.script)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for i,(name,slides) in enumerate(INPUTS):
+            path = common.write_deck(tmp, "input{}".format(i), slides())
+            nodes = count_nodes(path)
+
+            try:
+                seconds = common.best_time(lambda:
+                        module.PresentationPreprocessor(str(path)),
+                        args.repeat)
+            except RecursionError:
+                print("{:40} RecursionError".format(name))
+                continue
+
+            print("{:40} {:6.0f} k/s".format(name, nodes / seconds / 1000))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#
+# File: bench_tables.py
+#
+# Description: Benchmark of table placeholders. Builds decks of 5 slides
+#   with a table of plain-text cells (50 rows of 40 cells and 500 rows of
+#   20 cells) and prints the build time of each deck.
+#
+#   Versions that filled tables through the cell proxies of python-pptx
+#   take about 10 minutes for the 500 x 20 deck.
+#
+# Example: python bench/bench_tables.py
+#
+
+import tempfile
+
+import common
+
+SIZES = [(50, 40), (500, 20)]
+
+def table_slides(num_row, num_col, num=5):
+    # Slides with a table of num_row x num_col plain-text cells
+    rows = "".join("<row>{}</row>".format("".join("<cell>{}.{}</cell>"\
+            "".format(r, c) for c in range(num_col))) for r in range(num_row))
+
+    return ['<slide layout="1content"><title>Table {}</title>'\
+            '<content type="table">{}</content></slide>\n'.format(i, rows)
+            for i in range(num)]
+
+def main():
+    args = common.parse_arguments("Benchmark decks with large tables")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for num_row,num_col in SIZES:
+            path = common.write_deck(tmp, "table{}x{}".format(num_row,
+                num_col), table_slides(num_row, num_col))
+            seconds = common.build(args.script, path, args.repeat)[0]
+
+            print("{:3} x {:2} cells {:8.2f} s".format(num_row, num_col,
+                seconds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#
+# File: bench_text.py
+#
+# Description: Benchmark of text placeholders. Builds a text-heavy deck
+#   (400 slides, each with 15 get and text fragments in the content and a
+#   date and a prepend in the title) and prints the build time, the peak
+#   memory of the build and the size of the slide XML. Also times
+#   format_whitespace() on a 2000-line text.
+#
+#   Versions before text fragments were merged into one run pass bytes to
+#   run.text, so their build needs python-pptx older than 1.0.
+#
+# Example: python bench/bench_text.py
+#
+
+# The python XML parser is used, as when building a presentation
+import sys
+sys.modules["_elementtree"] = None
+
+import subprocess
+import tempfile
+import zipfile
+
+import common
+
+def text_slides(num=400):
+    # Slides with a title and content made of many text fragments
+    fragments = 'text <get var="word"/> ' * 7 + "end"
+
+    return ['<set var="word">variable</set>\n'] + [
+            '<slide layout="1content"><title prepend="word"> slide {} '\
+            '<date/></title><content>{}</content></slide>\n'.format(i,
+                fragments) for i in range(num)]
+
+def slide_xml_size(path):
+    # Size in bytes of the XML of the slides of a presentation
+    with zipfile.ZipFile(str(path)) as pptx:
+        return sum(info.file_size for info in pptx.infolist()
+                if info.filename.startswith("ppt/slides/slide"))
+
+def main():
+    args = common.parse_arguments("Benchmark a text-heavy deck")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = common.write_deck(tmp, "text", text_slides())
+        try:
+            seconds, path_output = common.build(args.script, path,
+                    args.repeat)
+        except subprocess.CalledProcessError:
+            print("build failed")
+        else:
+            print("build time       {:8.2f} s".format(seconds))
+            print("peak RSS         {:8.0f} MB".format(common.peak_rss()))
+            print("slide XML        {:8.0f} KB".format(
+                slide_xml_size(path_output) / 1024))
+
+    # Indented text of 2000 lines, as the text of an element
+    module = common.load(args.script)
+    text = "\n" + "".join("    line {} of the text\n".format(i)
+            for i in range(2000)) + "  "
+    seconds = common.best_time(lambda: module.format_whitespace(text),
+            args.repeat * 10)
+
+    print("format_whitespace {:7.2f} ms".format(seconds * 1000))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#
+# File: common.py
+#
+# Description: Code shared by the benchmark drivers. Each driver generates
+#   its input decks, times them with a version of pptx-creator.py and
+#   prints the results. To get the numbers before a change, run the
+#   driver with the version of the parent commit, e.g.
+#
+#     git show <commit>~1:pptx-creator.py > /tmp/before.py
+#     python bench/bench_tables.py --script /tmp/before.py
+#     python bench/bench_tables.py
+#
+
+import argparse
+import importlib.util
+import pathlib
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+SCRIPT = ROOT / "pptx-creator.py"
+TEMPLATE = "test/templates/blank"
+
+# Run pptx-creator.py with the python XML parser, which records the line
+# numbers of the input elements (see the top of pptx-creator.py)
+RUN = """
+import runpy
+import sys
+
+sys.modules["_elementtree"] = None
+sys.argv = {argv!r}
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+def parse_arguments(description):
+    # Parse the arguments common to the drivers
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--script", default=str(SCRIPT),
+        help="version of pptx-creator.py to benchmark (default: the one "\
+        "of this repository)")
+    parser.add_argument("--repeat", type=int, default=3,
+        help="number of runs of each benchmark, the best run is reported "\
+        "(default: %(default)s)")
+
+    return parser.parse_args()
+
+def load(script):
+    # Load a version of pptx-creator.py as a module, the caller must set
+    # sys.modules["_elementtree"] = None before ElementTree is imported
+    spec = importlib.util.spec_from_file_location("pptx_creator",
+            str(script))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+def write_deck(tmp, name, slides):
+    # Write an input file with the slides, returns its path
+    path = pathlib.Path(tmp, name + ".xml")
+    path.write_text('<?xml version="1.0"?>\n<presentation>\n{}'\
+            '</presentation>\n'.format("".join(slides)))
+
+    return path
+
+def best_time(func, repeat):
+    # Best wall time in seconds of calling func repeat times
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+def build(script, path_input, repeat):
+    # Build the input with the script in a new process, returns the best
+    # build time in seconds and the path of the output
+    path_output = path_input.with_suffix(".pptx")
+    args = [sys.executable, "-c", RUN.format(argv=[str(script), "-t",
+        TEMPLATE, "-o", str(path_output), str(path_input)])]
+
+    def run():
+        subprocess.run(args, cwd=str(ROOT), stdout=subprocess.DEVNULL,
+                check=True)
+
+    return best_time(run, repeat), path_output
+
+def peak_rss():
+    # Largest peak resident set size of the builds so far, in MB
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
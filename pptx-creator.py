@@ -34,17 +34,26 @@
 import sys
 #sys.modules['_elementtree'] = None
 
-import openpyxl # Import data from xlsx files
-from pptx import Presentation
-from pptx.enum.action import PP_ACTION
-from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+# python-pptx, openpyxl (xlsx imports) and csv (csv imports) are imported
+# where they are used, so startup (e.g. --help, cache operations or decks
+# without imports) doesn't pay for loading modules that aren't needed
 import xml.etree.ElementTree as ET
 import datetime
 import os
 import re
 import argparse
 
-import csv      # Import data from csv files
+import concurrent.futures
+import copy
+import hashlib
+import io
+import itertools
+import json
+import marshal
+import tempfile
+import threading
+import time
+import zlib
 
 try:
     import pathlib
@@ -53,14 +62,214 @@ except ImportError:
 
 def main():
     # Parse arguments to get paths
-    path_input, path_output, path_xml, path_pptx = parse_arguments()
+    builds, path_xml, path_pptx, args = parse_arguments()
+
+    # Open persistent cache
+    disk_cache = None
+    if args.cache_dir:
+        disk_cache = DiskCache(args.cache_dir,
+                max_size=int(args.cache_size * 1024 * 1024))
+
+    # Perform cache operations without creating a presentation
+    if args.cache_stats or args.cache_prune:
+        if disk_cache is None:
+            raise ValueError("--cache-dir must be specified to show stats "\
+                    "or prune the cache")
+
+        if args.cache_prune:
+            removed = disk_cache.prune()
+            print("Removed {} cache entries.".format(removed))
+
+        if args.cache_stats:
+            print_cache_stats(disk_cache)
+
+        return
+
+    # Create many presentations with the same template
+    if len(builds) > 1 or args.batch:
+        failed = create_batch(builds, path_pptx, path_xml, args)
+        if failed > 0:
+            sys.exit(1)
+        return
+
+    path_input, path_output = builds[0]
+
+    # Create presentation (the template is compiled by the first build)
+    pc = PresentationCreator(path_pptx, path_xml, disk_cache=disk_cache,
+            jobs=args.jobs, image_dpi=args.image_dpi,
+            incremental=args.incremental, stream=args.stream)
+
+    if args.watch:
+        watch_presentation(pc, path_input, path_output,
+                interval=args.watch_interval)
+    else:
+        pc.create_presentation(path_input, path_output)
+
+# Presentation creator used by each batch worker process
+batch_creator = None
+
+# Create presentations for a list of (input, output) paths
+def create_batch(builds, path_pptx, path_xml, args):
+    jobs = max(1, min(args.jobs, len(builds)))
+
+    # Build in this process (using threads to load data) or spread
+    # presentations over processes that each build one at a time
+    creator_args = (path_pptx, path_xml, args.cache_dir, args.cache_size,
+            args.jobs if jobs == 1 else 1, args.image_dpi, args.incremental,
+            args.stream)
+
+    # Error message of each build (None when it succeeded)
+    errors = [None] * len(builds)
+    if jobs == 1:
+        init_batch_worker(*creator_args)
+        for i,(path_input,path_output) in enumerate(builds):
+            errors[i] = create_batch_presentation(path_input, path_output)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs,
+                initializer=init_batch_worker, initargs=creator_args) \
+                as executor:
+            futures = {executor.submit(create_batch_presentation, path_input,
+                path_output): i
+                for i,(path_input,path_output) in enumerate(builds)}
+
+            for future in concurrent.futures.as_completed(futures):
+                # Worker process failed (e.g. it was killed)
+                try:
+                    errors[futures[future]] = future.result()
+                except Exception as err:
+                    errors[futures[future]] = format_error(err)
 
-    # Interpret template xml file
-    template = get_template(path_xml)
+    failed = [(builds[i][0],error) for i,error in enumerate(errors) if error]
+
+    print("\nBatch complete: {} of {} presentations created."\
+            "".format(len(builds) - len(failed), len(builds)))
+
+    if len(failed) > 0:
+        print("\nFailed Inputs: ")
+        for path,error in failed:
+            print("  " + str(path))
+            for line in error.splitlines():
+                print("    " + line)
+
+    return len(failed)
+
+# Create the presentation creator of a batch worker, each worker keeps the
+# template and parsed import data for all presentations it creates
+def init_batch_worker(path_pptx, path_xml, cache_dir, cache_size, jobs,
+        image_dpi, incremental, stream):
+    global batch_creator
+
+    disk_cache = None
+    if cache_dir:
+        disk_cache = DiskCache(cache_dir,
+                max_size=int(cache_size * 1024 * 1024))
+
+    batch_creator = PresentationCreator(path_pptx, path_xml,
+            disk_cache=disk_cache, jobs=jobs, image_dpi=image_dpi,
+            incremental=incremental, stream=stream)
+
+# Create one presentation of a batch, returns error message when it fails
+# (any error only fails this presentation, not the rest of the batch)
+def create_batch_presentation(path_input, path_output):
+    try:
+        batch_creator.create_presentation(path_input, path_output)
+    except Exception as err:
+        return format_error(err)
+
+    return None
+
+# Get error message of an exception, unexpected errors include their type
+def format_error(err):
+    if isinstance(err, (ValueError, ET.ParseError, IOError, OSError)):
+        return str(err) or repr(err)
+
+    return "{}: {}".format(type(err).__name__, err)
+
+# Rebuild presentation whenever the input, template or sources change
+def watch_presentation(pc, path_input, path_output, interval=1.0):
+    template_stamps = get_file_stamps([pc.path_xml, pc.path_pptx])
+
+    try:
+        while True:
+            start = time.time()
 
-    # Create presentation
-    pc = PresentationCreator(path_pptx, template)
-    pc.create_presentation(path_input, path_output)
+            try:
+                # Reload template mapping when the template files changed
+                stamps = get_file_stamps([pc.path_xml, pc.path_pptx])
+                if stamps != template_stamps:
+                    pc.template = None
+                    template_stamps = stamps
+
+                pc.create_presentation(path_input, path_output)
+
+            except (ValueError, ET.ParseError, IOError, OSError) as err:
+                print("\nERROR: {}\n".format(err))
+
+            # Other errors (e.g. an input that is being saved) also only
+            # fail this build, the watcher keeps its caches and continues
+            except Exception:
+                import traceback
+
+                print()
+                traceback.print_exc(file=sys.stdout)
+                print()
+
+            else:
+                print("Build time: {:.2f} s".format(time.time() - start))
+
+            # Watch files used by the last successful build
+            paths = [path_input, pc.path_xml, pc.path_pptx]
+            paths += sorted(pc.source_paths)
+            stamps = get_file_stamps(paths)
+
+            print("Watching {} files for changes (Ctrl-C to exit)"\
+                    "".format(len(paths)))
+
+            while get_file_stamps(paths) == stamps:
+                time.sleep(interval)
+
+    except KeyboardInterrupt:
+        pass
+
+# Replace control characters (other than tab and line feed), which aren't
+# allowed in XML, with their plain-text escape (e.g. "_x0007_" for BEL) as
+# python-pptx does when setting the text of a run
+def escape_ctrl_chars(text):
+    return re.sub(r"[\x00-\x08\x0B-\x1F]",
+            lambda match: "_x{:04X}_".format(ord(match.group(0))), text)
+
+# Get modification time and size of files (None when a file doesn't exist)
+def get_file_stamps(paths):
+    stamps = []
+    for path in paths:
+        try:
+            stat = os.stat(str(path))
+        except (IOError, OSError):
+            stamps.append(None)
+        else:
+            stamps.append((stat.st_mtime, stat.st_size))
+
+    return stamps
+
+# Print statistics of the persistent cache
+def print_cache_stats(disk_cache):
+    stats = disk_cache.stats()
+
+    print("Cache directory: {}".format(disk_cache.path))
+
+    total_count = 0
+    total_size = 0
+    for namespace in sorted(stats):
+        count, size = stats[namespace]
+        total_count += count
+        total_size += size
+
+        print("  {:<12} {:>8} entries {:>10.1f} MB"\
+                "".format(namespace, count, size / 1024.0 / 1024.0))
+
+    print("  {:<12} {:>8} entries {:>10.1f} MB (limit {:.1f} MB)"\
+            "".format("total", total_count, total_size / 1024.0 / 1024.0,
+                disk_cache.max_size / 1024.0 / 1024.0))
 
 # Parse input arguments
 def parse_arguments():
@@ -72,7 +281,10 @@ def parse_arguments():
         " definition file and a template. A template consists of a template" \
         " pptx file and a template xml file, both of which typically reside" \
         " in a template directory.")
-    parser.add_argument("input",  help="xml definition file")
+    parser.add_argument("input",  nargs="*",
+        help="xml definition file(s), more than one file creates each "\
+        "presentation in batch mode (use input.xml:output.pptx to set the "\
+        "output file of an input)")
     parser.add_argument("-o", "--output", help="pptx output file")
     parser.add_argument("-t", "--template",
         help="template directory, containing pptx and xml files, "\
@@ -84,31 +296,119 @@ def parse_arguments():
     parser.add_argument("-x", "--xml",
         help="template xml file (overrides location of xml from --template)")
     parser.add_argument("-v", "--verbose", action="store_true")
+    parser.add_argument("-j", "--jobs", type=int,
+        default=min(8, os.cpu_count() or 1),
+        help="number of threads used to load import files and images "\
+        "(default: %(default)s)")
+    parser.add_argument("--image-dpi", type=int,
+        help="downscale images to the size of their placeholder at this "\
+        "resolution (e.g. 150) instead of embedding the original file")
+    parser.add_argument("-i", "--incremental", action="store_true",
+        help="only rebuild slides that changed since the previous build, "\
+        "unchanged slides are copied from the existing output file "\
+        "(fingerprints are stored in <output>.manifest)")
+    parser.add_argument("-s", "--stream", action="store_true",
+        help="create each slide as soon as it is read from the input xml "\
+        "file, so memory used for the input doesn't grow with the number "\
+        "of slides (can't be used with --incremental)")
+    parser.add_argument("-b", "--batch",
+        help="file listing xml definition files to create in batch mode, "\
+        "one input or input.xml:output.pptx per line (lines starting with "\
+        "# are ignored)")
+    parser.add_argument("-w", "--watch", action="store_true",
+        help="keep running and rebuild the presentation whenever the "\
+        "input, template or any imported file or image changes")
+    parser.add_argument("--watch-interval", type=float, default=1.0,
+        help="seconds between checks for changed files in watch mode "\
+        "(default: %(default)s)")
+    parser.add_argument("--cache-dir",
+        help="directory of persistent cache used to store parsed import "\
+        "files between runs")
+    parser.add_argument("--cache-size", type=float, default=1024,
+        help="maximum size of persistent cache in MB, least recently used "\
+        "entries are removed (default: %(default)s)")
+    parser.add_argument("--cache-stats", action="store_true",
+        help="show statistics of persistent cache and exit")
+    parser.add_argument("--cache-prune", action="store_true",
+        help="remove least recently used entries until persistent cache is "\
+        "smaller than --cache-size and exit (use --cache-size 0 to clear)")
     args = parser.parse_args()
 
+    # No paths needed for cache operations
+    if args.cache_stats or args.cache_prune:
+        return None, None, None, args
+
+    # Get input files from arguments and batch file
+    filenames_input = list(args.input)
+
+    if args.batch:
+        with open(args.batch, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    filenames_input.append(line)
+
+    if len(filenames_input) == 0:
+        parser.error("the following arguments are required: input")
+
+    if args.stream and args.incremental:
+        parser.error("--incremental cannot be used with --stream")
+
+    if len(filenames_input) > 1 or args.batch:
+        if args.output:
+            parser.error("--output cannot be used in batch mode, use "\
+                    "input.xml:output.pptx to set output files")
+        if args.watch:
+            parser.error("--watch cannot be used in batch mode")
+
     # Get arguments
     verbose           = args.verbose
-    filename_input    = args.input
     filename_output   = args.output
     filename_template = args.template
     filename_pptx     = args.pptx
     filename_xml      = args.xml
 
-    # Get pathlib object for input
-    path_input = pathlib.Path(filename_input)
+    builds = []
+    for filename_input in filenames_input:
+        # Split input.xml:output.pptx (only when output is a pptx file, so
+        # paths containing a colon are not split)
+        filename, sep, filename_pair = filename_input.rpartition(":")
+        if sep and filename and filename_pair.endswith(".pptx"):
+            filename_input = filename
+            if not filename_output:
+                filename_output = filename_pair
+
+        # Get pathlib object for input
+        path_input = pathlib.Path(filename_input)
+
+        if verbose:
+            print("INFO: Input path " + str(path_input) + ".")
+
+        # Get pathlib object for output
+        if (filename_output):
+            path_output = pathlib.Path(filename_output)
+        else:
+            # Path to output file with same name as input file in pwd
+            path_output = path_input.with_suffix('.pptx').name
 
-    if verbose:
-        print("INFO: Input path " + str(path_input) + ".")
+        if verbose:
+            print("INFO: Output path " + str(path_output) + ".")
 
-    # Get pathlib object for output
-    if (filename_output):
-        path_output = pathlib.Path(filename_output)
-    else:
-        # Path to output file with same name as input file in pwd
-        path_output = path_input.with_suffix('.pptx').name
+        builds.append((path_input, path_output))
+        filename_output = None
 
-    if verbose:
-        print("INFO: Output path " + str(path_output) + ".")
+    # Inputs with the same output would overwrite each other's output (or
+    # be written at the same time by batch workers)
+    outputs = {}
+    for path_input,path_output in builds:
+        outputs.setdefault(os.path.abspath(str(path_output)), []).append(
+                str(path_input))
+
+    for path_output,inputs in outputs.items():
+        if len(inputs) > 1:
+            parser.error("inputs {} have the same output file {}, use "\
+                    "input.xml:output.pptx to set output files"\
+                    "".format(", ".join(inputs), path_output))
 
     # Get pathlib object for template
     if (filename_template):
@@ -157,7 +457,7 @@ def parse_arguments():
     if verbose:
         print("INFO: PPTX template path " + str(path_pptx) + ".")
 
-    return path_input, path_output, path_xml, path_pptx
+    return builds, path_xml, path_pptx, args
 
 # Get template mapping from xml file
 def get_template(path_xml):
@@ -166,24 +466,23 @@ def get_template(path_xml):
     # Open xml template definition file
     xml_template = ET.parse(str(path_xml))
 
-    # Create map from child (c) to parent (p)
-    xml_parents = {c:p for p in xml_template.iter() for c in p}
-
     template_idx = -1
     layout_idx = -1
     ph_idx = -1
 
-    # Iterate over xml elements to create template
-    for xml_elem in xml_template.iter():
+    # Iterate over xml elements (in document order) with their parents
+    stack = [(xml_template.getroot(), None)]
+    while len(stack) > 0:
+        xml_elem, xml_parent = stack.pop()
+        stack.extend((child, xml_elem) for child in reversed(xml_elem))
+
+        parent_tag = None if xml_parent is None else xml_parent.tag
+
         if (xml_elem.tag == 'template'):
             template_idx += 1
 
             # Ensure template has no parent
-            try:
-                xml_parents[xml_elem]
-            except KeyError:
-                pass
-            else:
+            if (xml_parent is not None):
                 raise ValueError("Template should be top level element!")
 
             if (template_idx > 0):
@@ -202,11 +501,11 @@ def get_template(path_xml):
                     "template file {}"\
                     "".format(layout_idx, str(path_xml)))
 
-            if (xml_parents[xml_elem].tag != 'template'):
+            if (parent_tag != 'template'):
                 raise ValueError("Layout \"{}\" ({}) has parent node "\
                     "\"{}\" and should have parent node \"template\" in xml "\
                     " template file {}"\
-                    "".format(layout_idx, layout, xml_parents[xml_elem].tag,
+                    "".format(layout_idx, layout, parent_tag,
                         str(path_xml)))
 
             if (not index):
@@ -231,12 +530,11 @@ def get_template(path_xml):
                     "missing name attribute in xml template file {}"\
                     "".format(ph_idx, layout_idx, layout, str(path_xml)))
 
-            if (xml_parents[xml_elem].tag != 'layout'):
+            if (parent_tag != 'layout'):
                 raise ValueError("Placeholder \"{}\" ({}) has parent node "\
                     "\"{}\" and should have parent node \"layout\" in xml "\
                     " template file {}"\
-                    "".format(ph_idx, ph, xml_parents[xml_elem].tag,
-                        str(path_xml)))
+                    "".format(ph_idx, ph, parent_tag, str(path_xml)))
 
             if (not index):
                 raise ValueError("Placeholder \"{}\" ({}) in layout \"{}\" "\
@@ -257,6 +555,72 @@ def get_template(path_xml):
 
     return template
 
+# Get template mapping validated against the template pptx file (prs is the
+# Presentation opened from it, which is only opened here when not given), the
+# compiled template is stored in the disk cache keyed by the SHA1 of both
+# template files so later runs don't need to parse either file
+def compile_template(path_xml, path_pptx, disk_cache=None, prs=None):
+    key = None
+    if disk_cache is not None:
+        # Version of the compiled template (change when its format changes)
+        key = [1]
+        for path in (path_xml, path_pptx):
+            with open(str(path), "rb") as f:
+                key.append(hashlib.sha1(f.read()).hexdigest())
+        key = tuple(key)
+
+        data = disk_cache.get("templates", key)
+        if data is not None:
+            template = DiskCache.decode(data)
+            if template is not None:
+                return template
+
+    if prs is None:
+        from pptx import Presentation
+
+        prs = Presentation(str(path_pptx))
+
+    template = get_template(path_xml)
+    validate_template(template, prs, path_xml)
+
+    if disk_cache is not None:
+        disk_cache.set("templates", key, DiskCache.encode(template))
+
+    return template
+
+# Ensure layouts and placeholders of template exist in the pptx file and add
+# the type and geometry of each placeholder to the template
+def validate_template(template, prs, path_xml):
+    for layout,layout_info in template.items():
+        if (layout_info["idx"] >= len(prs.slide_layouts)):
+            raise ValueError("Layout \"{}\" index {} not found in template "\
+                "pptx file, which has {} layouts (xml template file {})"\
+                "".format(layout, layout_info["idx"], len(prs.slide_layouts),
+                    str(path_xml)))
+
+        prs_layout = prs.slide_layouts[layout_info["idx"]]
+        layout_info["ph_info"] = {}
+
+        for ph,ph_idx in layout_info["ph"].items():
+            prs_ph = prs_layout.placeholders.get(idx=ph_idx)
+
+            if (prs_ph is None):
+                raise ValueError("Placeholder \"{}\" index {} not found in "\
+                    "layout \"{}\" ({}) of template pptx file, valid indexes "\
+                    "are {} (xml template file {})"\
+                    "".format(ph, ph_idx, layout, prs_layout.name,
+                        [p.placeholder_format.idx
+                            for p in prs_layout.placeholders],
+                        str(path_xml)))
+
+            layout_info["ph_info"][ph] = {
+                "type":   prs_ph.placeholder_format.type.name,
+                "left":   prs_ph.left,
+                "top":    prs_ph.top,
+                "width":  prs_ph.width,
+                "height": prs_ph.height,
+            }
+
 class PresentationCreator:
     """ The presentation creator class is used to create a pptx presentation.
 
@@ -268,10 +632,41 @@ class PresentationCreator:
 
     ph_types = {"text", "image", "table", "list"}
 
+    # Version of the incremental build manifest (change when the output of
+    # a slide changes for the same input)
+    manifest_version = 2
+
 
-    def __init__(self, path_pptx, template):
+    def __init__(self, path_pptx, path_xml, disk_cache=None, jobs=1,
+            image_dpi=None, incremental=False, stream=False):
         self.path_pptx   = path_pptx
-        self.template    = template
+        self.path_xml    = path_xml
+        self.disk_cache  = disk_cache
+        self.jobs        = jobs
+        self.image_dpi   = image_dpi
+        self.incremental = incremental
+        self.stream      = stream
+
+        # Parsed import sources and images, kept between builds so that
+        # rebuilds only load files that changed
+        self.import_cache = ImportCache(disk=self.disk_cache)
+        self.image_cache = ImageCache(disk=self.disk_cache)
+
+        # Images downscaled to the size of their placeholders
+        self.image_resampler = None
+        if self.image_dpi:
+            self.image_resampler = ImageResampler(self.image_dpi,
+                    disk=self.disk_cache)
+
+        # Template mapping (compiled by the first build, see
+        # compile_template()) and template pptx file data (loaded when first
+        # used or changed)
+        self.template = None
+        self.template_blob = None
+        self.template_stamp = None
+
+        # Import and image files used by the last build
+        self.source_paths = set()
 
     def create_presentation(self, path_input, path_output):
         """ Create pptx presentation
@@ -284,6 +679,8 @@ class PresentationCreator:
             path_output: path to save pptx file
         """
 
+        from pptx import Presentation
+
         self.invalid_images = []
         self.invalid_imports = {}
 
@@ -291,16 +688,58 @@ class PresentationCreator:
         self.output = path_output
 
         # Create presentation
-        self.prs = Presentation(str(self.path_pptx))
+        self.prs = Presentation(io.BytesIO(self._get_template_blob()))
+
+        # Compile the template against the presentation (when it isn't
+        # compiled yet or the template files changed)
+        if self.template is None:
+            self.template = compile_template(self.path_xml, self.path_pptx,
+                    disk_cache=self.disk_cache, prs=self.prs)
+
+        # Image parts in the presentation by SHA1 (added when first used)
+        self.image_parts = None
+
+        # Geometry of placeholders by layout and placeholder name
+        self.ph_geometry = {}
+
+        # Slide links added after all slides are created (when streaming)
+        self.pending_refs = None
+
+        self.fingerprints = None
+        self.reuse = {}
 
-        # Process the input xml file
-        self.ppp = PresentationPreprocessor(str(self.input))
+        # Number of slides created for each slide (with the continuation
+        # slides of paginated tables) by index of the slide
+        self.page_counts = {}
 
-        # Create slides and define slide references
-        self._initialize_slides(self.prs, self.ppp.get_root())
+        # Create slides while the input xml file is parsed
+        if self.stream:
+            self._stream_slides(self.prs)
 
-        # Process slides and fill fields
-        self._process_slides(self.prs, self.ppp.get_root())
+        else:
+            # Process the input xml file
+            self.ppp = PresentationPreprocessor(str(self.input),
+                    import_cache=self.import_cache)
+            root_entry = self.ppp.get_root()
+
+            # Create slides and define slide references
+            self._initialize_slides(self.prs, root_entry)
+
+            # Find files used by the slides
+            self.source_paths = self._find_source_paths(root_entry.data,
+                    self.layouts)
+            self.source_paths.update(self.ppp.import_paths)
+
+            # Find slides that are unchanged since the previous build
+            if self.incremental:
+                self.fingerprints = self._fingerprint_slides(root_entry)
+                self.reuse = self._find_reusable_slides(self.fingerprints)
+
+            # Load all import sources and images used by the slides
+            self._prefetch(root_entry)
+
+            # Process slides and fill fields
+            self._process_slides(self.prs, root_entry)
 
         # Report missing image paths
         if (len(self.invalid_images) > 0):
@@ -321,783 +760,3176 @@ class PresentationCreator:
 
         self.prs.save(str(self.output))
 
+        # Record slide fingerprints for the next incremental build
+        if self.fingerprints is not None:
+            self._write_manifest(self.fingerprints,
+                    [self.page_counts.get(i, 1)
+                        for i in range(len(self.fingerprints))])
+
+        # Close open import sources and drop sources of changed files
+        self.import_cache.release()
+
+        if self.incremental:
+            print("\nReused {} of {} slides from previous build."\
+                    "".format(len(self.reuse), len(self.slides)))
+
         print("\nPresentation created: {}\n".format(self.output))
 
-    def _initialize_slides(self, prs, root_entry):
-        """ Create empty slides and save references
+    def _prefetch(self, root_entry):
+        """ Load import sources and images before slides are created
 
-        Iterate through slide entries from the preprocessor and create
-        empty slides with the specified layouts and create a dictionary
-        of references for making links between slides. This must be
-        done before processing slides because all slides to be referenced
-        must be created before the link is added to a slide.
+        Find every import source and image referenced by the slides and
+        load them concurrently (using self.jobs threads) into the import and
+        image caches, so that filling the slides only uses data that is
+        already loaded. Only small spreadsheets are loaded whole, the
+        keyed imports of large files are read together in one pass over
+        each sheet. Imports without keys of files above the stream size of
+        the ImportCache are not prefetched, they are streamed when their
+        <import> element is processed. When images are downscaled, they are
+        resampled to the size of their placeholders in a process pool once
+        they are loaded.
+
+        Errors of missing or invalid sources are ignored here, they are
+        reported when the imports and images are processed.
 
         Args:
-            prs: Presentation object where slides will be created
             root_entry: root PreprocessorEntry object containing input tree
 
         """
 
-        # Initialize data structures
-        self.slides      = []
-        self.layouts     = []
-        self.refs        = {}
+        imports = []
+        images = {}
 
-        # Iterate through slides
+        # Sources of slides copied from the previous build are not needed
         for i,slide in enumerate(root_entry.data):
-            # Get slide layout
-            layout_vals = slide.get_values(tag="layout", join=True)
+            if i not in self.reuse:
+                self._find_sources(slide, self.layouts[i], imports, images)
+
+        # Group imports by file and sheet, so each file is opened by one
+        # thread
+        sources = {}
+        for entry in imports:
+            filename = entry.get_values(join=True)
+            sheets = entry.get_values(tag="sheet", join=True)
+
+            sheet = sheets[0] if len(sheets) > 0 else None
+            sources.setdefault(filename, {}).setdefault(sheet, []).append(
+                    entry)
+
+        import csv
+        import zipfile
+
+        # Errors of invalid sources, which are reported when the data is
+        # used (any other error is a bug and is raised)
+        source_errors = (ValueError, KeyError, IndexError, IOError, OSError,
+                csv.Error, zipfile.BadZipFile)
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, self.jobs)) as executor:
+            futures = [executor.submit(self._prefetch_import, filename, sheets)
+                    for filename,sheets in sources.items()]
+            futures += [executor.submit(self.image_cache.get, path)
+                    for path in images]
+
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    future.result()
+                except source_errors:
+                    pass
 
-            if (len(layout_vals) > 1):
-                raise ValueError("slide may only have one layout attribute"\
-                        "\n{}".format(self.ppp.error_info(slide)))
+        if self.image_resampler is None:
+            return
 
-            # Add layout to list and remove layout entry from slide
-            self.layouts.append(layout_vals[0])
-            slide.remove(tag="layout")
+        # Resample images to the size of each placeholder they are used in
+        resample = []
+        for path,placeholders in images.items():
+            image = self.image_cache.get(path)
+            if image is None:
+                continue
 
-            # Ceate new slide with layout
-            prs_layout = prs.slide_layouts[self.template[layout_vals[0]]["idx"]]
-            self.slides.append(prs.slides.add_slide(prs_layout))
+            for layout,ph in placeholders:
+                size = self._get_layout_ph_size(layout, ph)
+                if size is not None:
+                    resample.append((image, size[0], size[1]))
 
-            # Get slide reference label
-            label_vals = slide.get_values(tag="label", join=True)
+        self.image_resampler.prefetch(resample, jobs=self.jobs)
 
-            # Reference label points to current slide and remove label entry
-            if (len(label_vals) == 1):
-                self.refs[label_vals[0]] = self.slides[-1]
-                slide.remove(tag="label")
-            elif (len(label_vals) > 1):
-                raise ValueError("slide may only have one label attribute"\
-                        "\n{}".format(self.ppp.error_info(slide)))
+    def _get_template_blob(self):
+        """ Get data of the template pptx file
 
+        The file is only read again when it changed since it was last read.
 
-    def _process_slides(self, prs, root_entry):
-        """ Add data to the slides that were previously created
+        Return:
+            bytes of the template pptx file
 
-        Iterate through slide entries from the preprocessor and add
-        information to the slides created by the _initiliaze_slides
-        subroutine. This must be done is two steps because slides to be
-        referenced through links must be created before the links to
-        that slide is created.
+        """
+
+        stat = os.stat(str(self.path_pptx))
+        stamp = (stat.st_mtime, stat.st_size)
+
+        if self.template_blob is None or self.template_stamp != stamp:
+            with open(str(self.path_pptx), "rb") as f:
+                self.template_blob = f.read()
+            self.template_stamp = stamp
+
+        return self.template_blob
+
+    def _find_source_paths(self, slides, layouts):
+        """ Find paths of all import and image files used by the slides
 
         Args:
-            prs: Presentation object where slides will be created
-            root_entry: root PreprocessorEntry object containing input tree
+            slides: list of slide PreprocessorEntry objects
+            layouts: list of the layout names of the slides
+
+        Return:
+            set of paths of import and image files
 
         """
 
-        # Iterate through slides
-        for i,slide in enumerate(root_entry.data):
+        imports = []
+        images = {}
 
-            # Iterate through placeholders
-            for ph in slide.data:
-                # Ensure no value entries directly under slide
-                if (ph.which != "entry"):
-                    raise ValueError("slide may only contain placeholder"\
-                            "elements"\
-                            "\n{}".format(self.ppp.error_info(ph)))
+        for slide,layout in zip(slides, layouts):
+            self._find_sources(slide, layout, imports, images)
 
-                # Get placeholder from slide
-                try:
-                    ph_idx = self.template[self.layouts[i]]["ph"][ph.tag]
-                except KeyError:
-                    raise ValueError("placeholder \"{}\" not found in "\
-                            "template\n{}"\
-                            "".format(ph.tag, self.ppp.error_info(ph)))
-
-                self.cur_slide = self.slides[i]
-                prs_ph = self.slides[i].placeholders[ph_idx]
-
-                # Determine if placeholder has a type
-                type_vals = ph.get_values(tag="type", join=True)
-
-                if (len(type_vals) > 1):
-                    raise ValueError("placeholder may only have one type "\
-                            "attribute\n{}"\
-                            "".format(self.ppp.error_info(ph)))
-                else:
-                    # No type specified, find type elements under placeholder
-                    if (len(type_vals) == 0):
-                        found = 0
-                        for sub in ph.data:
-                            if (sub.which == "value"):
-                                continue
-
-                            # Determine if entry is a type element
-                            for t in self.ph_types:
-                                if (sub.tag == t):
-                                    ph = sub
-                                    type_vals.insert(0,t)
-                                    found += 1
-
-                        # No valid type found, assume data is text
-                        if (found == 0):
-                            type_vals.insert(0,"text")
-
-                        # Found more than one type, this is invalid
-                        elif (found > 1):
-                            raise ValueError("placeholder may only have one "\
-                                    "type\n{}".format(self.ppp.error_info(ph)))
-
-                    # Type was specified as an attribute of the placeholder
-                    else:
-                        # remove type entry from placeholder entry
-                        ph.remove(tag="type")
+        paths = set(images)
+        paths.update(entry.get_values(join=True) for entry in imports)
 
-                    # Ensure class has type function
-                    if (not hasattr(self, "_ph_" + type_vals[0])):
-                        raise ValueError("placeholder type \"{}\" is not "\
-                                "valid\n{}".format(type_vals[0],
-                                    self.ppp.error_info(ph)))
+        return paths
 
-                    # Call type function
-                    type_func = getattr(self, "_ph_" + type_vals[0])
-                    type_func(ph, prs_ph, self.slides[i])
+    def _find_sources(self, slide, layout, imports, images):
+        """ Find import and image sources used by a slide
 
-    def _prs_insert_text(self, entry, para, level, prs_object):
-        """ Add text to a shape
+        Args:
+            slide: slide PreprocessorEntry to search
+            layout: name of the slide layout
+            imports: list where import entries are appended
+            images: dictionary where each image path is added with the set
+                of (layout, placeholder) names where the image is used
 
-        Process text contained in the PreprocessorEntry and place it in the
-        prs_object containing a text_frame where the text should be inserted.
+        """
+
+        for ph in slide.data:
+            if ph.which != "entry":
+                continue
+
+            # Placeholders with the image type attribute
+            if ph.get_values(tag="type", join=True) == ["image"]:
+                images.setdefault(ph.get_values(join=True), set()).add(
+                        (layout, ph.tag))
+
+            stack = [ph]
+            while len(stack) > 0:
+                sub = stack.pop()
+
+                if sub.tag == "import":
+                    imports.append(sub)
+                elif sub.tag == "image":
+                    images.setdefault(sub.get_values(join=True), set()).add(
+                            (layout, ph.tag))
+
+                stack.extend(child for child in sub.data
+                        if child.which == "entry")
+
+    def _get_layout_ph_size(self, layout, ph):
+        """ Get the size of a placeholder from the template layout
 
         Args:
-            entry: PreprocessorEntry with text data
-            para: Paragraph index to insert text (used with lists)
-            level: indent level used to insert text (used with lists)
-            prs_object: presentation object with a text_frame where text is
-                to be inserted
+            layout: name of the layout in the template
+            ph: name of the placeholder in the layout
 
         Return:
-            highest paragraph index where text was inserted
+            (width, height) of the placeholder in EMU or None when the
+            layout or placeholder doesn't exist
 
         """
 
-        # Ensure there are enough paragraphs in textframe to get para index
-        while(len(prs_object.text_frame.paragraphs) < para + 1):
-            prs_object.text_frame.add_paragraph()
+        # Use geometry from the compiled template
+        try:
+            ph_info = self.template[layout]["ph_info"][ph]
+        except KeyError:
+            return None
 
-        prs_para = prs_object.text_frame.paragraphs[para]
-        prs_para.level = level
+        return ph_info["width"], ph_info["height"]
 
-        for sub in entry.data:
-            if (sub.which == "value"):
-                run = prs_para.add_run()
+    def _prefetch_import(self, filename, sheets):
+        """ Load import source into the import cache
 
-                # Try to handle unicode characters
-                try:
-                    run.text  = sub.value.encode('utf-8')
+        Small files are loaded whole. For large files, the data of the
+        imports with row or column keys is read for all of them in one
+        pass over each sheet (see ImportSpreadsheet.read_shared()), instead
+        of each import streaming the file and building its own key index.
 
-                # Convert all non-strings to strings
-                except AttributeError as err:
-                    run.text = str(sub.value)
+        Args:
+            filename: path to the import source
+            sheets: dictionary from the sheet names imported (None for the
+                active sheet) to the list of import entries of the sheet
 
-                continue
+        """
 
-            # Add date
-            if (sub.tag == "date"):
-                run = prs_para.add_run()
-                run.text = datetime.datetime.now().strftime("%B %d, %Y")
+        path = pathlib.Path(filename)
+        small = path.stat().st_size <= self.import_cache.stream_size
 
-            # Add link
-            elif (sub.tag == "link"):
-                run = prs_para.add_run()
-                run.text = sub.get_values(join=True)
+        if path.suffix == ".csv" and small:
+            self.import_cache.get(filename, "csv", ImportCSV.load,
+                    persist=True)
+            return
 
-                for sub_link in sub.data:
-                    if (sub_link.which == "value"):
-                        continue
+        if path.suffix == ".xlsx" and small:
+            for sheet in sheets:
+                importer = ImportXLSX(filename, sheet=sheet,
+                        cache=self.import_cache)
+                self.import_cache.get(filename, ("xlsx", sheet),
+                        importer.load_sheet, persist=True)
+            return
 
-                    if (sub_link.tag == "addr"):
-                        run.hyperlink.address = sub_link.get_values(join=True)
-                    elif (sub_link.tag == "ref"):
-                        ref_val = sub_link.get_values(join=True)
+        for entries in sheets.values():
+            importers = []
+            for entry in entries:
+                # Invalid imports are reported when they are used
+                try:
+                    importer = self._get_importer(entry)[0]
+                except ValueError:
+                    continue
 
-                        try:
-                            ref_slide = self.refs[ref_val]
-                        except KeyError as err:
-                            raise ValueError("link reference \"{}\""\
-                                    "not found.\n{}".format(ref_val, \
-                                    self.ppp.error_info(sub_link)))
+                if len(importer.row_keys) > 0 or len(importer.col_keys) > 0:
+                    importers.append(importer)
 
-                        rId = self.cur_slide.part.relate_to(ref_slide.part, RT.SLIDE)
-                        rPr = run._r.get_or_add_rPr()
+            if len(importers) > 0:
+                ImportSpreadsheet.read_shared(importers)
 
-                        hlinkClick = rPr.add_hlinkClick(rId)
-                        hlinkClick.set('action', 'ppaction://hlinksldjump')
+    def _get_manifest_path(self):
+        """ Get path of the incremental build manifest of the output """
 
-                    else:
-                        raise ValueError("invalid link attribute \"{}\"\n{}"\
-                                "".format(sub_link.tag, \
-                                          self.ppp.error_info(sub_link)))
+        return pathlib.Path(str(self.output) + ".manifest")
 
-            # Add list item by calling this function recursively
-            elif (sub.tag == "item"):
-                para = self._prs_insert_text(sub, para+1, level+1, prs_object)
+    def _fingerprint_build(self):
+        """ Get fingerprint of the settings shared by every slide
 
-            else:
-                raise ValueError("invalid \"{}\" entry in text placeholder."\
-                        "\n{}".format(sub.tag, self.ppp.error_info(sub)))
+        Covers the template pptx file, the template mapping and the options
+        that change the content of the slides. Slides are only reused when
+        this fingerprint is unchanged.
 
-        return para
+        Return:
+            SHA1 hex digest of the build settings
 
-    def _ph_list(self, entry, prs_ph, prs_slide):
-        """ Add list to the placeholder
+        """
 
-        Process list contained in the PreprocessorEntry and place it in the
-        prs_ph placeholder on the prs_slide slide.
+        sha1 = hashlib.sha1()
+        sha1.update(repr((self.manifest_version, self.template,
+            self.image_dpi)).encode("utf-8"))
+        sha1.update(self._get_template_blob())
+
+        return sha1.hexdigest()
+
+    def _fingerprint_slides(self, root_entry):
+        """ Get fingerprint of each slide
+
+        The fingerprint of a slide covers its entry tree, its layout, the
+        modification time and size of every import and image it uses, the
+        slides its links refer to and the date when it contains a date
+        element. Slides with missing sources have no fingerprint and are
+        always rebuilt.
 
         Args:
-            entry: PreprocessorEntry with text data
-            prs_ph: presentation placeholder where text is to be inserted
-            prs_slide: presentation slide containing placeholder
+            root_entry: root PreprocessorEntry object containing input tree
+
+        Return:
+            list of SHA1 hex digests (or None) for each slide
 
         """
 
-        # Start with paragraph 0 and increment as items are added to list
-        para = 0
+        # Index of the slide of each reference label
+        slide_idx = {id(prs_slide):i for i,prs_slide in enumerate(self.slides)}
+        ref_idx = {label:slide_idx[id(prs_slide)]
+                for label,prs_slide in self.refs.items()}
 
-        for sub in entry.data:
-            if (sub.which == "value"):
-                raise ValueError("invalid value \"{}\" in list "\
-                        "placeholder, expected item element.\n{}"\
-                        "".format(sub.value, self.ppp.error_info(sub)))
+        today = datetime.datetime.now().strftime("%B %d, %Y")
 
-            # Valid item element add to list
-            if (sub.tag == "item"):
-                para = self._prs_insert_text(sub, para, 0, prs_ph)
-                para = para + 1
+        fingerprints = []
+        for i,slide in enumerate(root_entry.data):
+            sha1 = hashlib.sha1()
+            sha1.update(repr((self.layouts[i],
+                self.template[self.layouts[i]])).encode("utf-8"))
 
-            # Invalid element
-            else:
-                raise ValueError("invalid element \"{}\" in list, "\
-                        "expected item element.\n{}"\
-                        "".format(sub.tag, self.ppp.error_info(sub)))
+            # Walk entry tree (None marks the end of an entry)
+            stack = [slide]
+            while len(stack) > 0:
+                sub = stack.pop()
 
-    def _ph_text(self, entry, prs_ph, prs_slide):
-        """ Add text to the placeholder
+                if sub is None:
+                    sha1.update(b")")
+                    continue
 
-        Process text contained in the PreprocessorEntry and place it in the
-        prs_ph placeholder on the prs_slide slide.
+                if sub.which == "value":
+                    sha1.update(repr(sub.value).encode("utf-8"))
+                    continue
 
-        Args:
-            entry: PreprocessorEntry with text data
-            prs_ph: presentation placeholder where text is to be inserted
-            prs_slide: presentation slide containing placeholder
+                sha1.update("({!r}".format(sub.tag).encode("utf-8"))
 
-        """
+                if sub.tag == "date":
+                    sha1.update(today.encode("utf-8"))
+                elif sub.tag == "ref":
+                    sha1.update(repr(ref_idx.get(sub.get_values(join=True)))\
+                            .encode("utf-8"))
 
-        self._prs_insert_text(entry, 0, 0, prs_ph)
+                stack.append(None)
+                stack.extend(reversed(sub.data))
 
-    def _ph_image(self, entry, prs_ph, prs_slide):
-        """ Add image to the placeholder
+            # Add modification time and size of sources
+            imports = []
+            images = {}
+            self._find_sources(slide, self.layouts[i], imports, images)
 
-        Process image path contained in the PreprocessorEntry and place image
-        on the prs_slide slide at the location of the prs_ph placeholder.
+            paths = [entry.get_values(join=True) for entry in imports]
+            paths += sorted(images)
 
-        The general purpose placeholder cannot hold a picture in the current
-        version of the pptx module so a new picture shape is added at the
-        position of the placeholder and the original placeholder is deleted.
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                except (IOError, OSError):
+                    sha1 = None
+                    break
 
-        If the image path specified in input XML file is invlalid, a not
-        indicating this is added to the placeholder and the image is added
-        to an invalid image list.
+                sha1.update(repr((path, stat.st_mtime, stat.st_size))\
+                        .encode("utf-8"))
+
+            fingerprints.append(sha1 and sha1.hexdigest())
+
+        return fingerprints
+
+    def _find_reusable_slides(self, fingerprints):
+        """ Find slides of the previous build that can be reused
+
+        Read the manifest of the previous build and the previous output
+        file, and match slides with the same fingerprint. The manifest has
+        the number of slides created for each slide, so the continuation
+        slides of paginated tables are reused with their slide.
 
         Args:
-            entry: PreprocessorEntry with text data
-            prs_ph: presentation placeholder where text is to be inserted
-            prs_slide: presentation slide containing placeholder
+            fingerprints: list of fingerprints of the slides in this build
+
+        Return:
+            dictionary from index of a slide in this build to the list of
+            slides in the previous presentation to copy (the slide and its
+            continuation slides)
 
         """
 
-        path = ""
+        self.build_fingerprint = self._fingerprint_build()
 
-        # Create path
-        for sub in entry.data:
-            if (sub.which == "value"):
-                path += sub.value
-                continue
+        try:
+            with open(str(self._get_manifest_path()), "r") as f:
+                manifest = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
 
-            # No valid sub elements in image tag
-            raise ValueError("invalid \"{}\" entry in image placeholder."\
-                    "\n{}".format(sub.tag, self.ppp.error_info(sub)))
+        if manifest.get("build") != self.build_fingerprint:
+            return {}
 
-        if not pathlib.Path(path).exists():
-            self.invalid_images.append(path)
-            prs_ph.text = "Image Not Found: " + path
-            return
+        from pptx import Presentation
 
-        # add picture in a new picture shape at location of placeholder
-        pic = prs_slide.shapes.add_picture(path, prs_ph.left, prs_ph.top)
+        # Rebuild everything when the previous output can't be read
+        try:
+            prev_prs = Presentation(str(self.output))
+        except Exception:
+            return {}
 
-        # calculate size to fit inside placeholder area
-        ratio = min(prs_ph.width  / float(pic.width), prs_ph.height / float(pic.height))
+        prev_slides = list(prev_prs.slides)
+        prev_fingerprints = manifest.get("slides", [])
+        prev_counts = manifest.get("pages", [])
 
-        pic.height = int(pic.height * ratio)
-        pic.width  = int(pic.width  * ratio)
+        # Slides don't match the manifest (e.g. the output was edited)
+        if (len(prev_counts) != len(prev_fingerprints) or
+                sum(prev_counts) != len(prev_slides)):
+            return {}
 
-        pic.left = int(prs_ph.left + ((prs_ph.width  - pic.width)/2))
-        pic.top  = int(prs_ph.top  + ((prs_ph.height - pic.height)/2))
+        # Slides of each previous slide (with its continuation slides) and
+        # index of previous slides by fingerprint
+        prev_pages = []
+        prev_idx = {}
+        start = 0
+        for i,(fingerprint,count) in enumerate(zip(prev_fingerprints,
+                prev_counts)):
+            prev_pages.append(prev_slides[start:start+count])
+            start += count
 
-        # remove placeholder from slide
-        elem = prs_ph.element
-        elem.getparent().remove(elem)
+            if fingerprint is not None:
+                prev_idx.setdefault(fingerprint, i)
 
-    def _ph_table(self, entry, prs_ph, prs_slide):
-        """ Add table to the placeholder
+        # Index of the slide of each previous slide (links only refer to
+        # the first slide of a slide)
+        self.prev_slide_idx = {pages[0].part:i
+                for i,pages in enumerate(prev_pages)}
 
-        Process the table description contained in the PreprocessorEntry
-        and place table on the prs_slide slide at the location of the
-        prs_ph placeholder.
+        reuse = {}
+        for i,fingerprint in enumerate(fingerprints):
+            if fingerprint in prev_idx:
+                reuse[i] = prev_pages[prev_idx[fingerprint]]
 
-        The general purpose placeholder cannot hold a table in the current
-        version of the pptx module so a new table shape is added at the
-        position of the placeholder and the original placeholder is deleted.
+        return reuse
+
+    def _write_manifest(self, fingerprints, page_counts):
+        """ Write fingerprints of the slides next to the output file
 
         Args:
-            entry: PreprocessorEntry with text data
-            prs_ph: presentation placeholder where text is to be inserted
-            prs_slide: presentation slide containing placeholder
+            fingerprints: list of fingerprints of the slides in this build
+            page_counts: list of the number of slides created for each
+                slide (with the continuation slides of paginated tables)
+
+        """
+
+        manifest = {
+            "version": self.manifest_version,
+            "build": self.build_fingerprint,
+            "slides": fingerprints,
+            "pages": page_counts,
+        }
+
+        with open(str(self._get_manifest_path()), "w") as f:
+            json.dump(manifest, f)
+
+    def _copy_slides(self, prev_pages, prs_slide):
+        """ Copy the content of a slide from the previous presentation
+
+        Replace the shapes of prs_slide with the shapes of the first of
+        prev_pages, and create a continuation slide (see _get_page_slide())
+        with the shapes of each of the other slides. The relationships the
+        shapes use (images, hyperlinks and links to other slides) are
+        recreated in this presentation. Nothing is copied unless all the
+        slides can be copied.
+
+        Args:
+            prev_pages: slide from the previous presentation and its
+                continuation slides
+            prs_slide: slide in this presentation with the same layout
+
+        Return:
+            True if the slides were copied, False if one of them uses a
+            relationship that can't be copied
+
+        """
+
+        contents = []
+        for prev_slide in prev_pages:
+            content = self._get_slide_content(prev_slide)
+            if content is None:
+                return False
+
+            contents.append(content)
+
+        self.cur_pages = []
+        self.cur_sldId = None
+
+        for num_page,(cSld,attribs) in enumerate(contents):
+            prs_page = prs_slide
+            if num_page > 0:
+                prs_page = self._get_page_slide(prs_slide, num_page)
+
+            self._copy_slide(cSld, attribs, prs_page)
+
+        return True
+
+    def _get_slide_content(self, prev_slide):
+        """ Copy the shapes of a slide from the previous presentation
+
+        Args:
+            prev_slide: slide from the previous presentation
+
+        Return:
+            tuple of (cSld, attribs), where cSld is a copy of the shape tree
+            of the slide and attribs is a list of (elem, name, rel) of the
+            relationship attributes of the copied elements, None if the
+            slide uses a relationship that can't be copied
+
+        """
+
+        from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+        prev_part = prev_slide.part
+        cSld = copy.deepcopy(prev_slide._element.cSld)
+
+        # Find relationship attributes of the copied elements
+        ns_r = "{http://schemas.openxmlformats.org/officeDocument/2006/"\
+                "relationships}"
+        attribs = []
+        for elem in cSld.iter():
+            for name,rId in elem.attrib.items():
+                if name.startswith(ns_r):
+                    attribs.append((elem, name, prev_part.rels[rId]))
+
+        # Only slides with images, hyperlinks and slide links are copied
+        for elem,name,rel in attribs:
+            if rel.is_external:
+                if rel.reltype != RT.HYPERLINK:
+                    return None
+            elif rel.reltype == RT.SLIDE:
+                if rel.target_part not in self.prev_slide_idx:
+                    return None
+            elif rel.reltype != RT.IMAGE:
+                return None
+
+        return cSld, attribs
+
+    def _copy_slide(self, cSld, attribs, prs_slide):
+        """ Replace the shapes of a slide with shapes of the previous build
+
+        Args:
+            cSld: copied shape tree (see _get_slide_content())
+            attribs: relationship attributes of the copied elements
+            prs_slide: slide in this presentation with the same layout
+
+        """
+
+        from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+        # Add relationships to this presentation
+        for elem,name,rel in attribs:
+            if rel.is_external:
+                rId = prs_slide.part.relate_to(rel.target_ref, rel.reltype,
+                        is_external=True)
+
+            elif rel.reltype == RT.IMAGE:
+                prev_image = rel.target_part
+                image_part = self._get_image_part(prev_image.sha1,
+                        prev_image.partname.ext, prev_image.content_type,
+                        prev_image.blob, prev_image.desc)
+                rId = prs_slide.part.relate_to(image_part, RT.IMAGE)
+
+            else:
+                ref_slide = self.slides[self.prev_slide_idx[rel.target_part]]
+                rId = prs_slide.part.relate_to(ref_slide.part, RT.SLIDE)
+
+            elem.set(name, rId)
+
+        prs_slide._element.replace(prs_slide._element.cSld, cSld)
+
+    def _initialize_slides(self, prs, root_entry):
+        """ Create empty slides and save references
+
+        Iterate through slide entries from the preprocessor and create
+        empty slides with the specified layouts and create a dictionary
+        of references for making links between slides. This must be
+        done before processing slides because all slides to be referenced
+        must be created before the link is added to a slide.
+
+        Args:
+            prs: Presentation object where slides will be created
+            root_entry: root PreprocessorEntry object containing input tree
+
+        """
+
+        # Initialize data structures
+        self.slides      = []
+        self.layouts     = []
+        self.refs        = {}
+
+        # Iterate through slides
+        for slide in root_entry.data:
+            self._initialize_slide(prs, slide)
+
+    def _initialize_slide(self, prs, slide):
+        """ Create empty slide and save its reference
+
+        Args:
+            prs: Presentation object where slide will be created
+            slide: slide PreprocessorEntry object
+
+        """
+
+        # Get slide layout
+        layout_vals = slide.get_values(tag="layout", join=True)
+
+        if (len(layout_vals) > 1):
+            raise ValueError("slide may only have one layout attribute"\
+                    "\n{}".format(self.ppp.error_info(slide)))
+
+        # Add layout to list and remove layout entry from slide
+        self.layouts.append(layout_vals[0])
+        slide.remove(tag="layout")
+
+        # Ceate new slide with layout
+        prs_layout = prs.slide_layouts[self.template[layout_vals[0]]["idx"]]
+        self.slides.append(prs.slides.add_slide(prs_layout))
+
+        # Get slide reference label
+        label_vals = slide.get_values(tag="label", join=True)
+
+        # Reference label points to current slide and remove label entry
+        if (len(label_vals) == 1):
+            self.refs[label_vals[0]] = self.slides[-1]
+            slide.remove(tag="label")
+        elif (len(label_vals) > 1):
+            raise ValueError("slide may only have one label attribute"\
+                    "\n{}".format(self.ppp.error_info(slide)))
+
+    def _stream_slides(self, prs):
+        """ Create slides while the input XML file is parsed
+
+        Each slide is created and filled as soon as the preprocessor has
+        processed it, after which the preprocessor frees the slide entries
+        and XML elements, so memory used for the input is bounded by the
+        largest slide instead of the whole file. Links to other slides are
+        added once all slides are created, since they may refer to slides
+        that come later in the file. Import sources and images are loaded
+        when each slide is filled instead of being prefetched.
+
+        Args:
+            prs: Presentation object where slides will be created
+
+        """
+
+        self.slides       = []
+        self.layouts      = []
+        self.refs         = {}
+        self.pending_refs = []
+        self.source_paths = set()
+
+        def add_slide(slide):
+            i = len(self.slides)
+            self._initialize_slide(prs, slide)
+            self.source_paths.update(self._find_source_paths([slide],
+                [self.layouts[i]]))
+            self._process_slide(i, slide)
+
+        # Process the input xml file, adding each slide as it is processed
+        self.ppp = PresentationPreprocessor(slide_handler=add_slide,
+                import_cache=self.import_cache)
+        self.ppp.parse(str(self.input))
+        self.source_paths.update(self.ppp.import_paths)
+
+        # Add links to slides
+        for prs_slide,run,ref_val,info in self.pending_refs:
+            self._add_ref_link(prs_slide, run, ref_val, info)
+
+    def _process_slides(self, prs, root_entry):
+        """ Add data to the slides that were previously created
+
+        Iterate through slide entries from the preprocessor and add
+        information to the slides created by the _initiliaze_slides
+        subroutine. This must be done is two steps because slides to be
+        referenced through links must be created before the links to
+        that slide is created.
+
+        Args:
+            prs: Presentation object where slides will be created
+            root_entry: root PreprocessorEntry object containing input tree
+
+        """
+
+        # Iterate through slides
+        for i,slide in enumerate(root_entry.data):
+            self._process_slide(i, slide)
+
+    def _process_slide(self, i, slide):
+        """ Add data to a slide that was previously created
+
+        Args:
+            i: index of the slide in the presentation
+            slide: slide PreprocessorEntry object
+
+        """
+
+        from pptx.shapes.shapetree import SlideShapeFactory
+
+
+        # Copy slide from previous build when it is unchanged
+        if i in self.reuse:
+            if self._copy_slides(self.reuse[i], self.slides[i]):
+                self.page_counts[i] = len(self.reuse[i])
+                return
+
+            del self.reuse[i]
+
+        # Number of errors reported before this slide
+        errors = self._count_errors()
+
+        # Map from placeholder index to placeholder element of the slide
+        ph_elems = {elem.ph_idx:elem
+                for elem in self.slides[i].shapes._spTree.iter_ph_elms()}
+
+        # Continuation slides of paginated tables and the placeholder
+        # indexes of the paginated tables
+        self.cur_pages = []
+        self.cur_paged = set()
+        self.cur_sldId = None
+
+        # Shapes of the placeholders filled on the slide (copied to the
+        # continuation slides)
+        placeholders = []
+        spTree = self.slides[i].shapes._spTree
+
+        # Slide links of the slide added once all slides are created
+        if self.pending_refs is not None:
+            num_refs = len(self.pending_refs)
+
+        # Iterate through placeholders
+        for ph in slide.data:
+            # Ensure no value entries directly under slide
+            if (ph.which != "entry"):
+                raise ValueError("slide may only contain placeholder"\
+                        "elements"\
+                        "\n{}".format(self.ppp.error_info(ph)))
+
+            # Get placeholder from slide
+            try:
+                ph_idx = self.template[self.layouts[i]]["ph"][ph.tag]
+            except KeyError:
+                raise ValueError("placeholder \"{}\" not found in "\
+                        "template\n{}"\
+                        "".format(ph.tag, self.ppp.error_info(ph)))
+
+            self.cur_slide = self.slides[i]
+            self.cur_geometry = self._get_ph_geometry(self.layouts[i],
+                    ph.tag)
+            prs_ph = SlideShapeFactory(ph_elems[ph_idx],
+                    self.slides[i].placeholders)
+
+            # Determine if placeholder has a type
+            type_vals = ph.get_values(tag="type", join=True)
+
+            if (len(type_vals) > 1):
+                raise ValueError("placeholder may only have one type "\
+                        "attribute\n{}"\
+                        "".format(self.ppp.error_info(ph)))
+            else:
+                # No type specified, find type elements under placeholder
+                if (len(type_vals) == 0):
+                    found = 0
+                    for sub in ph.data:
+                        if (sub.which == "value"):
+                            continue
+
+                        # Determine if entry is a type element
+                        for t in self.ph_types:
+                            if (sub.tag == t):
+                                ph = sub
+                                type_vals.insert(0,t)
+                                found += 1
+
+                    # No valid type found, assume data is text
+                    if (found == 0):
+                        type_vals.insert(0,"text")
+
+                    # Found more than one type, this is invalid
+                    elif (found > 1):
+                        raise ValueError("placeholder may only have one "\
+                                "type\n{}".format(self.ppp.error_info(ph)))
+
+                # Type was specified as an attribute of the placeholder
+                else:
+                    # remove type entry from placeholder entry
+                    ph.remove(tag="type")
+
+                # Ensure class has type function
+                if (not hasattr(self, "_ph_" + type_vals[0])):
+                    raise ValueError("placeholder type \"{}\" is not "\
+                            "valid\n{}".format(type_vals[0],
+                                self.ppp.error_info(ph)))
+
+                # Call type function
+                type_func = getattr(self, "_ph_" + type_vals[0])
+                shapes = set(spTree)
+                type_func(ph, prs_ph, self.slides[i])
+
+                # Placeholder element when it was filled and the shapes
+                # added in its place
+                ph_elem = ph_elems[ph_idx]
+                if ph_elem.getparent() is None:
+                    ph_elem = None
+
+                placeholders.append((ph_idx, ph_elem,
+                    [elem for elem in spTree if elem not in shapes]))
+
+        # Copy the other placeholders to the continuation slides, so each
+        # placeholder is only filled (and its imports and errors are only
+        # processed) once
+        refs = None
+        if self.pending_refs is not None:
+            refs = [ref for ref in self.pending_refs[num_refs:]
+                    if ref[0] is self.slides[i]]
+
+        for prs_page in self.cur_pages:
+            page_elems = {elem.ph_idx:elem
+                    for elem in prs_page.shapes._spTree.iter_ph_elms()}
+
+            for ph_idx,ph_elem,added in placeholders:
+                page_elem = page_elems.get(ph_idx)
+
+                # Tables that ended on earlier slides only remove their
+                # placeholder
+                if ph_idx not in self.cur_paged:
+                    if ph_elem is not None:
+                        page_elem.addprevious(self._copy_shape(ph_elem,
+                            self.slides[i], prs_page, refs))
+
+                    # Added shapes get a new id on the continuation slide
+                    for elem in added:
+                        copy_elem = self._copy_shape(elem, self.slides[i],
+                                prs_page, refs)
+                        copy_elem.xpath("./*/p:cNvPr")[0].id = \
+                                prs_page.shapes._next_shape_id
+                        prs_page.shapes._spTree.append(copy_elem)
+
+                if page_elem is not None:
+                    page_elem.getparent().remove(page_elem)
+
+        self.page_counts[i] = 1 + len(self.cur_pages)
+
+        # Rebuild slides with errors, so the errors are reported again
+        if self.fingerprints is not None and self._count_errors() != errors:
+            self.fingerprints[i] = None
+
+    def _copy_shape(self, elem, prs_slide, prs_page, refs=None):
+        """ Copy a shape of a slide to a continuation slide
+
+        The relationships used by the shape (images and links) are added to
+        the continuation slide, and links to slides that are added once all
+        slides are created (when streaming) are also added to the copy.
+
+        Args:
+            elem: shape element to copy
+            prs_slide: presentation slide containing the shape
+            prs_page: continuation slide of prs_slide
+
+        Kwargs:
+            refs: pending slide links of prs_slide (see _stream_slides()),
+                None when the links are already added
+
+        Return:
+            copy of the shape element
+
+        """
+
+        from pptx.text.text import _Run
+
+        copy_elem = copy.deepcopy(elem)
+
+        # Elements of the copy by element of the shape
+        copies = dict(zip(elem.iter(), copy_elem.iter()))
+
+        ns_r = "{http://schemas.openxmlformats.org/officeDocument/2006/"\
+                "relationships}"
+        for sub in copy_elem.iter():
+            for name,rId in sub.attrib.items():
+                if not name.startswith(ns_r):
+                    continue
+
+                rel = prs_slide.part.rels[rId]
+                if rel.is_external:
+                    rId = prs_page.part.relate_to(rel.target_ref,
+                            rel.reltype, is_external=True)
+                else:
+                    rId = prs_page.part.relate_to(rel.target_part,
+                            rel.reltype)
+
+                sub.set(name, rId)
+
+        for ref_slide,run,ref_val,info in refs or []:
+            if run._r in copies:
+                self.pending_refs.append((prs_page,
+                    _Run(copies[run._r], run._parent), ref_val, info))
+
+        return copy_elem
+
+    def _get_ph_geometry(self, layout, ph):
+        """ Get position and size of a placeholder
+
+        Uses the geometry from the compiled template, so the position and
+        size of placeholders on new slides don't need to be resolved
+        through the layout and master by python-pptx each time they are
+        used. Placeholders of new slides have no geometry of their own.
+
+        Args:
+            layout: name of the layout in the template
+            ph: name of the placeholder in the layout
+
+        Return:
+            (left, top, width, height) of the placeholder in EMU
+
+        """
+
+        try:
+            return self.ph_geometry[(layout, ph)]
+        except KeyError:
+            pass
+
+        try:
+            ph_info = self.template[layout]["ph_info"][ph]
+        except KeyError:
+            # Template was not compiled, get geometry from the layout
+            prs_layout = self.prs.slide_layouts[self.template[layout]["idx"]]
+            ph_info = prs_layout.placeholders.get(
+                    idx=self.template[layout]["ph"][ph])
+            geometry = (ph_info.left, ph_info.top, ph_info.width,
+                    ph_info.height)
+        else:
+            geometry = (ph_info["left"], ph_info["top"], ph_info["width"],
+                    ph_info["height"])
+
+        self.ph_geometry[(layout, ph)] = geometry
+
+        return geometry
+
+    def _count_errors(self):
+        """ Get number of invalid images and imports reported so far """
+
+        return len(self.invalid_images) + sum(len(errors)
+                for lines in self.invalid_imports.values()
+                for errors in lines.values())
+
+    def _prs_insert_text(self, entry, para, level, paragraphs):
+        """ Add text to a shape
+
+        Process text contained in the PreprocessorEntry and place it in the
+        paragraphs of the text frame where the text should be inserted.
+
+        Args:
+            entry: PreprocessorEntry with text data
+            para: Paragraph index to insert text (used with lists)
+            level: indent level used to insert text (used with lists)
+            paragraphs: ParagraphWriter for the text frame where text is
+                to be inserted
+
+        Return:
+            highest paragraph index where text was inserted
+
+        """
+
+        # Get paragraph, creating paragraphs up to the para index
+        prs_para = paragraphs.get(para, level)
+
+        # Adjacent values and dates have the same formatting, collect their
+        # text and add it to the paragraph as a single run
+        fragments = []
+
+        for sub in entry.data:
+            if (sub.which == "value"):
+                fragments.append(str(sub.value))
+                continue
+
+            # Add date
+            if (sub.tag == "date"):
+                fragments.append(datetime.datetime.now().strftime("%B %d, %Y"))
+                continue
+
+            # Add text before the link or list item
+            self._add_run(prs_para, fragments)
+
+            # Add link
+            if (sub.tag == "link"):
+                run = prs_para.add_run()
+                run.text = sub.get_values(join=True)
+
+                for sub_link in sub.data:
+                    if (sub_link.which == "value"):
+                        continue
+
+                    if (sub_link.tag == "addr"):
+                        run.hyperlink.address = sub_link.get_values(join=True)
+                    elif (sub_link.tag == "ref"):
+                        ref_val = sub_link.get_values(join=True)
+
+                        # Add link when all slides are created (streaming)
+                        if self.pending_refs is not None:
+                            self._reserve_ref_link(self.cur_slide, run,
+                                    ref_val)
+                            self.pending_refs.append((self.cur_slide, run,
+                                ref_val, self.ppp.error_info(sub_link)))
+                            continue
+
+                        self._add_ref_link(self.cur_slide, run, ref_val,
+                                self.ppp.error_info(sub_link))
+
+                    else:
+                        raise ValueError("invalid link attribute \"{}\"\n{}"\
+                                "".format(sub_link.tag, \
+                                          self.ppp.error_info(sub_link)))
+
+            # Add list item by calling this function recursively
+            elif (sub.tag == "item"):
+                para = self._prs_insert_text(sub, para+1, level+1, paragraphs)
+
+            else:
+                raise ValueError("invalid \"{}\" entry in text placeholder."\
+                        "\n{}".format(sub.tag, self.ppp.error_info(sub)))
+
+        # Add remaining text
+        self._add_run(prs_para, fragments)
+
+        return para
+
+    def _add_run(self, prs_para, fragments):
+        """ Add text fragments to a paragraph as a single run
+
+        The list of fragments is emptied once they are added.
+
+        Args:
+            prs_para: paragraph where the run is added
+            fragments: list of text strings to join into the run
+
+        """
+
+        text = "".join(fragments)
+        fragments.clear()
+
+        if text != "":
+            prs_para.add_run().text = text
+
+    def _add_ref_link(self, prs_slide, run, ref_val, info):
+        """ Make text run a link to the slide with a reference
+
+        Args:
+            prs_slide: presentation slide containing the run
+            run: text run to make a link
+            ref_val: reference of the slide the link refers to
+            info: error information of the link entry
+
+        """
+
+        try:
+            ref_slide = self.refs[ref_val]
+        except KeyError:
+            raise ValueError("link reference \"{}\""\
+                    "not found.\n{}".format(ref_val, info))
+
+        self._add_slide_link(prs_slide, run, ref_slide)
+
+    def _add_slide_link(self, prs_slide, run, ref_slide):
+        """ Make text run a link to another slide
+
+        Args:
+            prs_slide: presentation slide containing the run
+            run: text run to make a link
+            ref_slide: presentation slide the link refers to
+
+        """
+
+        from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+        rPr = run._r.get_or_add_rPr()
+
+        # Replace the relationship reserved by _reserve_ref_link() in every
+        # link of the slide that uses it
+        if rPr.hlinkClick is not None:
+            ns_r = "{http://schemas.openxmlformats.org/officeDocument/2006/"\
+                    "relationships}"
+            rId = rPr.hlinkClick.get(ns_r + "id")
+            if not prs_slide.part.rels[rId].is_external:
+                return
+
+            prs_slide.part.rels.pop(rId)
+            slide_rId = prs_slide.part.relate_to(ref_slide.part, RT.SLIDE)
+
+            for hlinkClick in prs_slide._element.iter(rPr.hlinkClick.tag):
+                if hlinkClick.get(ns_r + "id") == rId:
+                    hlinkClick.set(ns_r + "id", slide_rId)
+            return
+
+        rId = prs_slide.part.relate_to(ref_slide.part, RT.SLIDE)
+
+        hlinkClick = rPr.add_hlinkClick(rId)
+        hlinkClick.set('action', 'ppaction://hlinksldjump')
+
+    def _reserve_ref_link(self, prs_slide, run, ref_val):
+        """ Make text run a link to a slide that may not be created yet
+
+        Used when streaming. The link uses an external relationship that
+        holds its place among the relationships of the slide until all
+        slides are created, when _add_ref_link() replaces it with the
+        relationship to the slide. So the slide has the same relationship
+        ids as when the presentation isn't streamed.
+
+        Args:
+            prs_slide: presentation slide containing the run
+            run: text run to make a link
+            ref_val: reference of the slide the link refers to
+
+        """
+
+        from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+        rId = prs_slide.part.relate_to("#" + ref_val, RT.SLIDE,
+                is_external=True)
+        rPr = run._r.get_or_add_rPr()
+
+        hlinkClick = rPr.add_hlinkClick(rId)
+        hlinkClick.set('action', 'ppaction://hlinksldjump')
+
+    def _ph_list(self, entry, prs_ph, prs_slide):
+        """ Add list to the placeholder
+
+        Process list contained in the PreprocessorEntry and place it in the
+        prs_ph placeholder on the prs_slide slide.
+
+        Args:
+            entry: PreprocessorEntry with text data
+            prs_ph: presentation placeholder where text is to be inserted
+            prs_slide: presentation slide containing placeholder
+
+        """
+
+        # Start with paragraph 0 and increment as items are added to list
+        para = 0
+        paragraphs = ParagraphWriter(prs_ph.text_frame)
+
+        for sub in entry.data:
+            if (sub.which == "value"):
+                raise ValueError("invalid value \"{}\" in list "\
+                        "placeholder, expected item element.\n{}"\
+                        "".format(sub.value, self.ppp.error_info(sub)))
+
+            # Valid item element add to list
+            if (sub.tag == "item"):
+                para = self._prs_insert_text(sub, para, 0, paragraphs)
+                para = para + 1
+
+            # Invalid element
+            else:
+                raise ValueError("invalid element \"{}\" in list, "\
+                        "expected item element.\n{}"\
+                        "".format(sub.tag, self.ppp.error_info(sub)))
+
+        # Add the paragraphs of all the items to the placeholder
+        paragraphs.flush()
+
+    def _ph_text(self, entry, prs_ph, prs_slide):
+        """ Add text to the placeholder
+
+        Process text contained in the PreprocessorEntry and place it in the
+        prs_ph placeholder on the prs_slide slide.
+
+        Args:
+            entry: PreprocessorEntry with text data
+            prs_ph: presentation placeholder where text is to be inserted
+            prs_slide: presentation slide containing placeholder
+
+        """
+
+        paragraphs = ParagraphWriter(prs_ph.text_frame)
+        self._prs_insert_text(entry, 0, 0, paragraphs)
+        paragraphs.flush()
+
+    def _ph_image(self, entry, prs_ph, prs_slide):
+        """ Add image to the placeholder
+
+        Process image path contained in the PreprocessorEntry and place image
+        on the prs_slide slide at the location of the prs_ph placeholder.
+
+        The general purpose placeholder cannot hold a picture in the current
+        version of the pptx module so a new picture shape is added at the
+        position of the placeholder and the original placeholder is deleted.
+
+        If the image path specified in input XML file is invlalid, a not
+        indicating this is added to the placeholder and the image is added
+        to an invalid image list.
+
+        Args:
+            entry: PreprocessorEntry with text data
+            prs_ph: presentation placeholder where text is to be inserted
+            prs_slide: presentation slide containing placeholder
+
+        """
+
+        path = ""
+
+        # Create path
+        for sub in entry.data:
+            if (sub.which == "value"):
+                path += sub.value
+                continue
+
+            # No valid sub elements in image tag
+            raise ValueError("invalid \"{}\" entry in image placeholder."\
+                    "\n{}".format(sub.tag, self.ppp.error_info(sub)))
+
+        # Get image data (loaded before the slides were created)
+        image = self.image_cache.get(path)
+
+        if image is None:
+            self.invalid_images.append(path)
+            prs_ph.text = "Image Not Found: " + path
+            return
+
+        ph_left, ph_top, ph_width, ph_height = self.cur_geometry
+
+        # Use image downscaled to the size of the placeholder (unchanged
+        # when it can't be resampled)
+        if self.image_resampler is not None:
+            errors = []
+            image = self.image_resampler.get(image, ph_width, ph_height,
+                    errors=errors)
+
+            for msg in errors:
+                self.invalid_images.append("{} (not resampled: {})"\
+                        "".format(path, msg))
+
+        # calculate size to fit inside placeholder area
+        width, height = image.native_size
+        ratio = min(ph_width  / float(width), ph_height / float(height))
+
+        height = int(height * ratio)
+        width  = int(width  * ratio)
+
+        left = int(ph_left + ((ph_width  - width)/2))
+        top  = int(ph_top  + ((ph_height - height)/2))
+
+        # add picture in a new picture shape at location of placeholder
+        self._add_picture(prs_slide, image, left, top, width, height)
+
+        # remove placeholder from slide
+        elem = prs_ph.element
+        elem.getparent().remove(elem)
+
+    def _add_picture(self, prs_slide, image, left, top, width, height):
+        """ Add picture shape to a slide
+
+        This does the same as the add_picture() function of the slide
+        shapes, but uses the metadata of the image from the ImageCache
+        instead of reading, hashing and parsing the image every time it is
+        added, and looks up existing image parts by SHA1 in a dictionary
+        instead of searching every part of the presentation.
+
+        Args:
+            prs_slide: presentation slide where picture is added
+            image: ImageInfo of the image
+            left, top, width, height: position and size of picture in EMU
+
+        Return:
+            picture element added to the slide
+
+        """
+
+        from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+        image_part = self._get_image_part(image.sha1, image.ext,
+                image.content_type, image.blob, image.filename)
+        rId = prs_slide.part.relate_to(image_part, RT.IMAGE)
+
+        # Add picture element to the slide shapes
+        shapes = prs_slide.shapes
+        shape_id = shapes._next_shape_id
+        name = "Picture {}".format(shape_id - 1)
+        return shapes._spTree.add_pic(shape_id, name, image.filename, rId,
+                left, top, width, height)
+
+    def _get_image_part(self, sha1, ext, content_type, blob, filename):
+        """ Get image part of the presentation with an image
+
+        Args:
+            sha1: SHA1 hex digest of the image
+            ext: extension of the image file (e.g. "png")
+            content_type: MIME type of the image
+            blob: bytes of the image, used when the part is added
+            filename: file name of the image
+
+        Return:
+            ImagePart with the image, added to the presentation if needed
+
+        """
+
+        from pptx.parts.image import ImagePart
+
+        # Find image parts already in the presentation the first time
+        if self.image_parts is None:
+            self.image_parts = {}
+            for part in self.prs.part.package.iter_parts():
+                if isinstance(part, ImagePart):
+                    self.image_parts.setdefault(part.sha1, part)
+
+        image_part = self.image_parts.get(sha1)
+        if image_part is None:
+            package = self.prs.part.package
+            image_part = ImagePart(package.next_image_partname(ext),
+                    content_type, package, blob, filename)
+            self.image_parts[sha1] = image_part
+
+        return image_part
+
+    def _ph_table(self, entry, prs_ph, prs_slide):
+        """ Add table to the placeholder
+
+        Process the table description contained in the PreprocessorEntry
+        and place table on the prs_slide slide at the location of the
+        prs_ph placeholder.
+
+        The general purpose placeholder cannot hold a table in the current
+        version of the pptx module so a new table shape is added at the
+        position of the placeholder and the original placeholder is deleted.
+
+        When the table is paginated, the rows are split into tables of at
+        most the given number of rows, and the tables after the first are
+        added to continuation slides (see _get_page_slide()).
+
+        Args:
+            entry: PreprocessorEntry with text data
+            prs_ph: presentation placeholder where text is to be inserted
+            prs_slide: presentation slide containing placeholder
 
         """
 
-        table = []
         col_weights = []
         row_weights = []
         row_min = False
-        max_col = 0
+        page_rows = None
+        repeat_header = 0
+
+        # Iterate through settings
+        for row in entry.data:
+            if (row.which == "value"):
+                raise ValueError("invalid value \"{}\" in table "\
+                        "placeholder, expected row element.\n{}"\
+                        "".format(row.value, self.ppp.error_info(row)))
+
+            # Setting element -> to specify table settings
+            if (row.tag == "setting"):
+                curw_col = -1
+                curw_row = -1
+
+                for setting in row.data:
+                    if (setting.which == "value"):
+                        raise ValueError("invalid value \"{}\" in setting "\
+                                "element, expected setting element.\n{}"\
+                                "".format(setting.value, self.ppp.error_info(setting)))
+
+                    # column element -> to specify specific column's weight
+                    elif (setting.tag == "col"):
+
+                        # Add new empty weight entry to weights array
+                        curw_col += 1
+                        if len(col_weights) <= curw_col:
+                            col_weights.insert(curw_col, 1)
+
+                        for spec in setting.data:
+                            if (spec.which == "value"):
+                                raise ValueError("invalid value \"{}\" in setting "\
+                                        "element, expected spec element.\n{}"\
+                                        "".format(spec.value, self.ppp.error_info(setting)))
+
+                            # Add weights to array
+                            elif (spec.tag == "weight"):
+                                col_weights[curw_col] = float(spec.get_values(join = True))
+
+                    # column element -> to specify specific column's weight
+                    elif (setting.tag == "row"):
+
+                        # Add new empty weight entry to weights array
+                        curw_row += 1
+                        if len(row_weights) <= curw_row:
+                            row_weights.insert(curw_row, 1)
+
+                        for spec in setting.data:
+                            if (spec.which == "value"):
+                                raise ValueError("invalid value \"{}\" in setting "\
+                                        "element, expected spec element.\n{}"\
+                                        "".format(spec.value, self.ppp.error_info(setting)))
+
+                            # Add weights to array
+                            elif (spec.tag == "weight"):
+                                temp = spec.get_values(join = True)
+                                try:
+                                    row_weights[curw_row] = float(temp)
+                                except ValueError as err:
+                                    if temp == "min":
+                                        row_min = True
+                                    else:
+                                        raise err
+
+                    # paginate element -> to split table across slides
+                    elif (setting.tag == "paginate"):
+                        page_rows, repeat_header = \
+                                self._get_paginate_setting(setting)
+
+                    # Invalid element
+                    else:
+                        raise ValueError("invalid element \"{}\" in table "\
+                                "setting, expected setting element.\n{}"\
+                                "".format(setting.tag, self.ppp.error_info(setting)))
+
+        # Rows of the table and number of columns (imports are only
+        # streamed for paginated tables)
+        rows, num_col = self._get_table_rows(entry, page_rows is not None)
+
+        if page_rows is None:
+            # Create table on slide at location of placeholder
+            self._add_table(prs_slide, rows, num_col, col_weights,
+                    row_weights, row_min)
+
+        else:
+            # Create a table on this slide and each continuation slide
+            self._add_table_pages(prs_ph, prs_slide, rows, num_col,
+                    page_rows, repeat_header, col_weights, row_weights,
+                    row_min)
+
+        # remove placeholder from slide
+        elem = prs_ph.element
+        elem.getparent().remove(elem)
+
+    def _get_paginate_setting(self, setting):
+        """ Get number of rows per page and header rows of a table
+
+        Args:
+            setting: paginate setting PreprocessorEntry
+
+        Return:
+            tuple of (rows, repeat_header), the number of rows of each page
+            (including the header rows) and the number of rows at the top
+            of the table repeated on every page
+
+        """
+
+        page_rows = None
+        repeat_header = 0
+
+        for spec in setting.data:
+            if (spec.which == "value"):
+                raise ValueError("invalid value \"{}\" in paginate "\
+                        "setting, expected spec element.\n{}"\
+                        "".format(spec.value, self.ppp.error_info(setting)))
+
+            if (spec.tag not in ("rows", "repeat_header")):
+                raise ValueError("invalid paginate attribute \"{}\"\n{}"\
+                        "".format(spec.tag, self.ppp.error_info(spec)))
+
+            val = spec.get_values(join=True)
+            try:
+                val = int(val)
+            except ValueError:
+                raise ValueError("invalid paginate {} \"{}\", expected "\
+                        "number\n{}".format(spec.tag, val,
+                            self.ppp.error_info(spec)))
+
+            if (spec.tag == "rows"):
+                page_rows = val
+            else:
+                repeat_header = val
+
+        if page_rows is None:
+            raise ValueError("paginate setting must have rows attribute\n{}"\
+                    "".format(self.ppp.error_info(setting)))
+
+        if (repeat_header < 0 or page_rows <= repeat_header):
+            raise ValueError("paginate rows must be greater than "\
+                    "repeat_header\n{}".format(self.ppp.error_info(setting)))
+
+        return page_rows, repeat_header
+
+    def _get_table_rows(self, entry, stream=False):
+        """ Get the rows of a table description and its number of columns
+
+        A table has as many columns as its widest row. When the imports
+        directly under the table are streamed, the number of columns is
+        found before any row is returned, by laying out the table with only
+        the first rows of those imports (the rows of an import all have the
+        same number of columns, see _iter_import()). The rows that are read
+        for this are kept and returned again, so no import is read or
+        reported twice.
+
+        Args:
+            entry: table PreprocessorEntry
+
+        Kwargs:
+            stream: True to read the imports directly under the table one
+                row at a time (see _iter_import())
+
+        Return:
+            tuple of (rows, num_col), where rows is a list of the rows (an
+            iterator when streamed, see _iter_table_rows()) and num_col is
+            the number of columns of the table
+
+        """
+
+        imports = {}
+
+        if not stream:
+            rows = list(self._iter_table_rows(entry, imports))
+            return rows, max([1] + [len(row) for row in rows])
+
+        num_col = max([1] + [len(row) for row in
+            self._iter_table_rows(entry, imports, probe=True)])
+
+        return self._iter_table_rows(entry, imports, stream=True), num_col
+
+    def _iter_table_rows(self, entry, imports, stream=False, probe=False):
+        """ Iterate over the rows of a table description
+
+        Rows are placed in a grid, where imports in a row element fill the
+        following rows from the column of the import. A row is returned as
+        soon as no later element of the table can add cells to it, and is
+        then dropped from the grid.
+
+        Args:
+            entry: table PreprocessorEntry
+            imports: dictionary of the imports of the table that were read
+                by an earlier iteration (by id of the import entry), imports
+                that are read are added to it
+
+        Kwargs:
+            stream: True to read the imports directly under the table one
+                row at a time (see _iter_import())
+            probe: True to only read the first rows of the streamed imports
+                that can change the width of the rows (the rows that fill
+                the rows started by the earlier imports and one more row)
+
+        Yields:
+            list of cell entries for each row (cells may be None)
+
+        """
+
+        table = []
         cur_row = -1
+        done = 0
+
+        # Iterate through rows
+        for row in entry.data:
+            # Settings are read by _ph_table()
+            if (row.tag == "setting"):
+                continue
+
+            # Row element of table
+            elif (row.tag == "row"):
+                # Initialize new row in array
+                cur_row += 1
+                cur_col = -1
+                if len(table) <= cur_row:
+                    table.insert(cur_row, [])
+
+                # Iterate through columns
+                for col in row.data:
+                    if (col.which == "value"):
+                        raise ValueError("invalid value \"{}\" in table "\
+                                "placeholder, expected cell element.\n{}"\
+                                "".format(row.value, self.ppp.error_info(col)))
+
+                    # Find where to insert next cell
+                    while(True):
+                        cur_col += 1
+
+                        # Add data if at end of row
+                        if len(table[cur_row]) <= cur_col:
+                            table[cur_row].append(None)
+                            break
+
+                        # Add data if current cell is empty
+                        elif table[cur_row][cur_col] is None:
+                            break
+
+                    # Add cell entry to table array
+                    if (col.tag == "cell"):
+                        table[cur_row][cur_col] = col
+
+                    # Add import entries to table array
+                    elif (col.tag == "import"):
+                        next_col = cur_col - 1
+
+                        # Add entries to table without changing cur_row
+                        if id(col) not in imports:
+                            imports[id(col)] = self._import(col)
+
+                        for i,irow in enumerate(imports[id(col)]):
+                            if len(table) <= cur_row + i:
+                                table.append([])
+
+                            # Add preceding cells when cur_col != 0
+                            row_len = len(table[cur_row + i])
+                            if (row_len < cur_col):
+                                for j in range(row_len,cur_col):
+                                    table[cur_row + i].append(None)
+
+                            # Insert entries into table
+                            for j,icol in enumerate(irow):
+                                if (len(table[cur_row+i]) <= cur_col + j):
+                                    table[cur_row + i].append(icol)
+                                else:
+                                    table[cur_row + i][cur_col + j] = icol
+
+                                # Determine in which column the import ends
+                                if (j == 0):
+                                    next_col += 1
+
+                        cur_col = next_col
+
+                    # Invalid element
+                    else:
+                        raise ValueError("invalid element \"{}\" in table "\
+                                "row, expected cell element.\n{}"\
+                                "".format(col.tag, self.ppp.error_info(col)))
+
+            # Add import entries to table array
+            elif (row.tag == "import"):
+                if id(row) not in imports:
+                    if stream or probe:
+                        imports[id(row)] = BufferedRows(
+                                self._iter_import(row))
+                    else:
+                        imports[id(row)] = self._import(row)
+
+                irows = imports[id(row)]
+                if probe:
+                    irows = irows.head(len(table) - cur_row)
+
+                # Add entries to table and change cur_row
+                for irow in irows:
+                    cur_row += 1
+                    if len(table) <= cur_row:
+                        table.insert(cur_row, [])
+
+                    for icol in irow:
+                        table[cur_row].append(icol)
+
+                    # Return each imported row as it is read
+                    if stream:
+                        for i in range(done, cur_row+1):
+                            yield table[i]
+                            table[i] = None
+                        done = cur_row + 1
+
+            else:
+                raise ValueError("invalid element \"{}\" in table, "\
+                        "expected row element.\n{}"\
+                        "".format(row.tag, self.ppp.error_info(row)))
+
+            # Later elements only add cells after the current row
+            for i in range(done, cur_row+1):
+                yield table[i]
+                table[i] = None
+            done = cur_row + 1
+
+        # Rows filled by imports in the last row elements
+        for i in range(done, len(table)):
+            yield table[i]
+
+    def _add_table_pages(self, prs_ph, prs_slide, rows, num_col, page_rows,
+            repeat_header, col_weights, row_weights, row_min):
+        """ Add the rows of a table as a table on each page
+
+        The first page is added to prs_slide and the following pages to
+        continuation slides. Rows are added to a page as they are returned,
+        so only the rows of one page are held at a time. The header rows
+        are repeated at the top of every page, and the row weights apply
+        to the rows of each page. Rows have the same height on every page,
+        so the table of the last page may be shorter. Every page has the
+        number of columns of the whole table.
+
+        Args:
+            prs_ph: presentation placeholder of the table
+            prs_slide: presentation slide containing placeholder
+            rows: iterator over the rows (see _iter_table_rows())
+            num_col: number of columns of the table (see
+                _get_table_rows())
+            page_rows: maximum number of rows of each page
+            repeat_header: number of rows repeated at the top of each page
+            col_weights: relative widths of the columns
+            row_weights: relative heights of the rows of each page
+            row_min: True to give all rows the minimum height
+
+        """
+
+        ph_idx = prs_ph.element.ph_idx
+        self.cur_paged.add(ph_idx)
+
+        header = []
+        page = []
+        num_page = 0
+
+        for row in rows:
+            if len(header) < repeat_header:
+                header.append(row)
+
+            page.append(row)
+
+            # Add the full page and start the next one with the header
+            if len(page) == page_rows:
+                self._add_table_page(prs_slide, num_page, ph_idx, page,
+                        num_col, col_weights, row_weights, row_min,
+                        page_rows)
+                num_page += 1
+                page = list(header)
+
+        # Add last page unless it only has the header rows
+        if num_page == 0 or len(page) > len(header):
+            self._add_table_page(prs_slide, num_page, ph_idx, page, num_col,
+                    col_weights, row_weights, row_min, page_rows)
+
+    def _add_table_page(self, prs_slide, num_page, ph_idx, table, num_col,
+            col_weights, row_weights, row_min, page_rows):
+        """ Add the table of a page of a paginated table
+
+        Args:
+            prs_slide: presentation slide containing placeholder
+            num_page: index of the page (0 for prs_slide)
+            ph_idx: index of the table placeholder
+            table: 2-dimensional array of cell entries of the page
+            num_col: number of columns in the table
+            col_weights: relative widths of the columns
+            row_weights: relative heights of the rows
+            row_min: True to give all rows the minimum height
+            page_rows: maximum number of rows of each page
+
+        """
+
+        if num_page == 0:
+            self._add_table(prs_slide, table, num_col, col_weights,
+                    row_weights, row_min, page_rows)
+            return
+
+        prs_page = self._get_page_slide(prs_slide, num_page)
+
+        # Links in the table are added to the continuation slide
+        cur_slide = self.cur_slide
+        self.cur_slide = prs_page
+        self._add_table(prs_page, table, num_col, col_weights, row_weights,
+                row_min, page_rows)
+        self.cur_slide = cur_slide
+
+        # remove placeholder from continuation slide
+        for elem in prs_page.shapes._spTree.iter_ph_elms():
+            if elem.ph_idx == ph_idx:
+                elem.getparent().remove(elem)
+                break
+
+    def _get_page_slide(self, prs_slide, num_page):
+        """ Get continuation slide for a page of a paginated table
+
+        Continuation slides have the layout of prs_slide and are inserted
+        after it, one for each page after the first. They are shared by the
+        paginated tables of prs_slide (page n of each table is on the same
+        slide). The other placeholders of prs_slide are copied to the
+        continuation slides once the slide is processed (see
+        _process_slide()).
+
+        Args:
+            prs_slide: presentation slide of the first page
+            num_page: index of the page (starting at 1)
+
+        Return:
+            continuation slide of the page
+
+        """
+
+        from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+        while len(self.cur_pages) < num_page:
+            prs_page = self.prs.slides.add_slide(prs_slide.slide_layout)
+
+            # Move slide after the previous slide of the table
+            sldIdLst = self.prs.slides._sldIdLst
+            sldId = sldIdLst[-1]
+            if self.cur_sldId is None:
+                rId = self.prs.part.relate_to(prs_slide.part, RT.SLIDE)
+                self.cur_sldId = next(elem for elem in sldIdLst
+                        if elem.rId == rId)
+
+            self.cur_sldId.addnext(sldId)
+            self.cur_sldId = sldId
+            self.cur_pages.append(prs_page)
+
+        return self.cur_pages[num_page-1]
+
+    def _add_table(self, prs_slide, table, num_col, col_weights, row_weights,
+            row_min, page_rows=None):
+        """ Add table with the cells of a grid to the slide
+
+        The XML of the whole table (a:tbl) is written at once instead of
+        creating the table through python-pptx and then setting each cell,
+        column and row through python-pptx objects, which is slow for
+        tables with many cells. The XML is the same as when the table is
+        created by shapes.add_table() and filled with _prs_insert_text().
+
+        Cells with only text (values and dates) are written directly into
+        the XML. The other cells (e.g. with links, which add relationships
+        to the slide) are filled through the python-pptx cell once the
+        table is created.
+
+        Args:
+            prs_slide: presentation slide where the table is added
+            table: 2-dimensional array of cell entries (rows may be shorter
+                than num_col and cells may be None)
+            num_col: number of columns in the table
+            col_weights: relative widths of the columns
+            row_weights: relative heights of the rows
+            row_min: True to give all rows the minimum height
+
+        Kwargs:
+            page_rows: number of rows sharing the height of the placeholder
+                (rows of a page of a paginated table), None for the rows of
+                the table
+
+        """
+
+        from xml.sax.saxutils import escape
+        from pptx.oxml import parse_xml
+        from pptx.oxml.ns import nsdecls
+        from pptx.oxml.table import CT_Table
+        from pptx.table import _Cell
+
+        left, top, width, height = self.cur_geometry
+        num_row = len(table)
+
+        if page_rows is None:
+            page_rows = num_row
+
+        # Total width of the columns and height of the rows of a table
+        # created by shapes.add_table() (the placeholder size split evenly,
+        # rounded down by python-pptx), which the weights are applied to
+        default_tbl = CT_Table.new_tbl(1, num_col, width, height)
+        tot_width = sum(grid_col.w
+                for grid_col in default_tbl.tblGrid.gridCol_lst)
+
+        tot_height = 0
+        if page_rows > 0:
+            default_tbl = CT_Table.new_tbl(page_rows, 1, width, height)
+            tot_height = sum(tr.h for tr in default_tbl.tr_lst)
+
+        # Any unspecified columns have a weight of 1, the columns share the
+        # width of the placeholder
+        col_weights = [col_weights[i] if i < len(col_weights) else 1
+                for i in range(num_col)]
+        tot_weight = sum(col_weights)
+        col_widths = [int(tot_width * weight / tot_weight)
+                for weight in col_weights]
+
+        # Any unspecified rows have a weight of 1, the rows share the height
+        # of the placeholder (all rows are set to 1 for minimum height)
+        if row_min:
+            row_heights = [1] * num_row
+        else:
+            row_weights = [row_weights[i] if i < len(row_weights) else 1
+                    for i in range(max(num_row, page_rows))]
+            tot_weight = sum(row_weights[:page_rows])
+            row_heights = [int(tot_height * weight / tot_weight)
+                    for weight in row_weights[:num_row]]
+
+        empty_tc = '<a:tc><a:txBody><a:bodyPr/><a:lstStyle/><a:p/>'\
+                '</a:txBody><a:tcPr/></a:tc>'
+
+        # Write XML of table
+        xml = ['<a:tbl {}><a:tblPr firstRow="1" bandRow="1"><a:tableStyleId>'\
+                '{{5C22544A-7EE6-4342-B048-85BDC9FD1C3A}}</a:tableStyleId>'\
+                '</a:tblPr><a:tblGrid>'.format(nsdecls("a"))]
+        xml.extend('<a:gridCol w="{}"/>'.format(w) for w in col_widths)
+        xml.append('</a:tblGrid>')
+
+        other_cells = []
+        for i,row in enumerate(table):
+            xml.append('<a:tr h="{}">'.format(row_heights[i]))
+
+            for j in range(num_col):
+                # Some rows may not contain all columns, cells may be empty
+                if (j >= len(row) or row[j] is None):
+                    xml.append(empty_tc)
+                    continue
+
+                text = self._get_cell_text(row[j])
+
+                # Fill cells with other elements once table is created
+                if text is None:
+                    other_cells.append((i, j, row[j]))
+                    xml.append(empty_tc)
+                    continue
+
+                xml.append('<a:tc><a:txBody><a:bodyPr/><a:lstStyle/><a:p>'\
+                        '<a:pPr/>')
+                if text != "":
+                    xml.append('<a:r><a:t>{}</a:t></a:r>'.format(escape(
+                        escape_ctrl_chars(text))))
+                xml.append('</a:p></a:txBody><a:tcPr/></a:tc>')
+
+            xml.append('</a:tr>')
+
+        xml.append('</a:tbl>')
+
+        # Create table shape and replace its table with the written table
+        graphic_frame = prs_slide.shapes.add_table(1, 1, left, top, width,
+                height)
+        graphic_data = graphic_frame._element.graphic.graphicData
+        graphic_data.replace(graphic_data.tbl, parse_xml("".join(xml)))
+
+        # Size of table is the total size of the columns and rows
+        graphic_frame.width = sum(col_widths)
+        graphic_frame.height = sum(row_heights)
+
+        # Add text from element to the remaining cells (rows of the table
+        # are only listed once, table.cell() lists them for every cell)
+        prs_table = graphic_frame.table
+        tr_lst = graphic_data.tbl.tr_lst
+        for i,j,entry in other_cells:
+            prs_cell = _Cell(tr_lst[i].tc_lst[j], prs_table)
+            paragraphs = ParagraphWriter(prs_cell.text_frame)
+            self._prs_insert_text(entry, 0, 0, paragraphs)
+            paragraphs.flush()
+
+    def _get_cell_text(self, entry):
+        """ Get the text of a table cell that only contains text
+
+        Args:
+            entry: PreprocessorEntry of the cell
+
+        Return:
+            text of the cell as _prs_insert_text() would add it, None if the
+            cell has elements other than values and dates
+
+        """
+
+        fragments = []
+
+        for sub in entry.data:
+            if (sub.which == "value"):
+                fragments.append(str(sub.value))
+            elif (sub.tag == "date"):
+                fragments.append(datetime.datetime.now().strftime("%B %d, %Y"))
+            else:
+                return None
+
+        return "".join(fragments)
+
+    def _import(self, entry):
+        """ Import data from file for presentation
+
+        Read the file based on the extension (.csv, .xlsx) and return an
+        array of entries containing the data that is read. The name of the
+        file is specified as the value of the import element.
+
+        For each file category, attributes can be used to specify which
+        data should be imported:
+
+            Spreadsheet(.csv/.xlsx)
+                row: may be a single value, range, or list to indicate which
+                    rows should be imported
+                col: may be a single value, range, or list to indicate which
+                    columns should be imported
+
+        Args:
+            entry: PreprocessorEntry with text data
+
+        Return:
+            2 dimensional array of entries containing the imported data
+
+        """
+
+        importer, num_row, num_col, error_info = self._get_importer(entry)
+        path_file = importer.filename
+
+        # Get spreadsheet data
+        error = False
+        entries = [[]]
+        try:
+            entries = importer.read()
+        except (IndexError, KeyError) as err:
+            error = True
+
+            # Add error message
+            msg = "{} \"{}\": {}".format(err.args[1],
+                    err.args[2], err.args[0])
+        except ValueError as err:
+            error = True
+
+            # Add error message
+            msg = "{}".format(err.args[0])
+
+        # Add error message to dictionary
+        if error:
+            self._add_import_error(path_file, error_info, msg)
+
+        # Get number of rows from importer if not set
+        if num_row is None:
+            num_row = importer.num_row
+
+            if num_row is None:
+                num_row = 1
+
+        # Get number of columns from importer if not set
+        if num_col is None:
+            num_col = importer.num_col
+
+            if num_col is None:
+                num_col = 1
+
+        # Create temporary PreprocessEntry for any unspecified cells (it
+        # isn't added to the import entry, so the entry can be imported
+        # again, e.g. on continuation slides)
+        tmp = PreprocessorEntry(entry.tag, elem=entry.elem, value="N/A")
+        tmp.parent = entry
+
+        # Ensure size of entries matches number of columns and rows
+        valid_entries = []
+        for i in range(0, num_row):
+            valid_entries.append([])
+
+            for j in range(0, num_col):
+                if (len(entries) > i and len(entries[i]) > j):
+                    valid_entries[i].append(entries[i][j])
+                else:
+                    valid_entries[i].append(tmp)
+
+        # Check for change in size of rows
+        if (len(valid_entries) != len(entries)):
+            msg = "row number mismatch: expected {}, got {}"\
+                "".format(len(valid_entries), len(entries))
+            self._add_import_error(path_file, error_info, msg)
+
+        # Check for change in size of columns
+        entries_col = (0 if len(entries) == 0 else len(entries[0]))
+        if (len(valid_entries[0]) != entries_col):
+            msg = "column number mismatch: expected {}, got {}"\
+                "".format(len(valid_entries), entries_col)
+            self._add_import_error(path_file, error_info, msg)
+
+        return valid_entries
+
+    def _iter_import(self, entry):
+        """ Import data from file one row at a time
+
+        Same as _import(), but the rows are read from the file as they are
+        needed (see ImportSpreadsheet.iter_rows()), so a large import is
+        never held in memory. Rows are only padded when the number of rows
+        is set with the num_row attribute, since the size of the data isn't
+        known before it is read. Every row has the number of columns set
+        with the num_col attribute, or else of the first row (rows are
+        padded or cut), as the rows returned by _import().
+
+        Args:
+            entry: PreprocessorEntry with text data
+
+        Yields:
+            list of entries for each imported row
+
+        """
+
+        importer, num_row, num_col, error_info = self._get_importer(entry)
+        path_file = importer.filename
+
+        # Create temporary PreprocessEntry for any unspecified cells (it
+        # isn't added to the import entry, so the entry can be imported
+        # again, e.g. on continuation slides)
+        tmp = PreprocessorEntry(entry.tag, elem=entry.elem, value="N/A")
+        tmp.parent = entry
+
+        got_row = 0
+        got_col = 0
+        rows = importer.iter_entries()
+        while True:
+            try:
+                irow = next(rows)
+            except StopIteration:
+                break
+            except (IndexError, KeyError) as err:
+                self._add_import_error(path_file, error_info,
+                        "{} \"{}\": {}".format(err.args[1], err.args[2],
+                            err.args[0]))
+                break
+            except ValueError as err:
+                self._add_import_error(path_file, error_info,
+                        "{}".format(err.args[0]))
+                break
+
+            got_row += 1
+            if got_row == 1:
+                got_col = len(irow)
+
+            # Leave out rows after the expected number of rows
+            if num_row is not None and got_row > num_row:
+                continue
+
+            # Ensure size of row matches number of columns
+            row_col = got_col if num_col is None else num_col
+            if len(irow) != row_col:
+                irow = irow[:row_col] + [tmp] * (row_col - len(irow))
+
+            yield irow
+
+        # Check for change in size of rows and columns
+        if num_row is not None and got_row != num_row:
+            self._add_import_error(path_file, error_info,
+                    "row number mismatch: expected {}, got {}"\
+                    "".format(num_row, got_row))
+
+        if num_col is not None and got_col != num_col:
+            self._add_import_error(path_file, error_info,
+                    "column number mismatch: expected {}, got {}"\
+                    "".format(num_col, got_col))
+
+        # Add missing rows (at least one row when nothing was read)
+        if num_row is None:
+            num_row = 1
+
+        for i in range(got_row, num_row):
+            yield [tmp] * (num_col or got_col or 1)
+
+    def _get_importer(self, entry):
+        """ Create the importer of an import entry
+
+        Args:
+            entry: PreprocessorEntry of the import
+
+        Return:
+            tuple of (importer, num_row, num_col, error_info), where
+            num_row and num_col are the expected number of rows and columns
+            (None when not set) and error_info is the location of the import
+            for error messages
+
+        """
+
+        # Get filename from entry
+        path_file = pathlib.Path(entry.get_values(join=True))
+
+        # Determine type of file and open appropriate importer
+        importer = ImportSpreadsheet.from_file(str(path_file), entry=entry,
+                cache=self.import_cache)
+
+        if importer is None:
+            raise ValueError("invalid import suffix \"{}\"\n{}"\
+                    "".format(path_file.suffix, self.ppp.error_info(entry)))
+
+        num_row = None
+        num_col = None
+
+        for child in entry.data:
+            # Ignore value entries (we already have filename
+            if (child.which == "value"):
+                continue
+
+            # Get number of rows expected
+            elif (child.tag == "num_row"):
+                num_row = int(child.get_values(join=True))
+
+            # Get number of columns expected
+            elif (child.tag == "num_col"):
+                num_col = int(child.get_values(join=True))
+
+            # Get row/col specs, keys and sheet
+            elif importer.add_spec(child, self.ppp.error_info):
+                continue
+
+            # Invalid child element
+            else:
+                raise ValueError("invalid import attribute \"{}\"\n{}"\
+                        "".format(child.tag, self.ppp.error_info(child)))
+
+        error_info = "{}, element {} on line {}".format(self.ppp.source,
+                entry.tag, entry.elem._start_line_number)
+
+        return importer, num_row, num_col, error_info
+
+    def _add_import_error(self, filename, error_info, msg):
+        """ Add error message of an import to the invalid imports
+
+        Args:
+            filename: path of the import source
+            error_info: location of the import element
+            msg: error message
+
+        """
+
+        lines = self.invalid_imports.setdefault(filename, {})
+        lines.setdefault(error_info, []).append(msg)
+
+class ParagraphWriter(object):
+    """ Paragraphs of a text frame that are written in one pass
+
+    python-pptx builds a new list of the paragraphs of a text frame every
+    time the paragraphs are accessed, so adding paragraphs one at a time
+    by index takes time proportional to the square of the number of
+    paragraphs (e.g. for lists with thousands of items).
+
+    This class keeps the paragraphs in a list. New paragraphs (a:p) are
+    created as they are needed, with their level set, and are added to the
+    text body together by flush() once all the text is written.
+
+    """
+
+    def __init__(self, text_frame):
+        from pptx.text.text import _Paragraph
+
+        self.text_frame = text_frame
+        self.paragraph_class = _Paragraph
+        self.paragraphs = list(text_frame.paragraphs)
+        self.new_p = []
+
+    def get(self, para, level):
+        """ Get paragraph by index and set its level
+
+        Paragraphs are created up to the index when they don't exist.
+
+        Args:
+            para: index of the paragraph
+            level: indent level of the paragraph
+
+        Return:
+            python-pptx paragraph object
+
+        """
+
+        from pptx.oxml.xmlchemy import OxmlElement
+
+        while (len(self.paragraphs) < para + 1):
+            p = OxmlElement("a:p")
+            self.new_p.append(p)
+            self.paragraphs.append(self.paragraph_class(p, self.text_frame))
+
+        prs_para = self.paragraphs[para]
+        prs_para.level = level
+
+        return prs_para
+
+    def flush(self):
+        """ Add the new paragraphs to the end of the text body """
+
+        self.text_frame._txBody.extend(self.new_p)
+        self.new_p = []
+
+
+class BufferedRows(object):
+    """ Rows of an iterator that can be read ahead
+
+    The first rows can be read before the rows are iterated over (e.g. to
+    find the size of a table before it is written). The rows that are read
+    ahead are kept and returned first when iterating over the rows.
+
+    """
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buffer = []
+
+    def head(self, num):
+        """ Read the first rows ahead
+
+        Args:
+            num: number of rows to read
+
+        Return:
+            list of at most num first rows
+
+        """
+
+        while len(self.buffer) < num:
+            try:
+                self.buffer.append(next(self.rows))
+            except StopIteration:
+                break
+
+        return self.buffer[:num]
+
+    def __iter__(self):
+        buffer, self.buffer = self.buffer, []
+
+        for row in buffer:
+            yield row
+
+        for row in self.rows:
+            yield row
+
+
+class DiskCache(object):
+    """ Persistent cache of data stored in files under a directory
+
+    Data is stored as bytes in a file per entry, grouped by namespace
+    (e.g. "imports") into sub-directories of the cache directory. The file
+    name is the SHA1 of the entry key, so keys should include anything that
+    invalidates the data (e.g. modification time and size of a source file).
+
+    The modification time of an entry is updated every time it is used.
+    When the total size of the cache is larger than max_size bytes, the
+    least recently used entries are removed.
+
+    """
+
+    # Marks values stored as tagged tuples by encode()
+    tag = b"\x00pptx-creator"
+
+    def __init__(self, path, max_size=None):
+        self.path = pathlib.Path(path)
+        self.max_size = max_size
+        self.size = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def encode(cls, data):
+        """ Serialize data to store in an entry
+
+        Data is serialized with marshal, which (unlike pickle) can't run
+        code when the data is loaded, so entries written to a shared cache
+        directory by someone else can't run code in the build. marshal only
+        supports the built-in types, so when the data holds other values
+        (e.g. dates of spreadsheet cells or lengths of python-pptx), dates,
+        times and durations are stored as tagged tuples and subclasses of
+        the built-in types as the built-in type.
+
+        Args:
+            data: data made of built-in types, dates, times and durations
+
+        Return:
+            compressed bytes of the data
+
+        """
+
+        try:
+            blob = b"M" + marshal.dumps(data)
+        except ValueError:
+            blob = b"T" + marshal.dumps(cls._to_builtin(data))
+
+        return zlib.compress(blob)
+
+    @classmethod
+    def decode(cls, blob):
+        """ Deserialize data stored by encode()
+
+        Args:
+            blob: bytes of an entry
+
+        Return:
+            data of the entry or None when the entry isn't valid (e.g.
+            written by an older version)
+
+        """
+
+        try:
+            blob = zlib.decompress(blob)
+            if blob[:1] not in (b"M", b"T"):
+                return None
+            data = marshal.loads(blob[1:])
+        except (zlib.error, ValueError, EOFError, TypeError):
+            return None
+
+        if blob[:1] == b"T":
+            data = cls._from_builtin(data)
+
+        return data
+
+    @classmethod
+    def _to_builtin(cls, data):
+        # Convert values that marshal doesn't support
+        if data is None or type(data) in (bool, int, float, str, bytes):
+            return data
+        elif isinstance(data, tuple):
+            return tuple(cls._to_builtin(val) for val in data)
+        elif isinstance(data, list):
+            return [cls._to_builtin(val) for val in data]
+        elif isinstance(data, dict):
+            return {cls._to_builtin(key):cls._to_builtin(val)
+                    for key,val in data.items()}
+        elif isinstance(data, datetime.datetime):
+            return (cls.tag, "datetime", data.isoformat())
+        elif isinstance(data, datetime.date):
+            return (cls.tag, "date", data.isoformat())
+        elif isinstance(data, datetime.time):
+            return (cls.tag, "time", data.isoformat())
+        elif isinstance(data, datetime.timedelta):
+            return (cls.tag, "timedelta", (data.days, data.seconds,
+                data.microseconds))
+
+        for kind in (bool, int, float, str, bytes):
+            if isinstance(data, kind):
+                return kind(data)
+
+        raise ValueError("can't store value of type {} in cache"\
+                "".format(type(data).__name__))
+
+    @classmethod
+    def _from_builtin(cls, data):
+        # Restore values converted by _to_builtin()
+        if isinstance(data, tuple):
+            if len(data) == 3 and data[0] == cls.tag:
+                if data[1] == "datetime":
+                    return datetime.datetime.fromisoformat(data[2])
+                elif data[1] == "date":
+                    return datetime.date.fromisoformat(data[2])
+                elif data[1] == "time":
+                    return datetime.time.fromisoformat(data[2])
+                elif data[1] == "timedelta":
+                    return datetime.timedelta(*data[2])
+
+            return tuple(cls._from_builtin(val) for val in data)
+        elif isinstance(data, list):
+            return [cls._from_builtin(val) for val in data]
+        elif isinstance(data, dict):
+            return {cls._from_builtin(key):cls._from_builtin(val)
+                    for key,val in data.items()}
+
+        return data
+
+    def _entry_path(self, namespace, key):
+        name = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return self.path.joinpath(namespace, name)
+
+    def has(self, namespace, key):
+        """ Determine whether an entry exists in the cache
+
+        Args:
+            namespace: group of the entry (e.g. "imports")
+            key: key of the entry
+
+        Return:
+            True if the entry exists
+
+        """
+
+        return self._entry_path(namespace, key).exists()
+
+    def get(self, namespace, key):
+        """ Get the data of an entry
+
+        Args:
+            namespace: group of the entry (e.g. "imports")
+            key: key of the entry
+
+        Return:
+            bytes stored for the entry or None when it doesn't exist
+
+        """
+
+        path = self._entry_path(namespace, key)
+
+        try:
+            with open(str(path), "rb") as f:
+                data = f.read()
+            os.utime(str(path), None)
+        except (IOError, OSError):
+            return None
+
+        return data
+
+    def set(self, namespace, key, data):
+        """ Store the data of an entry
+
+        The entry is written to a temporary file which is then renamed, so
+        a partially written entry is never read by another process. The
+        temporary file has a unique name, so threads and processes writing
+        the same entry at once don't write to the same file.
+
+        Args:
+            namespace: group of the entry (e.g. "imports")
+            key: key of the entry
+            data: bytes to store
+
+        """
+
+        path = self._entry_path(namespace, key)
+
+        if not path.parent.exists():
+            os.makedirs(str(path.parent), exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(dir=str(path.parent),
+                prefix=path.name + ".", suffix=".tmp", delete=False) as f:
+            f.write(data)
+
+        # Size of the entry that is replaced
+        try:
+            old_size = path.stat().st_size
+        except OSError:
+            old_size = 0
+
+        try:
+            os.replace(f.name, str(path))
+        except OSError:
+            os.unlink(f.name)
+            raise
+
+        # Remove least recently used entries when the cache is too large
+        if self.max_size is not None:
+            with self.lock:
+                if self.size is None:
+                    self.size = sum(e[2] for e in self.entries())
+                else:
+                    self.size += len(data) - old_size
+
+                if self.size > self.max_size:
+                    self.prune()
+
+    def entries(self):
+        """ Get all the entries in the cache
+
+        Return:
+            list of (path, namespace, size, mtime) for each entry sorted
+            from least to most recently used
+
+        """
+
+        entries = []
+
+        if not self.path.is_dir():
+            return entries
+
+        for ns_path in self.path.iterdir():
+            if not ns_path.is_dir():
+                continue
+
+            for path in ns_path.iterdir():
+                if path.suffix == ".tmp":
+                    continue
+
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+
+                entries.append((path, ns_path.name, stat.st_size,
+                    stat.st_mtime))
+
+        entries.sort(key=lambda e: e[3])
+
+        return entries
+
+    def stats(self):
+        """ Get the number of entries and size of each namespace
+
+        Return:
+            dictionary from namespace to (number of entries, size in bytes)
+
+        """
+
+        stats = {}
+
+        for path, namespace, size, mtime in self.entries():
+            count, total = stats.get(namespace, (0, 0))
+            stats[namespace] = (count + 1, total + size)
+
+        return stats
+
+    def prune(self, max_size=None):
+        """ Remove least recently used entries
+
+        Args:
+            max_size: size in bytes that the cache should not exceed
+                (defaults to the max_size of the cache)
+
+        Return:
+            number of entries removed
+
+        """
+
+        if max_size is None:
+            max_size = self.max_size
+
+        entries = self.entries()
+        total = sum(e[2] for e in entries)
+        removed = 0
+
+        for path, namespace, size, mtime in entries:
+            if max_size is not None and total <= max_size:
+                break
+
+            try:
+                path.unlink()
+            except OSError:
+                continue
+
+            total -= size
+            removed += 1
+
+        self.size = total
+
+        return removed
+
+
+class ImageInfo(object):
+    """ Image data and the metadata needed to add it to a presentation
+
+    Holds the bytes of an image with its SHA1, size in pixels, resolution
+    (dpi), content type and extension, so that an image can be added to
+    many slides without reading, hashing or parsing it again.
+
+    """
+
+    def __init__(self, blob, filename, sha1, size, dpi, content_type, ext):
+        self.blob = blob
+        self.filename = filename
+        self.sha1 = sha1
+        self.size = size
+        self.dpi = dpi
+        self.content_type = content_type
+        self.ext = ext
 
-        # Iterate through rows
-        for row in entry.data:
-            if (row.which == "value"):
-                raise ValueError("invalid value \"{}\" in table "\
-                        "placeholder, expected row element.\n{}"\
-                        "".format(row.value, self.ppp.error_info(row)))
+    @classmethod
+    def from_blob(cls, blob, filename, meta=None):
+        """ Create ImageInfo for image data
 
-            # Setting element -> to specify table settings
-            if (row.tag == "setting"):
-                curw_col = -1
-                curw_row = -1
+        Args:
+            blob: bytes of the image
+            filename: file name of the image (used as the description)
 
-                for setting in row.data:
-                    if (setting.which == "value"):
-                        raise ValueError("invalid value \"{}\" in setting "\
-                                "element, expected setting element.\n{}"\
-                                "".format(setting.value, self.ppp.error_info(setting)))
+        Kwargs:
+            meta: metadata previously returned by get_meta(), when not
+                provided the image is hashed and its header is parsed
 
-                    # column element -> to specify specific column's weight
-                    elif (setting.tag == "col"):
+        Return:
+            ImageInfo for the image
 
-                        # Add new empty weight entry to weights array
-                        curw_col += 1
-                        if len(col_weights) <= curw_col:
-                            col_weights.insert(curw_col, 1)
+        """
 
-                        for spec in setting.data:
-                            if (spec.which == "value"):
-                                raise ValueError("invalid value \"{}\" in setting "\
-                                        "element, expected spec element.\n{}"\
-                                        "".format(spec.value, self.ppp.error_info(setting)))
+        if meta is None:
+            from pptx.parts.image import Image as PptxImage
 
-                            # Add weights to array
-                            elif (spec.tag == "weight"):
-                                col_weights[curw_col] = float(spec.get_values(join = True))
+            image = PptxImage.from_blob(blob, filename)
+            meta = (image.sha1, image.size, image.dpi, image.content_type,
+                    image.ext)
 
-                    # column element -> to specify specific column's weight
-                    elif (setting.tag == "row"):
+        return cls(blob, filename, *meta)
 
-                        # Add new empty weight entry to weights array
-                        curw_row += 1
-                        if len(row_weights) <= curw_row:
-                            row_weights.insert(curw_row, 1)
+    def get_meta(self):
+        """ Get the metadata of the image (everything except the data) """
 
-                        for spec in setting.data:
-                            if (spec.which == "value"):
-                                raise ValueError("invalid value \"{}\" in setting "\
-                                        "element, expected spec element.\n{}"\
-                                        "".format(spec.value, self.ppp.error_info(setting)))
+        return (self.sha1, self.size, self.dpi, self.content_type, self.ext)
 
-                            # Add weights to array
-                            elif (spec.tag == "weight"):
-                                temp = spec.get_values(join = True)
-                                try:
-                                    row_weights[curw_row] = float(temp)
-                                except ValueError as err:
-                                    if temp == "min":
-                                        row_min = True
-                                    else:
-                                        raise err
+    @property
+    def native_size(self):
+        """ Size of the image in EMU based on its size in pixels and dpi """
 
-                    # Invalid element
-                    else:
-                        raise ValueError("invalid element \"{}\" in table "\
-                                "setting, expected setting element.\n{}"\
-                                "".format(setting.tag, self.ppp.error_info(setting)))
+        return (int(914400 * self.size[0] / self.dpi[0]),
+                int(914400 * self.size[1] / self.dpi[1]))
 
 
-            # Row element of table
-            elif (row.tag == "row"):
-                # Initialize new row in array
-                cur_row += 1
-                cur_col = -1
-                if len(table) <= cur_row:
-                    table.insert(cur_row, [])
+class ImageCache(object):
+    """ Cache of image files used in a build
 
-                # Iterate through columns
-                for col in row.data:
-                    if (col.which == "value"):
-                        raise ValueError("invalid value \"{}\" in table "\
-                                "placeholder, expected cell element.\n{}"\
-                                "".format(row.value, self.ppp.error_info(col)))
+    Images are read and probed (hashed and header parsed) once and shared
+    by every placeholder that uses them. Images may be loaded concurrently
+    before the slides are created.
 
-                    # Find where to insert next cell
-                    while(True):
-                        cur_col += 1
+    Images are keyed by path plus the modification time and size of the
+    file, so a file that changes is loaded again. When a DiskCache is
+    provided, the image metadata is also stored on disk so that later runs
+    only need to read the file.
 
-                        # Add data if at end of row
-                        if len(table[cur_row]) <= cur_col:
-                            table[cur_row].append(None)
-                            break
+    """
 
-                        # Add data if current cell is empty
-                        elif table[cur_row][cur_col] is None:
-                            break
+    # DiskCache namespace used for image metadata
+    namespace = "image-info"
 
-                    # Add cell entry to table array
-                    if (col.tag == "cell"):
-                        table[cur_row][cur_col] = col
+    def __init__(self, disk=None):
+        self.images = {}
+        self.disk = disk
 
-                    # Add import entries to table array
-                    elif (col.tag == "import"):
-                        next_col = cur_col - 1
+    def get(self, path):
+        """ Get the data and metadata of an image
 
-                        # Add entries to table without changing cur_row
-                        for i,irow in enumerate(self._import(col)):
-                            if len(table) <= cur_row + i:
-                                table.append([])
+        Args:
+            path: path to the image file
 
-                            # Add preceding cells when cur_col != 0
-                            row_len = len(table[cur_row + i])
-                            if (row_len < cur_col):
-                                for j in range(row_len,cur_col):
-                                    table[cur_row + i].append(None)
+        Return:
+            ImageInfo for the image or None when the file doesn't exist
 
-                            # Insert entries into table
-                            for j,icol in enumerate(irow):
-                                if (len(table[cur_row+i]) <= cur_col + j):
-                                    table[cur_row + i].append(icol)
-                                else:
-                                    table[cur_row + i][cur_col + j] = icol
+        """
 
-                                # Determine in which column the import ends
-                                if (j == 0):
-                                    next_col += 1
+        try:
+            stat = os.stat(path)
+        except (IOError, OSError):
+            return None
 
-                        cur_col = next_col
+        stamp = (stat.st_mtime, stat.st_size)
 
-                    # Invalid element
-                    else:
-                        raise ValueError("invalid element \"{}\" in table "\
-                                "row, expected cell element.\n{}"\
-                                "".format(col.tag, self.ppp.error_info(col)))
+        try:
+            image_stamp, image = self.images[path]
+        except KeyError:
+            pass
+        else:
+            if image_stamp == stamp:
+                return image
 
-                # Update max_col count
-                if (len(table[cur_row]) > max_col+1):
-                    max_col = len(table[cur_row]) - 1
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+        except (IOError, OSError):
+            return None
 
-            # Add import entries to table array
-            elif (row.tag == "import"):
+        # Get metadata from disk cache or by probing the image
+        key = (str(pathlib.Path(path).resolve()),) + stamp
+        meta = None
+        if self.disk is not None:
+            data = self.disk.get(self.namespace, key)
+            if data is not None:
+                meta = DiskCache.decode(data)
 
-                # Add entries to table and change cur_row
-                for irow in self._import(row):
-                    cur_row += 1
-                    if len(table) <= cur_row:
-                        table.insert(cur_row, [])
+        image = ImageInfo.from_blob(blob, os.path.basename(path), meta=meta)
 
-                    for icol in irow:
-                        table[cur_row].append(icol)
+        if self.disk is not None and meta is None:
+            self.disk.set(self.namespace, key,
+                    DiskCache.encode(image.get_meta()))
+
+        self.images[path] = (stamp, image)
+
+        return image
+
+
+class ImageResampler(object):
+    """ Downscale images to the size they are displayed at
 
+    Images are resampled so that they fit the size of their placeholder at
+    the requested resolution (dpi), which keeps large photos from being
+    embedded at full size. The EXIF orientation of the image is applied
+    and the image is re-encoded as JPEG (for JPEG images) or PNG.
+
+    Resampled images are stored in memory for the build and, when a
+    DiskCache is provided, on disk keyed by the SHA1 of the source image
+    and the target size.
+
+    """
+
+    # DiskCache namespace used for resampled images
+    namespace = "images"
+
+    def __init__(self, dpi, disk=None):
+        self.dpi = dpi
+        self.disk = disk
+        self.images = {}
+
+        # Error messages of images that couldn't be resampled
+        self.failed = {}
+
+    def key(self, image, width, height):
+        """ Get the cache key for the image resampled to a size
+
+        Args:
+            image: ImageInfo of the source image
+            width: width of the target area in EMU
+            height: height of the target area in EMU
+
+        Return:
+            tuple used to look up the resampled image
+
+        """
+
+        return (image.sha1, int(width), int(height), self.dpi)
+
+    def get(self, image, width, height, errors=None):
+        """ Get the image resampled to fit the target area
+
+        Images that can't be resampled (e.g. truncated files) are used
+        unchanged and aren't stored in the disk cache.
+
+        Args:
+            image: ImageInfo of the source image
+            width: width of the target area in EMU
+            height: height of the target area in EMU
+
+        Kwargs:
+            errors: list the error message is appended to when the image
+                can't be resampled
+
+        Return:
+            ImageInfo of the resampled image (image when it is used
+            unchanged)
+
+        """
+
+        key = self.key(image, width, height)
+
+        if key not in self.images:
+            data = None
+            if self.disk is not None:
+                data = self.disk.get(self.namespace, key)
+
+            if data is None:
+                from PIL import Image
+
+                try:
+                    data = resample_image(image.blob, width, height,
+                            self.dpi)
+                except (OSError, ValueError, Image.DecompressionBombError) \
+                        as err:
+                    self.failed[key] = str(err) or repr(err)
+                else:
+                    self._store(key, data)
+
+            self._add(key, image, data)
+
+        if key in self.failed and errors is not None:
+            errors.append(self.failed[key])
+
+        return self.images[key]
+
+    def prefetch(self, images, jobs=1):
+        """ Resample images concurrently
+
+        Args:
+            images: list of (image, width, height) of each image to resample
+
+        Kwargs:
+            jobs: number of processes used to resample the images
+
+        """
+
+        pending = {}
+        for image,width,height in images:
+            key = self.key(image, width, height)
+
+            if key in self.images or key in pending:
+                continue
+
+            data = None
+            if self.disk is not None:
+                data = self.disk.get(self.namespace, key)
+
+            if data is not None:
+                self._add(key, image, data)
             else:
-                raise ValueError("invalid element \"{}\" in table, "\
-                        "expected row element.\n{}"\
-                        "".format(row.tag, self.ppp.error_info(row)))
+                pending[key] = (image, width, height)
 
-        # Create table on slide at location of placeholder
-        prs_table = prs_slide.shapes.add_table(len(table), max_col+1,
-                prs_ph.left, prs_ph.top, prs_ph.width, prs_ph.height).table
+        if len(pending) == 0:
+            return
 
-        # remove placeholder from slide
-        elem = prs_ph.element
-        elem.getparent().remove(elem)
+        # Resample in this process when there is no parallelism to gain
+        if jobs <= 1 or len(pending) == 1:
+            for key,(image,width,height) in pending.items():
+                self.get(image, width, height)
+            return
 
-        # place text into table
-        for i in range(0,len(table)):
-            for j in range(0,max_col+1):
-                # Some rows may not contain all columns
-                if (j >= len(table[i])):
-                    break
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) \
+                as executor:
+            futures = {executor.submit(resample_image, image.blob, width,
+                height, self.dpi): key
+                for key,(image,width,height) in pending.items()}
 
-                # Some cells may be empty
-                elif (table[i][j] is None):
+            for future in concurrent.futures.as_completed(futures):
+                key = futures[future]
+                try:
+                    data = future.result()
+                except Exception:
+                    # Resampled again (and the error is reported) when the
+                    # image is used
                     continue
 
-                # Add text from element to cell
-                self._prs_insert_text(table[i][j], 0, 0, prs_table.cell(i,j))
+                self._store(key, data)
+                self._add(key, pending[key][0], data)
 
-        # Set column weights based on text and user request
-        tot_weight = 0
-        tot_width = 0
-        prs_cols = prs_table.columns
-        for i in range(0,len(prs_cols)):
-            # Any unspecified columns have a weight of 1
-            if len(col_weights) <= i:
-                col_weights.insert(i,1)
+    def _add(self, key, image, data):
+        # Add resampled image (empty or None when unchanged) to the images
+        if data:
+            image = ImageInfo.from_blob(data, image.filename)
 
-            tot_weight = tot_weight + col_weights[i]
-            tot_width  = tot_width  + prs_cols[i].width
+        self.images[key] = image
 
-        for i in range(0,len(prs_cols)):
-            prs_cols[i].width = int(tot_width * col_weights[i] / tot_weight)
+        return image
 
-        # Set row weights based on text and user request
-        tot_weight = 0
-        tot_height = 0
-        prs_rows = prs_table.rows
-        for i in range(0,len(prs_rows)):
-            # Any unspecified rows have a weight of 1
-            if len(row_weights) <= i:
-                row_weights.insert(i,1)
-
-            # Set so that all rows are set to 1 for height
-            if row_min:
-                row_weights[i] = 1
-                tot_weight  = tot_weight + row_weights[i]
-                tot_height  = tot_height + row_weights[i]
-
-            # Set so that all rows are set to height based on weight
-            else:
-                tot_weight  = tot_weight + row_weights[i]
-                tot_height  = tot_height  + prs_rows[i].height
+    def _store(self, key, data):
+        # Store resampled image in the disk cache (empty when unchanged)
+        if self.disk is not None:
+            self.disk.set(self.namespace, key, data or b"")
 
-        for i in range(0,len(prs_rows)):
-            prs_rows[i].height = int(tot_height * row_weights[i] / tot_weight)
 
-    def _import(self, entry):
-        """ Import data from file for presentation
+def resample_image(blob, width, height, dpi):
+    """ Resample image to fit inside an area
 
-        Read the file based on the extension (.csv, .xlsx) and return an
-        array of entries containing the data that is read. The name of the
-        file is specified as the value of the import element.
+    Apply the EXIF orientation of the image and downscale it so it fits
+    inside width x height EMU at dpi pixels per inch. Images are never
+    upscaled, and only JPEG and PNG images are resampled.
 
-        For each file category, attributes can be used to specify which
-        data should be imported:
+    Args:
+        blob: bytes of the source image
+        width: width of the target area in EMU
+        height: height of the target area in EMU
+        dpi: resolution of the resampled image
 
-            Spreadsheet(.csv/.xlsx)
-                row: may be a single value, range, or list to indicate which
-                    rows should be imported
-                col: may be a single value, range, or list to indicate which
-                    columns should be imported
+    Return:
+        bytes of the resampled image or None when the source image should
+        be used unchanged
+
+    """
+
+    from PIL import Image, ImageOps
+
+    img = Image.open(io.BytesIO(blob))
+    img_format = img.format
+
+    if img_format not in ("JPEG", "PNG"):
+        return None
+
+    # Rotate image based on EXIF orientation
+    orientation = img.getexif().get(0x0112, 1)
+    if orientation != 1:
+        img = ImageOps.exif_transpose(img)
+
+    # Find scale to fit the image in the target area
+    scale = min(width  / 914400.0 * dpi / img.width,
+                height / 914400.0 * dpi / img.height)
+
+    if scale >= 1 and orientation == 1:
+        return None
+
+    if scale < 1:
+        img = img.resize((max(1, int(round(img.width  * scale))),
+                          max(1, int(round(img.height * scale)))),
+                         Image.LANCZOS)
+
+    # Re-encode image
+    out = io.BytesIO()
+    icc_profile = img.info.get("icc_profile")
+
+    if img_format == "JPEG":
+        if img.mode not in ("RGB", "L", "CMYK"):
+            img = img.convert("RGB")
+
+        img.save(out, "JPEG", quality=90, dpi=(dpi, dpi),
+                icc_profile=icc_profile)
+    else:
+        img.save(out, "PNG", optimize=True, dpi=(dpi, dpi),
+                icc_profile=icc_profile)
+
+    data = out.getvalue()
+
+    # Keep the source image if it is smaller and doesn't need rotating
+    if orientation == 1 and len(data) >= len(blob):
+        return None
+
+    return data
+
+
+class ImportCache(object):
+    """ Cache of parsed import sources shared by every import in a build
+
+    Opening a spreadsheet is by far the most expensive part of an import,
+    and the same file is typically imported many times by a single input
+    XML file. This class stores the parsed form of each source file so
+    that it is only loaded once per build, no matter how many import
+    elements point at it.
+
+    Sources are keyed by resolved path plus the modification time and size
+    of the file, so a file that changes on disk is loaded again.
+
+    Files larger than stream_size bytes are not loaded whole by the
+    importers that support streaming, instead only the required rows and
+    columns are read for each import.
+
+    When a DiskCache is provided, parsed data that can be persisted is also
+    stored on disk so that later runs don't need to parse the file again.
+
+    """
+
+    # Size of files (in bytes) above which importers stream the file
+    stream_size = 16 * 1024 * 1024
+
+    # DiskCache namespace used for parsed import data
+    namespace = "imports"
+
+    def __init__(self, disk=None):
+        self.sources = {}
+        self.disk = disk
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, filename, *args):
+        """ Get the cache key for a source file
+
+        Args:
+            filename: path to the source file
+            args: any additional values that distinguish the parsed data
+                (e.g. the type of the file or the sheet name)
+
+        Return:
+            tuple used to look up the source in the cache
+
+        """
+
+        path = pathlib.Path(filename)
+        stat = path.stat()
+
+        return (str(path.resolve()), stat.st_mtime, stat.st_size) + args
+
+    def get(self, filename, kind, loader, persist=False, keep=True):
+        """ Get the parsed data for a source file
+
+        Return the cached data for the file when it is present, otherwise
+        call loader with the filename to parse the file and store the
+        result in the cache.
+
+        Args:
+            filename: path to the source file
+            kind: type of parsed data (e.g. "xlsx", "csv")
+            loader: function called with filename to parse the file
+
+        Kwargs:
+            persist: True when the parsed data can be stored in the disk
+                cache (see DiskCache.encode())
+            keep: False to only store the data in the disk cache, and not
+                keep it in memory for the rest of the build
+
+        Return:
+            parsed data returned by loader
+
+        """
+
+        key = self.key(filename, kind)
+
+        try:
+            data = self.sources[key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            return data
+
+        # Try to load parsed data from the disk cache
+        data = None
+        if persist and self.disk is not None:
+            blob = self.disk.get(self.namespace, key)
+            if blob is not None:
+                data = DiskCache.decode(blob)
+
+        if data is not None:
+            self.disk_hits += 1
+
+        # Parse the file
+        else:
+            self.misses += 1
+            data = loader(filename)
+
+            # Data with values that can't be stored is only kept in memory
+            if persist and self.disk is not None:
+                try:
+                    blob = DiskCache.encode(data)
+                except ValueError:
+                    blob = None
+
+                if blob is not None:
+                    self.disk.set(self.namespace, key, blob)
+
+        if keep:
+            self.sources[key] = data
+
+        return data
+
+    def set(self, filename, kind, data):
+        """ Store the parsed data for a source file in the cache
 
         Args:
-            entry: PreprocessorEntry with text data
-
-        Return:
-            2 dimensional array of entries containing the imported data
+            filename: path to the source file
+            kind: type of parsed data (e.g. "xlsx", "csv")
+            data: parsed data
 
         """
 
-        cat = None
+        self.sources[self.key(filename, kind)] = data
 
-        # Get filename from entry
-        path_file = pathlib.Path(entry.get_values(join=True))
+    def has(self, filename, kind):
+        """ Determine whether the parsed data for a source file is cached
 
-        # Determine type of file and open appropriate importer
-        if (path_file.suffix == ".xlsx"):
-            cat = "spreadsheet"
+        Args:
+            filename: path to the source file
+            kind: type of parsed data (e.g. "xlsx", "csv")
 
-            importer = ImportXLSX(str(path_file), entry=entry)
+        Return:
+            True if the data is in the cache (or in the disk cache)
 
-        elif (path_file.suffix == ".csv"):
-            cat = "spreadsheet"
+        """
 
-            importer = ImportCSV(str(path_file), entry=entry)
+        key = self.key(filename, kind)
 
-        else:
-            raise ValueError("invalid import suffix \"{}\"\n{}"\
-                    "".format(path_file.suffix, self.ppp.error_info(entry)))
+        if key in self.sources:
+            return True
 
-        # Spreadsheet file
-        if (cat == "spreadsheet"):
-            num_row = None
-            num_col = None
+        return self.disk is not None and self.disk.has(self.namespace, key)
 
-            for child in entry.data:
-                # Ignore value entries (we already have filename
-                if (child.which == "value"):
-                    continue
+    def clear(self):
+        """ Remove all sources from the cache
 
-                # Get number of rows expected
-                elif (child.tag == "num_row"):
-                    num_row = int(child.get_values(join=True))
+        Any source that holds an open file (e.g. a read-only workbook) is
+        closed before it is removed.
 
-                # Get number of columns expected
-                elif (child.tag == "num_col"):
-                    num_col = int(child.get_values(join=True))
+        """
 
-                # Get row spec
-                elif (child.tag == "row"):
-                    importer.add_row(child.get_values(join=True))
+        for data in self.sources.values():
+            if hasattr(data, "close"):
+                data.close()
 
-                # Get col spec
-                elif (child.tag == "col"):
-                    importer.add_col(child.get_values(join=True))
+        self.sources = {}
 
-                # Get row key
-                elif (child.tag == "row_key"):
-                    col = None
-                    re  = False
+    def release(self):
+        """ Close open sources and remove sources of changed files
 
-                    # Get associated values
-                    for attr in child.data:
-                        if (attr.which == "value"):
-                            continue
-                        elif (attr.tag == "col"):
-                            col = attr.get_values(join=True)
-                        elif (attr.tag == "re"):
-                            re = attr.get_values(join=True)
-                        else:
-                            raise ValueError("invalid row_key import "\
-                                    "attribute \"{}\"\n{}"\
-                                    "".format(attr.tag,
-                                        self.ppp.error_info(attr)))
-
-                    importer.add_row_key(child.get_values(join=True),
-                        col=col, is_re=re)
-
-                # Get col key
-                elif (child.tag == "col_key"):
-                    row = None
-                    re  = False
-
-                    # Get associated values
-                    for attr in child.data:
-                        if (attr.which == "value"):
-                            continue
-                        elif (attr.tag == "row"):
-                            row = attr.get_values(join=True)
-                        elif (attr.tag == "re"):
-                            re = attr.get_values(join=True)
-                        else:
-                            raise ValueError("invalid col_key import "\
-                                    "attribute \"{}\"\n{}"\
-                                    "".format(attr.tag,
-                                        self.ppp.error_info(attr)))
-
-                    importer.add_col_key(child.get_values(join=True),
-                        row=row, is_re=re)
-
-                # Get sheet
-                elif (child.tag == "sheet"):
-                    importer.add_sheet(child.get_values(join=True))
-
-                # Invalid child element
-                else:
-                    raise ValueError("invalid import attribute \"{}\"\n{}"\
-                            "".format(child.tag, self.ppp.error_info(child)))
+        Used at the end of a build, parsed data of files that are unchanged
+        is kept for the next build. Any source that holds an open file
+        (e.g. a read-only workbook) is closed and removed.
 
+        """
 
-            # Get spreadsheet data importer
-            error_info = "{}, element {} on line {}".format(self.ppp.source,
-                    child.parent.tag, child.elem._start_line_number)
-            error = False
-            entries = [[]]
+        for key,data in list(self.sources.items()):
             try:
-                entries = importer.read()
-            except (IndexError, KeyError) as err:
-                error = True
+                stale = self.key(key[0])[:3] != key[:3]
+            except (IOError, OSError):
+                stale = True
 
-                # Add error message
-                msg = "{} \"{}\": {}".format(err.args[1],
-                        err.args[2], err.args[0])
-            except ValueError as err:
-                error = True
+            if hasattr(data, "close"):
+                data.close()
+            elif not stale:
+                continue
 
-                # Add error message
-                msg = "{}".format(err.args[0])
+            del self.sources[key]
 
-            # Add error message to dictionary
-            if error:
-                if not str(path_file) in self.invalid_imports:
-                    self.invalid_imports[str(path_file)] = {}
 
-                if not error_info in self.invalid_imports[str(path_file)]:
-                    self.invalid_imports[str(path_file)][error_info] = []
+class SpreadsheetIndex(object):
+    """ Hash indexes of the cell text of a spreadsheet
 
-                self.invalid_imports[str(path_file)][error_info].append(msg)
+    Used to match row and column keys without searching every cell. An
+    index from cell text to rows is built for a column the first time the
+    column is searched (and from cell text to columns for a row). The cell
+    text is stripped of leading and trailing whitespace, as is done when
+    matching keys.
 
-            # Get number of rows from importer if not set
-            if num_row is None:
-                num_row = importer.num_row
+    Indexes are stored in the ImportCache with the spreadsheet data, so
+    they are reused by every import of the same file.
+
+    """
 
-                if num_row is None:
-                    num_row = 1
+    def __init__(self, data):
+        self.data = data
+        self.col_index = {}
+        self.row_index = {}
 
-            # Get number of columns from importer if not set
-            if num_col is None:
-                num_col = importer.num_col
+    def find_rows(self, col, text):
+        """ Get the rows where the cell text in a column matches text
+
+        Args:
+            col: column to search (starting at 1)
+            text: text to match
 
-                if num_col is None:
-                    num_col = 1
+        Return:
+            list of matching rows (starting at 1)
 
-            # Create temporary PreprocessEntry for any unspecified cells
-            tmp = PreprocessorEntry(entry.tag, parent=entry,
-                    elem=entry.elem, value="N/A")
+        """
 
-            # Ensure size of entries matches number of columns and rows
-            valid_entries = []
-            for i in range(0, num_row):
-                valid_entries.append([])
+        try:
+            index = self.col_index[col]
+        except KeyError:
+            index = {}
+            for r,row in enumerate(self.data):
+                if row is None or col > len(row):
+                    continue
 
-                for j in range(0, num_col):
-                    if (len(entries) > i and len(entries[i]) > j):
-                        valid_entries[i].append(entries[i][j])
-                    else:
-                        valid_entries[i].append(tmp)
+                val = row[col-1]
+                val = "" if val is None else str(val).strip()
+                index.setdefault(val, []).append(r+1)
 
-            # Check for change in size of rows
-            if (len(valid_entries) != len(entries)):
-                msg = "row number mismatch: expected {}, got {}"\
-                    "".format(len(valid_entries), len(entries))
+            self.col_index[col] = index
 
-                if not str(path_file) in self.invalid_imports:
-                    self.invalid_imports[str(path_file)] = {}
+        return index.get(text, [])
 
-                if not error_info in self.invalid_imports[str(path_file)]:
-                    self.invalid_imports[str(path_file)][error_info] = []
+    def find_cols(self, row, text):
+        """ Get the columns where the cell text in a row matches text
 
-                self.invalid_imports[str(path_file)][error_info].append(msg)
+        Args:
+            row: row to search (starting at 1)
+            text: text to match
 
-            # Check for change in size of columns
-            entries_col = (0 if len(entries) == 0 else len(entries[0]))
-            if (len(valid_entries[0]) != entries_col):
-                msg = "column number mismatch: expected {}, got {}"\
-                    "".format(len(valid_entries), entries_col)
+        Return:
+            list of matching columns (starting at 1)
 
-                if not str(path_file) in self.invalid_imports:
-                    self.invalid_imports[str(path_file)] = {}
+        """
 
-                if not error_info in self.invalid_imports[str(path_file)]:
-                    self.invalid_imports[str(path_file)][error_info] = []
+        try:
+            index = self.row_index[row]
+        except KeyError:
+            index = {}
+            if row <= len(self.data) and self.data[row-1] is not None:
+                for c,val in enumerate(self.data[row-1]):
+                    val = "" if val is None else str(val).strip()
+                    index.setdefault(val, []).append(c+1)
 
-                self.invalid_imports[str(path_file)][error_info].append(msg)
+            self.row_index[row] = index
 
-        # Invalid category
-        else:
-            raise AssertionError("invalid import category \"{}\""\
-                    "".format(cat))
+        return index.get(text, [])
 
-        return valid_entries
 
 class ImportSpreadsheet(object):
     """ Inherited by classes uses to read specific Spreadsheet file formats
@@ -1106,16 +3938,123 @@ class ImportSpreadsheet(object):
 
     """
 
-    def __init__(self, filename, filetype, entry=None):
+    # Characters that give a key special meaning as a regular expression
+    re_special = re.compile(r'[.^$*+?{}\[\]\\|()]')
+
+    def __init__(self, filename, filetype, entry=None, cache=None):
         self.filename=filename
         self.filetype=filetype
         self.entry = entry
+        self.cache = cache if cache is not None else ImportCache()
         self.data = None
+        self.data_cols = 0
+        self.data_kind = None
         self.rows = []
         self.cols = []
         self.row_keys = []
         self.col_keys = []
 
+    @staticmethod
+    def from_file(filename, entry=None, cache=None):
+        """ Create the importer for the type of a spreadsheet file
+
+        Args:
+            filename: path to the spreadsheet file (.xlsx or .csv)
+
+        Kwargs:
+            entry: PreprocessorEntry of the import (for error messages)
+            cache: ImportCache shared by the imports of a build
+
+        Return:
+            ImportXLSX or ImportCSV object, None if the suffix of the file
+            isn't supported
+
+        """
+
+        suffix = pathlib.Path(filename).suffix
+
+        if (suffix == ".xlsx"):
+            return ImportXLSX(filename, entry=entry, cache=cache)
+        elif (suffix == ".csv"):
+            return ImportCSV(filename, entry=entry, cache=cache)
+
+        return None
+
+    def add_spec(self, spec, error_info):
+        """ Add a row/column spec, key or sheet from an import entry
+
+        The sub-entries of an import (or foreach) entry specify which data
+        is read. This adds the spec for one of those sub-entries.
+
+        Args:
+            spec: PreprocessorEntry of the spec (e.g. row, col, row_key)
+            error_info: function returning the location of an entry for
+                error messages
+
+        Return:
+            True if the entry is a spec, False otherwise
+
+        """
+
+        # Get row spec
+        if (spec.tag == "row"):
+            self.add_row(spec.get_values(join=True))
+
+        # Get col spec
+        elif (spec.tag == "col"):
+            self.add_col(spec.get_values(join=True))
+
+        # Get row key
+        elif (spec.tag == "row_key"):
+            col = None
+            is_re = False
+
+            # Get associated values
+            for attr in spec.data:
+                if (attr.which == "value"):
+                    continue
+                elif (attr.tag == "col"):
+                    col = attr.get_values(join=True)
+                elif (attr.tag == "re"):
+                    is_re = attr.get_values(join=True)
+                else:
+                    raise ValueError("invalid row_key import "\
+                            "attribute \"{}\"\n{}"\
+                            "".format(attr.tag, error_info(attr)))
+
+            self.add_row_key(spec.get_values(join=True), col=col,
+                    is_re=is_re)
+
+        # Get col key
+        elif (spec.tag == "col_key"):
+            row = None
+            is_re = False
+
+            # Get associated values
+            for attr in spec.data:
+                if (attr.which == "value"):
+                    continue
+                elif (attr.tag == "row"):
+                    row = attr.get_values(join=True)
+                elif (attr.tag == "re"):
+                    is_re = attr.get_values(join=True)
+                else:
+                    raise ValueError("invalid col_key import "\
+                            "attribute \"{}\"\n{}"\
+                            "".format(attr.tag, error_info(attr)))
+
+            self.add_col_key(spec.get_values(join=True), row=row,
+                    is_re=is_re)
+
+        # Get sheet
+        elif (spec.tag == "sheet"):
+            self.add_sheet(spec.get_values(join=True))
+
+        else:
+            return False
+
+        return True
+
     def add_row(self, row):
         """ Set the row or rows to be read from the spreadsheet
 
@@ -1208,6 +4147,12 @@ class ImportSpreadsheet(object):
         else:
             self.row_keys[-1]["key"] = re.compile("^" + row_key + "$")
 
+        # Keys without re characters can be matched through the index
+        if is_re or self.re_special.search(row_key):
+            self.row_keys[-1]["text"] = None
+        else:
+            self.row_keys[-1]["text"] = row_key
+
         # Set col spec if specified
         if not col is None:
             self.row_keys[-1]["col"] = self._get_array(col)
@@ -1252,6 +4197,12 @@ class ImportSpreadsheet(object):
         else:
             self.col_keys[-1]["key"] = re.compile("^" + col_key + "$")
 
+        # Keys without re characters can be matched through the index
+        if is_re or self.re_special.search(col_key):
+            self.col_keys[-1]["text"] = None
+        else:
+            self.col_keys[-1]["text"] = col_key
+
         # Set row spec if specified
         if not row is None:
             self.col_keys[-1]["row"] = self._get_array(row)
@@ -1262,7 +4213,10 @@ class ImportSpreadsheet(object):
         """ Get data specified by column and row specifications
 
         Return data as a 2-dimensional array of PreprocessorEntries as
-        filtered by the column and row specifications.
+        filtered by the column and row specifications. The data read
+        from the file is stored as an array of row tuples holding the cell
+        values (rows that weren't read are None), PreprocessorEntries are
+        only created for the cells that are returned.
 
         Return:
             2-dimensional array of data as PreprocessorEntries
@@ -1274,15 +4228,21 @@ class ImportSpreadsheet(object):
             raise AssertionError("data must be set before calling get_data()")
 
 
-        # Create rows/cols array if they haven't been set
-        if len(self.rows) == 0:
+        # Rows of an exact first row key are looked up in the index, so
+        # the list of every row is only created when it is searched
+        all_rows = len(self.rows) == 0
+        if all_rows and (len(self.row_keys) == 0 or
+                self.row_keys[0]["text"] is None):
             self.rows = list(range(1, len(self.data)+1))
+            all_rows = False
+
+        # Drop rows that were already filtered by the row keys while reading
+        if len(self.row_keys) > 0 and not all_rows:
+            self.rows = [r for r in self.rows
+                    if r > len(self.data) or self.data[r-1] is not None]
 
         if len(self.cols) == 0:
-            if len(self.data) > 0:
-                self.cols = list(range(1, len(self.data[0])+1))
-            else:
-                self.cols = []
+            self.cols = list(range(1, self.data_cols+1))
 
 
         # Save number of rows/columns for error messages
@@ -1302,7 +4262,7 @@ class ImportSpreadsheet(object):
 
 
         # Data is empty, return empty array
-        if (len(self.data) < 1 or len(self.data[0]) < 1):
+        if (len(self.data) < 1 or self.data_cols < 1):
             raise ValueError("no data found")
 
 
@@ -1313,28 +4273,36 @@ class ImportSpreadsheet(object):
             # Get columns to search
             rk_cols = rk["col"]
             if rk_cols is None:
-                rk_cols = list(range(1, len(self.data[0])+1))
-
-            # Only search specified rows
-            valid_rows = list(self.rows)
-            for r in self.rows:
-                match=False
+                rk_cols = list(range(1, self.data_cols+1))
 
-                # Search through each column for key
+            # Exact match key, look up matching rows in column indexes
+            if rk["text"] is not None:
+                index = self._get_index()
+                matches = set()
                 for c in rk_cols:
-                    val = self.data[r-1][c-1].get_values(join=True)
+                    matches.update(index.find_rows(c, rk["text"]))
 
-                    # Search for match
-                    match = rk["key"].match(val.strip())
+                # Only intersect with the rows when they were specified
+                if all_rows:
+                    valid_rows = sorted(matches)
+                    all_rows = False
+                else:
+                    valid_rows = [r for r in self.rows if r in matches]
 
-                    if match:
-                        break
+            # Only search specified rows
+            else:
+                valid_rows = []
+                for r in self.rows:
+                    # Search through each column for key
+                    for c in rk_cols:
+                        val = self._get_text(r, c)
+
+                        # Keep row if it matches
+                        if rk["key"].match(val.strip()):
+                            valid_rows.append(r)
+                            break
 
-                # Remove row if it doesn't match
-                if not match:
-                    valid_rows.remove(r)
-                else:
-                    rk_match = True
+            rk_match = len(valid_rows) > 0
 
             # Update rows with valid_rows
             self.rows = valid_rows
@@ -1359,26 +4327,29 @@ class ImportSpreadsheet(object):
             if ck_rows is None:
                 ck_rows = list(range(1, len(self.data)+1))
 
-            # Only search specified columns
-            valid_cols = list(self.cols)
-            for c in self.cols:
-                match=False
-
-                # Search through each row for key
+            # Exact match key, look up matching columns in row indexes
+            if ck["text"] is not None:
+                index = self._get_index()
+                matches = set()
                 for r in ck_rows:
-                    val = self.data[r-1][c-1].get_values(join=True)
+                    matches.update(index.find_cols(r, ck["text"]))
 
-                    # Search for match
-                    match = ck["key"].match(val.strip())
+                valid_cols = [c for c in self.cols if c in matches]
 
-                    if match:
-                        break
+            # Only search specified columns
+            else:
+                valid_cols = []
+                for c in self.cols:
+                    # Search through each row for key
+                    for r in ck_rows:
+                        val = self._get_text(r, c)
+
+                        # Keep column if it matches
+                        if ck["key"].match(val.strip()):
+                            valid_cols.append(c)
+                            break
 
-                # Remove column if it doesn't match
-                if not match:
-                    valid_cols.remove(c)
-                else:
-                    ck_match = True
+            ck_match = len(valid_cols) > 0
 
             # Update cols with valid_cols
             self.cols = valid_cols
@@ -1401,15 +4372,458 @@ class ImportSpreadsheet(object):
             if r > len(self.data):
                 raise IndexError("index out of range", "row", str(r))
 
-            ret.append([])
-            for c in self.cols:
-                # Check if in range
-                if c > len(self.data[r-1]):
-                    raise IndexError("index out of range", "column", str(c))
+            ret.append([])
+            for c in self.cols:
+                # Check if in range
+                if c > len(self.data[r-1]):
+                    raise IndexError("index out of range", "column", str(c))
+
+                ret[i].append(self._get_entry(r, c))
+
+        return ret
+
+    def iter_rows(self):
+        """ Iterate over the rows specified by the row/column specs and keys
+
+        Rows are returned one at a time with the values of the requested
+        columns, instead of as a 2-dimensional array of entries. When the
+        rows are requested in the order of the file (or all rows are
+        requested) and there are no column keys, the file is streamed and
+        each row is returned as it is read, so the file is never held in
+        memory. Otherwise the data is read as for read().
+
+        Yields:
+            tuple of (row, cells), where row is the row number (starting
+            at 1) and cells is a list of (col, value) for each column
+
+        """
+
+        rows = self.rows
+        in_order = all(rows[i] < rows[i+1] for i in range(len(rows)-1))
+
+        # Keyed rows that were already read (e.g. with the other imports of
+        # the file)
+        rows_read = len(self.row_keys) > 0 and self.cache.has(self.filename,
+                (self._get_kind(), "stream", self._get_projection()))
+
+        # Small files, column keys that search whole columns and rows out
+        # of file order aren't streamed, read the data instead (as for rows
+        # that were already read)
+        if (not self._is_streamed() or len(self.col_keys) > 0 or
+                not in_order or rows_read):
+            self.read()
+
+            for r in self.rows:
+                yield r, [(c, self.data[r-1][c-1]) for c in self.cols]
+
+            return
+
+        required = set(rows)
+        last_row = rows[-1] if len(rows) > 0 else None
+
+        num_read = 0
+        num_found = 0
+        for r,row in enumerate(self.stream(), 1):
+            num_read = r
+
+            # Stop reading after the last requested row
+            if last_row is not None and r > last_row:
+                break
+
+            if len(required) > 0 and r not in required:
+                continue
+
+            # Only return rows that match all the row keys
+            if not all(self._match_row(rk, row) for rk in self.row_keys):
+                continue
+
+            cols = self.cols
+            if len(cols) == 0:
+                cols = range(1, len(row)+1)
+
+            cells = []
+            for c in cols:
+                # Check if in range
+                if c > len(row):
+                    raise IndexError("index out of range", "column", str(c))
+
+                cells.append((c, row[c-1]))
+
+            num_found += 1
+            yield r, cells
+
+        # Data is empty
+        if num_read == 0:
+            raise ValueError("no data found")
+
+        # Check requested rows are in range
+        if last_row is not None and num_read < last_row:
+            raise IndexError("index out of range", "row", str(last_row))
+
+        # No rows matched the row keys
+        if num_found == 0 and len(self.row_keys) > 0:
+            raise KeyError("no match found", "row key",
+                    ", ".join(str(rk["val"]) for rk in self.row_keys))
+
+    def iter_entries(self):
+        """ Iterate over the rows specified by the row/column specs and keys
+
+        Same as iter_rows(), but each row is returned as entries, as the
+        rows returned by get_data().
+
+        Yields:
+            list of PreprocessorEntries for each column of the row
+
+        """
+
+        for r,cells in self.iter_rows():
+            yield [self._new_entry(val) for c,val in cells]
+
+    @staticmethod
+    def col_name(col):
+        """ Get the name of a column as letters
+
+        Args:
+            col: column number (starting at 1)
+
+        Return:
+            lower case letters of the column (e.g. 1 -> "a", 28 -> "ab")
+
+        """
+
+        name = ""
+        while col > 0:
+            col, rem = divmod(col - 1, 26)
+            name = chr(ord('a') + rem) + name
+
+        return name
+
+    def _get_index(self):
+        """ Get the index of the cell text for the data
+
+        The index is cached with the data when the data is shared through
+        the ImportCache, data read for a single import gets its own index.
+
+        Return:
+            SpreadsheetIndex for the data
+
+        """
+
+        if self.data_kind is None:
+            return SpreadsheetIndex(self.data)
+
+        return self.cache.get(self.filename, (self.data_kind, "index"),
+                lambda filename: SpreadsheetIndex(self.data))
+
+    def _get_text(self, r, c):
+        """ Get the text of a cell
+
+        Args:
+            r: row of the cell (starting at 1)
+            c: column of the cell (starting at 1)
+
+        Return:
+            string value of the cell ("" for empty cells)
+
+        """
+
+        val = self.data[r-1][c-1]
+
+        return "" if val is None else str(val)
+
+    def _get_entry(self, r, c):
+        """ Create a PreprocessorEntry for a cell
+
+        Entries are only created for the cells returned by get_data(), the
+        rest of the data stays in the compact row tuples read from the file.
+        The entry points to the import entry as its parent (for error
+        messages) but isn't added to the data array of the import entry.
+
+        Args:
+            r: row of the cell (starting at 1)
+            c: column of the cell (starting at 1)
+
+        Return:
+            PreprocessorEntry containing the value of the cell
+
+        """
+
+        return self._new_entry(self.data[r-1][c-1])
+
+    def _new_entry(self, value):
+        """ Create a PreprocessorEntry for the value of a cell
+
+        Args:
+            value: value of the cell
+
+        Return:
+            PreprocessorEntry containing the value
+
+        """
+
+        entry = PreprocessorEntry(self.entry.tag, elem=self.entry.elem,
+                value=value)
+        entry.parent = self.entry
+
+        return entry
+
+    def _get_required(self):
+        """ Get the rows and columns that must be read from the file
+
+        Determine which rows and columns are needed to return the data
+        requested by the row/column specs and to evaluate the row/column
+        keys, so that readers only need to process that part of the file.
+
+        Return:
+            tuple of (rows, cols), each is a set of indexes or None when
+            every row/column is required
+
+        """
+
+        # Rows requested plus rows searched by column keys
+        rows = None
+        if len(self.rows) > 0:
+            rows = set(self.rows)
+            for ck in self.col_keys:
+                if ck["row"] is None:
+                    rows = None
+                    break
+                rows.update(ck["row"])
+
+        # Columns requested plus columns searched by row keys
+        cols = None
+        if len(self.cols) > 0:
+            cols = set(self.cols)
+            for rk in self.row_keys:
+                if rk["col"] is None:
+                    cols = None
+                    break
+                cols.update(rk["col"])
+
+        return rows, cols
+
+    def _get_projection(self):
+        """ Get the part of the file that is read for the import
+
+        Return:
+            tuple of (rows, cols, row keys), where rows and cols are sorted
+            tuples of the required rows and columns (None when every
+            row/column is required) and row keys is a tuple of (pattern,
+            text, cols) of the row keys that filter the rows as they are
+            read (see add_row_key())
+
+        """
+
+        rows, cols = self._get_required()
+
+        # Column keys search rows regardless of the row keys, so rows can
+        # only be filtered by the row keys while reading without column keys
+        row_keys = self.row_keys if len(self.col_keys) == 0 else []
+
+        return (None if rows is None else tuple(sorted(rows)),
+                None if cols is None else tuple(sorted(cols)),
+                tuple((rk["key"].pattern, rk["text"],
+                    None if rk["col"] is None else tuple(rk["col"]))
+                    for rk in row_keys))
+
+    @staticmethod
+    def read_projections(values, projections):
+        """ Read the rows and columns of a file required by projections
+
+        A row is kept when any of the projections requires it and it
+        matches the row keys of that projection, only the columns required
+        by the projections are kept (the other columns are None) and rows
+        that aren't kept are None. Reading stops after the last required
+        row. This allows large files to be streamed without holding the
+        whole file in memory, and the data of several imports to be read
+        in one pass.
+
+        Args:
+            values: iterator over the rows of the file, each row is a
+                sequence of cell values
+            projections: list of projections (see _get_projection())
+
+        Return:
+            tuple of (data_cols, data), where data_cols is the number of
+            columns of the first row and data is the list of rows
+
+        """
+
+        # Rows and row keys of each projection, and columns kept for every
+        # row (None for all columns)
+        specs = []
+        cols = set()
+        for rows,proj_cols,row_keys in projections:
+            specs.append((None if rows is None else set(rows),
+                [{"key": re.compile(pattern), "text": text, "col": key_cols}
+                    for pattern,text,key_cols in row_keys]))
+
+            if cols is not None and proj_cols is not None:
+                cols.update(proj_cols)
+            else:
+                cols = None
+
+        # Stop reading after the last required row
+        if all(rows is not None for rows,row_keys in specs):
+            values = itertools.islice(values,
+                    max(max(rows) for rows,row_keys in specs))
+
+        # Projections with an exact first row key are found by looking up
+        # the cell text of the searched columns (None for all columns),
+        # the others are checked for every row
+        texts = {}
+        others = []
+        for i,(rows,row_keys) in enumerate(specs):
+            if len(row_keys) == 0 or row_keys[0]["text"] is None:
+                others.append(i)
+                continue
+
+            for c in row_keys[0]["col"] or [None]:
+                texts.setdefault(c, {}).setdefault(row_keys[0]["text"],
+                        []).append(i)
+
+        data_cols = 0
+        data = []
+        for r,row in enumerate(values, 1):
+            if r == 1:
+                data_cols = len(row)
+
+            # Projections that may keep the row
+            found = set(others)
+            for c,col_texts in texts.items():
+                for val in (row if c is None else row[c-1:c]):
+                    val = "" if val is None else str(val).strip()
+                    found.update(col_texts.get(val, ()))
+
+            found = [i for i in found
+                    if specs[i][0] is None or r in specs[i][0]]
+
+            if len(found) == 0:
+                data.append(None)
+                continue
+
+            # Only keep the required columns
+            if cols is not None:
+                tmp = [None] * len(row)
+                for c in cols:
+                    if c <= len(row):
+                        tmp[c-1] = row[c-1]
+                row = tmp
+
+            # Only keep rows that match all the row keys of a projection
+            if not any(all(ImportSpreadsheet._match_row(rk, row)
+                    for rk in specs[i][1]) for i in found):
+                data.append(None)
+                continue
+
+            data.append(tuple(row))
+
+        return data_cols, data
+
+    @staticmethod
+    def read_shared(importers):
+        """ Read the data of several imports of a file in one pass
+
+        The rows and columns required by each of the imports are read
+        while the file is streamed once (see read_projections()), and the
+        data is stored in the ImportCache for each of the imports, where
+        read() finds it instead of streaming the file again. The imports
+        share the data and the key indexes built on it. When there is a
+        disk cache, the data is also stored in it, so a later build with
+        the same imports doesn't read the file again.
+
+        Args:
+            importers: list of importers of the same file (and sheet)
+
+        """
+
+        importer = importers[0]
+        kind = importer._get_kind()
+        group = tuple(dict.fromkeys(imp._get_projection()
+                for imp in importers))
+
+        def load(filename):
+            return ImportSpreadsheet.read_projections(importer.stream(),
+                    group)
+
+        data_cols, data = importer.cache.get(importer.filename,
+                (kind, "streams", group), load, persist=True, keep=False)
+
+        for projection in group:
+            importer.cache.set(importer.filename,
+                    (kind, "stream", projection), (data_cols, data, group))
+
+    def _read_stream(self):
+        """ Stream the required data of the file
+
+        Only the rows and columns needed by the row/column specs and keys
+        are read (see read_projections()). The data is looked up in the
+        ImportCache by the rows, columns and row keys it is read for,
+        where it is found when it was read with the other imports of the
+        file (see read_shared()) or stored in the disk cache by a previous
+        build. Otherwise the file is streamed, and the data that is read is
+        only stored in the disk cache, not kept for the rest of the build.
+
+        """
+
+        kind = self._get_kind()
+        projection = self._get_projection()
+
+        def load(filename):
+            return self.read_projections(self.stream(), [projection]) + \
+                    (None,)
+
+        self.data_cols, self.data, group = self.cache.get(self.filename,
+                (kind, "stream", projection), load, persist=True, keep=False)
+
+        # Data read with other imports shares its key indexes with them
+        self.data_kind = None if group is None else (kind, "stream", group)
+
+    def _get_kind(self):
+        """ Get the type of the source in the ImportCache """
+
+        return self.filetype
+
+    def _is_streamed(self):
+        """ Determine whether the file is streamed instead of loaded whole
+
+        Files larger than the stream size of the ImportCache are streamed,
+        unless the whole file is already in the cache. Smaller files are
+        loaded whole into the cache, so each file is only parsed once.
+
+        """
+
+        return (not self.cache.has(self.filename, self._get_kind()) and
+                os.path.getsize(self.filename) > self.cache.stream_size)
+
+    @staticmethod
+    def _match_row(rk, row):
+        """ Determine whether the row key matches a row
+
+        Args:
+            rk: row key (as created by add_row_key())
+            row: sequence of cell values for the row
+
+        Return:
+            True if any of the columns searched by the key matches
+
+        """
+
+        rk_cols = rk["col"]
+        if rk_cols is None:
+            rk_cols = range(1, len(row)+1)
+
+        for c in rk_cols:
+            if c > len(row):
+                continue
 
-                ret[i].append(self.data[r-1][c-1])
+            val = row[c-1]
+            val = "" if val is None else str(val)
 
-        return ret
+            if rk["key"].match(val.strip()):
+                return True
+
+        return False
 
     def _get_array(self, spec):
         """ Return array of values specified by the row or column spec
@@ -1440,9 +4854,16 @@ class ImportSpreadsheet(object):
         re_digits  = re.compile('[0-9]')
         re_letters = re.compile('[a-z]')
 
-        # Split spec at commas (don't split range specs)
-        # TODO fix this so it never matches ""
-        list_vals = re.split('(?<![-:])\s*,?\s*(?![-:])', spec)
+        # Split spec at commas (don't split range specs), skipping empty
+        # separator matches which python3 re.split would otherwise split on
+        list_vals = []
+        start = 0
+        for match in re.finditer('(?<![-:])\s*,?\s*(?![-:])', spec):
+            if match.end() > match.start():
+                list_vals.append(spec[start:match.start()])
+                start = match.end()
+        list_vals.append(spec[start:])
+        list_vals = [val for val in list_vals if val != ""]
 
         # Loop through split spec values
         for list_val in list_vals:
@@ -1511,16 +4932,65 @@ class ImportSpreadsheet(object):
 
 
 class ImportXLSX (ImportSpreadsheet):
-    def __init__(self, filename, sheet=None, entry=None):
+    def __init__(self, filename, sheet=None, entry=None, cache=None):
         # Call init of inherited class
-        super(self.__class__, self).__init__(filename, "xlsx", entry=entry)
-
-        # Load workbook
-        self.xl_wb = openpyxl.load_workbook(self.filename)
+        super(self.__class__, self).__init__(filename, "xlsx", entry=entry,
+                cache=cache)
 
         # Set sheet name
         self.add_sheet(sheet)
 
+    @staticmethod
+    def load(filename):
+        """ Open xlsx workbook
+
+        The workbook is opened in read-only mode, so sheets are streamed
+        from the file when they are read instead of being loaded into
+        memory when the workbook is opened.
+
+        Args:
+            filename: path to the xlsx file
+
+        Return:
+            openpyxl read-only workbook
+
+        """
+
+        import openpyxl
+
+        return openpyxl.load_workbook(filename, read_only=True)
+
+    def get_sheet(self):
+        """ Get the workbook sheet
+
+        The workbook is opened the first time it is needed and shared with
+        other imports of the same file.
+
+        Return:
+            openpyxl read-only worksheet
+
+        """
+
+        xl_wb = self.cache.get(self.filename, self.filetype, self.load)
+
+        if self.sheet is None:
+            return xl_wb.active
+
+        return xl_wb[self.sheet]
+
+    def load_sheet(self, filename):
+        """ Read all the values of the workbook sheet
+
+        Args:
+            filename: path to the xlsx file
+
+        Return:
+            tuple of rows, each row is a tuple of cell values
+
+        """
+
+        return tuple(self.get_sheet().iter_rows(values_only=True))
+
     def add_sheet(self, sheet):
         """ Set sheet name for workbook
 
@@ -1545,27 +5015,46 @@ class ImportXLSX (ImportSpreadsheet):
 
         """
 
-        # Get workbook sheet
-        if self.sheet is None:
-            xl_sheet = self.xl_wb.active
-        else:
-            xl_sheet = self.xl_wb[self.sheet]
+        # Use the whole sheet for small files and when it is already in the
+        # cache, where the data and its indexes are shared with every other
+        # import of the sheet (so the sheet is only read once)
+        kind = self._get_kind()
+        if not self._is_streamed():
+            self.data = self.cache.get(self.filename, kind, self.load_sheet,
+                    persist=True)
+            self.data_kind = kind
 
-        # Read in the spreadsheet values and create PreprocessorEntry objects
-        self.data = []
-        for r in range(1,xl_sheet.max_row + 1):
-            self.data.append([])
-            for c in range(1,xl_sheet.max_column + 1):
-                cell = xl_sheet.cell(row=r, column=c)
+            if len(self.data) > 0:
+                self.data_cols = len(self.data[0])
 
-                tmp = PreprocessorEntry(self.entry.tag, parent=self.entry,
-                        elem=self.entry.elem, value=cell.value)
+            # Process the data and return it
+            return self.get_data()
 
-                self.data[r-1].append(tmp)
+        # Stream the required spreadsheet values into row tuples (only the
+        # requested cells and the cells searched by the keys are kept, and
+        # rows are filtered by the row keys as they are read, so the keys
+        # are matched through an index of only those cells)
+        self._read_stream()
 
         # Process the data and return it
         return self.get_data()
 
+    def stream(self):
+        """ Iterate over the values of the rows of the sheet
+
+        Return:
+            iterator over the rows of the sheet, each row is a tuple of
+            cell values
+
+        """
+
+        return self.get_sheet().iter_rows(values_only=True)
+
+    def _get_kind(self):
+        """ Get the type of the source in the ImportCache """
+
+        return (self.filetype, self.sheet)
+
 class ImportCSV(ImportSpreadsheet):
     """ This class extends ImportSpreadsheet to support csv files
 
@@ -1573,9 +5062,29 @@ class ImportCSV(ImportSpreadsheet):
     of a csv file and returning the values.
 
     """
-    def __init__(self, filename, entry=None):
+    def __init__(self, filename, entry=None, cache=None):
         # Call init of inherited class
-        super(self.__class__, self).__init__(filename, "csv", entry=entry)
+        super(self.__class__, self).__init__(filename, "csv", entry=entry,
+                cache=cache)
+
+    @staticmethod
+    def load(filename):
+        """ Parse csv file
+
+        Read the entire csv file and return the values of each row.
+
+        Args:
+            filename: path to the csv file
+
+        Return:
+            tuple of rows, each row is a tuple of strings
+
+        """
+
+        import csv
+
+        with open(filename) as csvfile:
+            return tuple(tuple(row) for row in csv.reader(csvfile))
 
     def read(self):
         """ Get the data from csv file
@@ -1588,25 +5097,41 @@ class ImportCSV(ImportSpreadsheet):
 
         """
 
-        file_array = []
-        max_col = 0
+        # Stream large files, only keeping the required rows and columns
+        if self._is_streamed():
+            self._read_stream()
 
-        self.data = []
+            # Process the data and return it
+            return self.get_data()
 
-        # Read entire file into memory
-        with open(self.filename) as csvfile:
-            reader = csv.reader(csvfile)
-            for r,row in enumerate(reader):
-                self.data.append([])
-                for val in row:
-                    tmp = PreprocessorEntry(self.entry.tag, parent=self.entry,
-                            elem=self.entry.elem, value=val)
+        # Get parsed rows (shared with other imports of the same file)
+        self.data = self.cache.get(self.filename, self.filetype, self.load,
+                persist=True)
+        self.data_kind = self.filetype
 
-                    self.data[r].append(tmp)
+        if len(self.data) > 0:
+            self.data_cols = len(self.data[0])
 
         # Process the data and return it
         return self.get_data()
 
+    def stream(self):
+        """ Iterate over the values of the rows of the csv file
+
+        The file is read one row at a time and closed once all the rows
+        are read (or the iterator is closed).
+
+        Yields:
+            list of strings for each row of the file
+
+        """
+
+        import csv
+
+        with open(self.filename) as csvfile:
+            for row in csv.reader(csvfile):
+                yield row
+
 
 class PresentationPreprocessor:
     """ Preprocess data for creating pptx presentation.
@@ -1616,12 +5141,29 @@ class PresentationPreprocessor:
     is to create a tree of PreprocessorEntry and PreprocessorValue objects
     from the XML file. Another purpose is to evaluate and substitute
     variables using the get, set, mod elements and the prepend, append
-    attributes.
+    attributes. The preprocessor also expands foreach elements into a
+    slide for each row of a spreadsheet.
 
     """
 
-    def __init__(self, source=None):
+    def __init__(self, source=None, slide_handler=None, import_cache=None):
+        """ Initialize new PresentationPreprocessor object.
+
+        Kwargs:
+            source: The source XML document to parse
+            slide_handler: Function called with each slide entry as soon as
+                the slide is processed, when set the XML document is parsed
+                incrementally and slides are removed from the tree after
+                they are handled (so get_root() returns a presentation
+                without slides)
+            import_cache: ImportCache used to read the spreadsheets of
+                foreach elements
+
+        """
+
         self.tree = None
+        self.slide_handler = slide_handler
+        self.import_cache = import_cache
 
         if source:
             self.parse(source)
@@ -1639,14 +5181,21 @@ class PresentationPreprocessor:
 
         # Open xml input file
         self.source = source
-        etree = ET.parse(source, parser=LineNumberingParser())
 
         # Initialize parsing structures
         self.tree = PreprocessorEntry("_root_")
         self.var_stack = VariableStack()
+        self.slide_count = 0
+
+        # Spreadsheets read by foreach elements
+        self.import_paths = set()
 
         # Create tree, starting at the root
-        self._process_element(etree.getroot(), self.tree)
+        if self.slide_handler is None:
+            etree = ET.parse(source, parser=LineNumberingParser())
+            self._process_element(etree.getroot(), self.tree)
+        else:
+            self._iterparse(source)
 
         # ensure tree contains root
         if (len(self.tree.data) <= 0):
@@ -1678,14 +5227,18 @@ class PresentationPreprocessor:
 
         return self.tree.data[0]
 
-    def _process_element(self, elem, parent_entry, parent_elem=None):
+    def _process_element(self, elem, parent_entry):
         """ Process element and sub-elements.
 
-        This function creates new PreprocessorEntry object for the specified
-        element from the ElementTree, performs preprocessing tasks for
-        the element, recursively calls this function for each of the element's
-        attributes, recursively calls this function for each sub-element, and
-        performs any postprocessing tasks for the element.
+        This function creates new PreprocessorEntry objects for the specified
+        element from the ElementTree and all of its sub-elements. For each
+        element, preprocessing tasks are performed and the attributes are
+        added before its sub-elements are processed, and postprocessing
+        tasks are performed after its sub-elements are processed.
+
+        The tree is walked with an explicit stack instead of recursion, so
+        deeply nested elements (e.g. lists) are not limited by the python
+        recursion limit.
 
         Args:
             elem: ElementTree element to be processed
@@ -1693,49 +5246,311 @@ class PresentationPreprocessor:
                 being created. The new PreprocessorEntry will be added to the
                 end of the parent's data array.
 
-        Kwargs:
-            parent_elem: This is set when the current element is a temporary
-                element created to represent an attribute of the parent element
-                in the XML file.
+        Return:
+            PreprocessorEntry created for the element
+
+        """
+
+        # Stack of (element, entry, iterator over sub-elements)
+        root_entry = self._start_element(elem, parent_entry)
+        root_entry.add_text(elem.text)
+        stack = [(elem, root_entry, iter(elem))]
+
+        while len(stack) > 0:
+            elem, elem_entry, children = stack[-1]
+
+            # Process next sub-element
+            child = next(children, None)
+            if child is not None and child.tag == "foreach":
+                self._foreach(child, elem_entry)
+                elem_entry.add_text(child.tail)
+                continue
+
+            if child is not None:
+                child_entry = self._start_element(child, elem_entry)
+                child_entry.add_text(child.text)
+                stack.append((child, child_entry, iter(child)))
+                continue
+
+            # All sub-elements processed
+            stack.pop()
+            self._end_element(elem_entry)
+
+            # Get text after sub element
+            if len(stack) > 0:
+                stack[-1][1].add_text(elem.tail)
+
+        return root_entry
+
+    def _start_element(self, elem, parent_entry):
+        """ Create entry for element and process its attributes.
+
+        Each attribute is added as a sub-entry of the element entry holding
+        the attribute value. Attributes have no sub-elements or scope of
+        their own, so they are postprocessed directly without creating an
+        element or pushing a scope onto the variable stack.
+
+        Args:
+            elem: ElementTree element to be processed
+            parent_entry: Parent entry that is to hold the new entry
+
+        Return:
+            PreprocessorEntry created for the element
 
         """
 
         # Create entry for element
-        if not parent_elem is None:
-            elem_entry = PreprocessorEntry(elem.tag,
-                    parent=parent_entry, elem=parent_elem, is_attrib=True)
-        else:
-            elem_entry = PreprocessorEntry(elem.tag,
-                    parent=parent_entry, elem=elem)
+        elem_entry = PreprocessorEntry(elem.tag, parent=parent_entry,
+                elem=elem)
 
         # Perform tasks on element before calling children
         self._preprocess_element(elem_entry)
 
-        # Process each attribute as a sub-element
-        for item in elem.items():
-            attrib = ET.Element(item[0])
-            attrib.text = item[1]
-            self._process_element(attrib, elem_entry, parent_elem=elem)
+        # Process each attribute as a sub-entry
+        for name,value in elem.items():
+            attrib_entry = PreprocessorEntry(name, parent=elem_entry,
+                    elem=elem, is_attrib=True)
+            attrib_entry.add_text(value)
+            self._postprocess_element(attrib_entry)
 
-        # Add text as _value data under element
-        elem_entry.add_text(elem.text)
+        return elem_entry
 
-        # Process subelements
-        for child in elem:
-            # Process child element
-            self._process_element(child, elem_entry)
+    def _end_element(self, elem_entry):
+        """ Finish element after its sub-elements are processed.
 
-            # Get text after sub element
-            elem_entry.add_text(child.tail)
+        Args:
+            elem_entry: element entry in tree
+
+        """
+
+        # Pop current scope to return to scope of parent element
+        self.var_stack.pop()
 
         # Perform tasks on element after creating children
         self._postprocess_element(elem_entry)
 
+    def _iterparse(self, source):
+        """ Process XML document incrementally, handling each slide.
+
+        Processes the same elements in the same order as _process_element
+        from the start and end events of the parser. The text of an element
+        and the tail of a sub-element are only complete once the next event
+        is read, so they are added to the tree at the next event. Each slide
+        is passed to the slide handler once it is processed and is then
+        removed from both the entry tree and the XML tree.
+
+        Args:
+            source: The source XML document
+
+        """
+
+        # Stack of (element, entry) of the elements being processed
+        stack = []
+
+        # Text to add at the next event (entry, element, attribute name)
+        pending = None
+
+        # Depth of the elements inside a foreach element
+        foreach_depth = 0
+
+        for event,elem in ET.iterparse(source, events=("start", "end"),
+                parser=LineNumberingParser()):
+
+            # Wait for the end of a foreach, it is expanded once complete
+            if foreach_depth > 0:
+                foreach_depth += 1 if event == "start" else -1
+                if foreach_depth > 0:
+                    continue
+
+                self._foreach(elem, stack[-1][1])
+                pending = (stack[-1][1], elem, "tail")
+                continue
+
+            # Add text of the previous event now that it is complete
+            if pending is not None:
+                pending_entry, pending_elem, text_attr = pending
+                pending_entry.add_text(getattr(pending_elem, text_attr))
+                pending = None
+
+                # Free elements under the root once their tail is read
+                if text_attr == "tail" and len(stack) == 1:
+                    stack[0][0].remove(pending_elem)
+
+            if event == "start" and elem.tag == "foreach" and len(stack) > 0:
+                foreach_depth = 1
+                continue
+
+            if event == "start":
+                parent_entry = stack[-1][1] if len(stack) > 0 else self.tree
+                elem_entry = self._start_element(elem, parent_entry)
+                stack.append((elem, elem_entry))
+                pending = (elem_entry, elem, "text")
+                continue
+
+            elem, elem_entry = stack.pop()
+            self._end_element(elem_entry)
+
+            if len(stack) > 0:
+                pending = (stack[-1][1], elem, "tail")
+
+            # Handle slide and remove it from the tree
+            if elem_entry.tag == "slide" and len(stack) == 1:
+                self._handle_slide(elem_entry)
+
+    def _handle_slide(self, slide_entry):
+        """ Pass a processed slide to the slide handler
+
+        The slide is removed from the tree before it is handled.
+
+        Args:
+            slide_entry: slide entry in tree
+
+        """
+
+        slide_entry.delete()
+        self.slide_count += 1
+        self.slide_handler(slide_entry)
+
+    def _foreach(self, elem, parent_entry):
+        """ Expand foreach element into slides for each spreadsheet row
+
+        The value of the foreach element is the path of a spreadsheet file,
+        and the sub-elements (and attributes) other than slides specify
+        which rows and columns are read, as for an import element. The var
+        attribute names the variable that holds the row. The slide
+        sub-elements are templates that are processed for each row that is
+        read, in a new scope where the value of each column is set as
+        variable "var.col", with col as both the column letters and number
+        (e.g. "part.b" and "part.2" for column B). The slides are added to
+        the parent in place of the foreach element.
+
+        Rows are read one at a time (see ImportSpreadsheet.iter_rows()) and
+        the slides of each row are created only once the row is read. When
+        the input is parsed incrementally, the slides are passed to the
+        slide handler as they are created, so neither the spreadsheet nor
+        the slides are held in memory.
+
+        Args:
+            elem: ElementTree element of the foreach
+            parent_entry: Parent entry of the foreach (presentation)
+
+        """
+
+        # Create entry with the spec of the rows (new scope for children)
+        foreach_entry = self._start_element(elem, parent_entry)
+        foreach_entry.add_text(elem.text)
+
+        # Process spec sub-elements, slides are templates for each row
+        templates = []
+        for child in elem:
+            if child.tag == "slide":
+                templates.append(child)
+            else:
+                self._process_element(child, foreach_entry)
+
+            foreach_entry.add_text(child.tail)
+
+        # Ensure presentation is parent
+        if (parent_entry.tag != "presentation"):
+            raise ValueError("foreach element must have presentation "\
+                    "element as a parent\n{}"\
+                    "".format(self.error_info(foreach_entry)))
+
+        if (len(templates) == 0):
+            raise ValueError("foreach element must have at least one slide "\
+                    "element\n{}".format(self.error_info(foreach_entry)))
+
+        # Find variable name
+        var_array = foreach_entry.get_values(tag="var", join=True)
+
+        if (len(var_array) != 1 or var_array[0] == ""):
+            raise ValueError("foreach element must have one var name\n{}"\
+                    "".format(self.error_info(foreach_entry)))
+
+        var = var_array[0]
+        foreach_entry.remove(tag="var")
+
+        # Create importer for the spreadsheet
+        filename = foreach_entry.get_values(join=True)
+        importer = ImportSpreadsheet.from_file(filename, entry=foreach_entry,
+                cache=self.import_cache)
+
+        if importer is None:
+            raise ValueError("invalid foreach suffix \"{}\"\n{}"\
+                    "".format(pathlib.Path(filename).suffix,
+                        self.error_info(foreach_entry)))
+
+        self.import_paths.add(filename)
+
+        # Get row/col specs, keys and sheet
+        for child in foreach_entry.data:
+            if (child.which == "value"):
+                continue
+
+            if not importer.add_spec(child, self.error_info):
+                raise ValueError("invalid foreach attribute \"{}\"\n{}"\
+                        "".format(child.tag, self.error_info(child)))
+
+        # Create slides from the templates for each row
+        for r,cells in self._foreach_rows(importer, foreach_entry):
+            self.var_stack.push()
+
+            for c,val in cells:
+                val = "" if val is None else str(val)
+                self.var_stack.set("{}.{}".format(var, c), val)
+                self.var_stack.set("{}.{}".format(var,
+                    ImportSpreadsheet.col_name(c)), val)
+
+            for template in templates:
+                slide_entry = self._process_element(template, parent_entry)
+
+                if self.slide_handler is not None:
+                    self._handle_slide(slide_entry)
+
+            self.var_stack.pop()
+
+        # Remove foreach from tree, the slides replace it
+        self._end_element(foreach_entry)
+        foreach_entry.delete()
+
+    def _foreach_rows(self, importer, foreach_entry):
+        """ Iterate over the rows of a foreach spreadsheet
+
+        Errors reading the spreadsheet are reported with the location of
+        the foreach element.
+
+        Args:
+            importer: ImportSpreadsheet object with the specs of the rows
+            foreach_entry: foreach entry in tree
+
+        Yields:
+            tuple of (row, cells) as returned by importer.iter_rows()
+
+        """
+
+        rows = importer.iter_rows()
+
+        while True:
+            try:
+                r, cells = next(rows)
+            except StopIteration:
+                return
+            except (IndexError, KeyError) as err:
+                raise ValueError("{} \"{}\": {} in foreach\n{}"\
+                        "".format(err.args[1], err.args[2], err.args[0],
+                            self.error_info(foreach_entry)))
+            except (ValueError, IOError, OSError) as err:
+                raise ValueError("{} in foreach \"{}\"\n{}"\
+                        "".format(err, importer.filename,
+                            self.error_info(foreach_entry)))
+
+            yield r, cells
+
     def _preprocess_element(self, elem_entry):
         """ Perform preprocessing for element.
 
-        This is called by the _process_element function for each
-        element before its sub-elements are processed.
+        This is called for each element before its attributes and
+        sub-elements are processed.
 
         The following operations are performed by this function:
             - push new scope onto the variable stack
@@ -1745,18 +5560,18 @@ class PresentationPreprocessor:
 
         """
 
-        # Append new dict onto the var_stack for the current scope variables
+        # Enter new scope on the var_stack for the element's variables
         self.var_stack.push()
 
 
     def _postprocess_element(self, elem_entry):
         """ Perform postprocessing for element.
 
-        This is called by the _process_element function for each
-        element after its sub-elements are processed.
+        This is called for each element after its sub-elements are
+        processed and the scope of the element is popped from the variable
+        stack, and for each attribute.
 
         The following operations are performed by this function:
-            - pop the current scope from the variable stack
             - process any get, mod, set elements
             - process any prepend, append elements (attributes)
 
@@ -1769,9 +5584,6 @@ class PresentationPreprocessor:
         get_mod_set = None
         append_prepend = None
 
-        # Pop current dict to return to scope of parent element
-        self.var_stack.pop()
-
         # Determine variable action
         if (elem_entry.tag == "get"):
             get_mod_set = elem_entry.tag
@@ -1852,8 +5664,8 @@ class PresentationPreprocessor:
         # Ensure presentation only has slides as children
         elif (elem_entry.tag == "presentation"):
 
-            # Ensure there is at least one child
-            if (len(elem_entry.data) == 0):
+            # Ensure there is at least one child (or slide already handled)
+            if (len(elem_entry.data) == 0 and self.slide_count == 0):
                 raise ValueError("presentation must have at least one slide"\
                         "element\n{}"\
                         "".format(self.error_info(elem_entry)))
@@ -1909,48 +5721,61 @@ class VariableStack:
     """ This is the variable stack class.
 
     This class is used to create and manage the variable stack for the input
-    XML file. The variables that are defined in a scope are all stored in a
-    single dictionary for that scope. A new sub-scope can be created by
-    "push"-ing a new dictionary to the end of the variable stack. Any variable
-    defined in this new scope will be available in all sub-scopes unless they
-    are "set" in a sub-scope. In this case, the new value will be returned
-    until this sub-scope is "pop"-ed and then the previous value will be
-    returned. A "mod" can be used to modify the value of a variable in the
-    current scope or any parent scopes, allow the value to be retained after
-    the sub-scope is "pop"-ed.
+    XML file. A new sub-scope can be created by "push"-ing onto the
+    variable stack. Any variable defined in this new scope will be available
+    in all sub-scopes unless they are "set" in a sub-scope. In this case,
+    the new value will be returned until this sub-scope is "pop"-ed and then
+    the previous value will be returned. A "mod" can be used to modify the
+    value of a variable in the current scope or any parent scopes, allow
+    the value to be retained after the sub-scope is "pop"-ed.
+
+    Every element is a scope but few of them set variables, so a scope is
+    only a depth counter. Each variable has its own stack of (depth, value)
+    with the innermost definition at the end, and the variables set at
+    each depth are recorded so they can be removed when the scope is
+    "pop"-ed. Looking up a variable doesn't depend on the number of scopes.
 
     """
 
     def __init__(self):
-        self.var_stack = []
+        self.depth = 0
+        self.variables = {}
+        self.scopes = []
 
     def push(self):
         """ Add new level to variable stack
 
-        Add a new dictionary to the top of the variable stack to create a new
-        variable scope.
+        Enter a new variable scope below the current scope.
 
         """
 
-        # Add new dictionary to end of var_stack
-        self.var_stack.append({})
+        self.depth += 1
 
     def pop(self):
         """ Remove level from variable stack
 
-        Remove top dictionary from the variable stack to return to the previous
-        variable scope.
+        Remove the variables defined in the current scope to return to the
+        previous variable scope.
 
         """
 
-        # Remove dictionary from end of var_stack
-        self.var_stack.pop()
+        # Remove variables set in the current scope
+        if len(self.scopes) > 0 and self.scopes[-1][0] == self.depth:
+            for var in self.scopes.pop()[1]:
+                values = self.variables[var]
+                values.pop()
+
+                if len(values) == 0:
+                    del self.variables[var]
+
+        self.depth -= 1
 
     def set(self, var, val):
         """ Set variable value in the current scope
 
-        Add new variable entry to the top dictionary of the variable stack,
-        which will create a definition of the variable in the current scope
+        Add new variable entry at the depth of the current scope, which will
+        create a definition of the variable in the current scope. A variable
+        set again in the same scope is overwritten.
 
         Args:
             var: name of variable
@@ -1958,14 +5783,25 @@ class VariableStack:
 
         """
 
-        # Set variable value to the dictionary at the end of var_stack
-        self.var_stack[-1][var] = val
+        values = self.variables.setdefault(var, [])
+
+        # Overwrite variable already defined in the current scope
+        if len(values) > 0 and values[-1][0] == self.depth:
+            values[-1] = (self.depth, val)
+            return
+
+        values.append((self.depth, val))
+
+        # Record variable to remove when current scope is popped
+        if len(self.scopes) == 0 or self.scopes[-1][0] != self.depth:
+            self.scopes.append((self.depth, []))
+        self.scopes[-1][1].append(var)
 
     def mod(self, var, val):
         """ Modify the value of the variable
 
-        Find a previously defined variable in the dictionary closest to the
-        top of the variable stack and modify the value.
+        Find the definition of the variable in the scope closest to the
+        current scope and modify the value.
 
         Args:
             var: name of variable
@@ -1973,13 +5809,14 @@ class VariableStack:
         """
 
         # Change value of variable
-        self.find_dict(var)[var] = val
+        values = self.find_values(var)
+        values[-1] = (values[-1][0], val)
 
     def get(self, var):
         """ Get the value of the variable
 
-        Find a previously defined variable in the dictionary closest to the
-        top of the variable stack and return the value.
+        Find the definition of the variable in the scope closest to the
+        current scope and return the value.
 
         Args:
             var: name of variable
@@ -1990,33 +5827,161 @@ class VariableStack:
         """
 
         # Get value of variable
-        return self.find_dict(var)[var]
+        return self.find_values(var)[-1][1]
 
-    def find_dict(self, var):
-        """ Get the dictionary containing the specified variable
-
-        Find a previously defined variable by searching through each dictionary
-        from the top of the variable stack to the bottom. When the variable is
-        found, the dictionary containing the variable is returned.
+    def find_values(self, var):
+        """ Get the definitions of the specified variable
 
         Args:
             var: name of variable
 
         Return:
-            dictionary containing variable
+            list of (depth, value) for the variable, the definition in the
+            closest scope is at the end
 
         """
 
-        # Search through variable stack
-        for var_dict in reversed(self.var_stack):
-            if var in var_dict:
-                return var_dict
+        values = self.variables.get(var)
 
         # Variable not found
-        raise ValueError("var \"{}\" not found in variable stack".format(var))
+        if values is None:
+            raise ValueError("var \"{}\" not found in variable stack"\
+                    "".format(var))
+
+        return values
+
+
+class EntryList(list):
+    """ Data array of a PreprocessorEntry
+
+    Holds the entries and values of an entry in order. It is used like a
+    list for iterating, indexing, appending and getting the length, and
+    also supports deleting and replacing an item in constant time.
+
+    The entries with a given tag (find) and the joined text of the values
+    (text) are cached until the list is changed, so repeated lookups of
+    the same entry don't scan the whole list.
+
+    Each item stores its slot in the list (_pos). A deleted item leaves an
+    empty slot (None) that is skipped when iterating, and the list is
+    compacted once more than half of the slots are empty. As with a list,
+    items must not be removed while iterating over the list.
+
+    """
+
+    __slots__ = ("_deleted", "_index", "_text")
+
+    def __init__(self):
+        self._deleted = 0
+        self._index = None
+        self._text = None
+
+    def __iter__(self):
+        if self._deleted == 0:
+            return list.__iter__(self)
+        return (item for item in list.__iter__(self) if item is not None)
+
+    def __reversed__(self):
+        return (item for item in list.__reversed__(self) if item is not None)
+
+    def __len__(self):
+        return list.__len__(self) - self._deleted
+
+    def __getitem__(self, idx):
+        self._compact()
+        return list.__getitem__(self, idx)
+
+    def append(self, item):
+        """ Add item to the end of the list """
+
+        item._pos = list.__len__(self)
+        list.append(self, item)
+        self._index = self._text = None
+
+    def insert(self, idx, item):
+        """ Insert item before index idx (renumbers the following items) """
+
+        self._compact()
+        list.insert(self, idx, item)
+        self._renumber(idx)
+        self.invalidate()
+
+    def remove(self, item):
+        """ Remove item from the list in constant time """
+
+        if list.__getitem__(self, item._pos) is not item:
+            raise ValueError("item not in list")
+
+        list.__setitem__(self, item._pos, None)
+        self._deleted += 1
+        self.invalidate()
+
+        # Compact when most slots are empty
+        if self._deleted > 8 and self._deleted * 2 > list.__len__(self):
+            self._compact()
+
+    def replace(self, item, new_item):
+        """ Replace item with new_item in constant time """
+
+        if list.__getitem__(self, item._pos) is not item:
+            raise ValueError("item not in list")
+
+        new_item._pos = item._pos
+        list.__setitem__(self, item._pos, new_item)
+        self.invalidate()
+
+    def find(self, tag):
+        """ Return the entries with the specified tag
+
+        The returned list is shared with later calls and must not be
+        modified by the caller.
+
+        Args:
+            tag: name of the entries to find
+
+        Return:
+            list of the entries with the tag, in order
+
+        """
+
+        # Index entries by tag on first lookup
+        if self._index is None:
+            self._index = {}
+            for item in self:
+                if type(item) is PreprocessorEntry:
+                    self._index.setdefault(item.tag, []).append(item)
+
+        return self._index.get(tag, [])
+
+    def text(self):
+        """ Return the values of the list joined into a single string """
+
+        if self._text is None:
+            self._text = ''.join([str(item.value) for item in self
+                    if type(item) is PreprocessorValue])
+
+        return self._text
 
+    def invalidate(self):
+        """ Clear the cached tag index and text after a change """
 
-class PreprocessorEntry:
+        self._index = None
+        self._text = None
+
+    def _compact(self):
+        # Remove empty slots
+        if self._deleted > 0:
+            list.__setitem__(self, slice(None),
+                    [item for item in list.__iter__(self) if item is not None])
+            self._deleted = 0
+            self._renumber(0)
+
+    def _renumber(self, start):
+        for pos in range(start, list.__len__(self)):
+            list.__getitem__(self, pos)._pos = pos
+
+
+class PreprocessorEntry(object):
     """ This is the preprocess entry class.
 
     The preprocess entry object is used by the PresentationPreprocessor
@@ -2024,13 +5989,13 @@ class PreprocessorEntry:
 
     An entry has a tag attribute and an entries attribute.
         - tag:  string containing attribute or element name from XML file
-        - data: array of additional entries or values
+        - data: EntryList of additional entries or values
 
     An object can be constructed with or without a value, as shown below
         entry = PreprocessorEntry("my_tag")
             Returns:
                 entry.tag  == "my_tag"
-                entry.data == []
+                len(entry.data) == 0
 
         entry = PreprocessorEntry("my_tag",value="my_value")
             Returns:
@@ -2041,6 +6006,9 @@ class PreprocessorEntry:
     # Used to differentiate PreprocessorEntry and PreprocessorValue objects
     which = "entry"
 
+    # Entries are created for every element and attribute of the input
+    __slots__ = ("_tag", "data", "elem", "is_attrib", "parent", "_pos")
+
     def __init__(self, tag, parent=None, value=None, elem=None, is_attrib=False):
         """ Initialize new PreprocessorEntry object.
 
@@ -2074,11 +6042,12 @@ class PreprocessorEntry:
 
         """
 
-        # Initialize data
-        self.tag = tag
-        self.data = []
+        # Initialize data (tags are interned, they are compared often)
+        self._tag = tag if tag is None else sys.intern(tag)
+        self.data = EntryList()
         self.elem = elem
         self.is_attrib = is_attrib
+        self.parent = None
 
         # When value is specified create PreprocessorValue in data array
         if not value is None:
@@ -2089,6 +6058,17 @@ class PreprocessorEntry:
             self.parent = parent
             parent.data.append(self)
 
+    @property
+    def tag(self):
+        return self._tag
+
+    @tag.setter
+    def tag(self, tag):
+        # Renaming the entry changes the tag index of the parent
+        self._tag = tag if tag is None else sys.intern(tag)
+        if self.parent is not None:
+            self.parent.data.invalidate()
+
     def __repr__(self):
         return "<{} '{}' at {}>"\
                 "".format( self.__class__.__name__, self.tag, hex(id(self)))
@@ -2170,16 +6150,15 @@ class PreprocessorEntry:
 
         # Get values from entries matching tag in data array
         if tag:
-            return [pp.get_values(join=join) for pp in self.data
-                    if pp.which == "entry" and pp.tag == tag]
-
-        # Get values in data array
-        values = [str(pp.value) for pp in self.data if pp.which == "value"]
+            return [pp.get_values(join=join) for pp in self.data.find(tag)]
 
+        # Get joined values (cached until the data array changes)
         if join:
-            return ''.join(values)
-        else:
-            return values
+            return self.data.text()
+
+        # Get values in data array
+        return [str(pp.value) for pp in self.data
+                if type(pp) is PreprocessorValue]
 
     def delete(self):
         """ Delete entry from parent's data array.
@@ -2204,9 +6183,11 @@ class PreprocessorEntry:
         if tag is None:
             return
 
-        for child in self.data:
-            if (child.which == "entry" and child.tag == tag):
-                self.data.remove(child)
+        # Find entries first, the data array can't change while iterating
+        children = list(self.data.find(tag))
+
+        for child in children:
+            self.data.remove(child)
 
     def to_value(self, val):
         """ Convert the current entry to a value.
@@ -2216,10 +6197,9 @@ class PreprocessorEntry:
         by val.
         """
 
-        # Get current index and replace it with new PreprocessorValue object
-        idx = self.parent.data.index(self)
+        # Replace entry with new PreprocessorValue object
         pp_val = PreprocessorValue(value=val)
-        self.parent.data[idx] = pp_val
+        self.parent.data.replace(self, pp_val)
 
         # Update parent pointer in new pp_val object
         pp_val.parent = self.parent
@@ -2228,7 +6208,7 @@ class PreprocessorEntry:
         return "in element \"{}\", line {}"\
                 "".format(self.parent.tag, self.elem._start_line_number)
 
-class PreprocessorValue:
+class PreprocessorValue(object):
     """ This is the preprocess value class.
 
     The preprocess value object is used by the PresentationPreprocessor
@@ -2241,6 +6221,8 @@ class PreprocessorValue:
     # Used to differentiate PreprocessorEntry and PreprocessorValue objects
     which = "value"
 
+    __slots__ = ("value", "parent", "_pos")
+
     def __init__(self, parent=None, value=None):
         """ Initialize new PreprocessorValue object.
 
@@ -2259,12 +6241,11 @@ class PreprocessorValue:
 
         """
 
-        if value:
-            self.value = value
+        self.value = value
+        self.parent = parent
 
         # Add entry to end of data array for parent
         if parent:
-            self.parent = parent
             parent.data.append(self)
 
     def __repr__(self):
@@ -2311,68 +6292,47 @@ class LineNumberingParser(ET.XMLParser):
 def format_whitespace(string):
     """ Fix whitespace formatting of multi-line string
 
-    Find the smallest indent whitespace over all lines and remove this
-    from every line. Also remove a newline at the beginning and end of
-    a string.
+    Find the smallest indent whitespace (spaces and tabs) over all lines
+    and remove this from every line. Also remove a newline at the beginning
+    and end of a string.
+
+    Each line is only scanned once to find its indent and once to remove
+    it, and the lines are joined at the end.
 
     """
-    prev_str = None
 
-    my_str = string.splitlines()
+    lines = string.splitlines()
 
     # Don't do anything if this is only a single line
-    if len(my_str) < 2:
+    if len(lines) < 2:
         return string
 
-    # Find smallest leading whitespace
-    for line in my_str:
-        if (line.strip() == ""):
-            continue
-
-        cur_str = ""
-
-        for c in line:
-            if c == " " or c == "/t":
-                cur_str += c
-            else:
-                break
-
-        # Update prev_str to be smallest leading whitespace
-        if not prev_str or len(cur_str) < len(prev_str):
-            prev_str = cur_str
+    # Find smallest leading whitespace of the lines that aren't blank
+    indents = [len(line) - len(line.lstrip(" \t")) for line in lines
+            if line.strip() != ""]
+    indent = min(indents) if len(indents) > 0 else 0
 
-    # Create formatted string
-    ret = ""
-    for i,line in enumerate(my_str):
-
-        # Remove empty lines at beginning and end of string
+    # Remove empty lines at beginning and end of string
+    last = len(lines) - 1
+    ret = []
+    for i,line in enumerate(lines):
         if (line.strip() == ""):
-            if (i == 0):
+            if (i == 0 or i == last):
                 continue
-            elif (i == len(my_str) -1):
+
+            # Skip blank lines until the first line with text
+            if (len(ret) == 0 and line == ""):
                 continue
 
-        # Remove leading prev_string from each line
+        # Remove leading whitespace from each line
         else:
-            line = line.replace(prev_str,"",1)
-
-        # Concat lines together
-        if (ret != ""):
-            ret = ret + "\n"
-        ret = ret + line
-
-    return ret
-
-
-
-
-
-
-            
-            
+            line = line[indent:]
 
+        ret.append(line)
 
+    return "\n".join(ret)
 
 
-# Run program
-main()
+# Run program (guarded so worker processes can import this file)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import importlib.util
+import pathlib
+import subprocess
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+SCRIPT = ROOT / "pptx-creator.py"
+
+# Run pptx-creator.py with the python XML parser, which records the line
+# numbers of the input elements (see the top of pptx-creator.py)
+RUN = """
+import runpy
+import sys
+
+sys.modules["_elementtree"] = None
+sys.argv = {argv!r}
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+def run(args, python_args=()):
+    # Run pptx-creator.py with the arguments from the root of the repository,
+    # returns the completed process
+    return subprocess.run([sys.executable] + list(python_args) + ["-c",
+            RUN.format(argv=[str(SCRIPT)] + list(args))], cwd=str(ROOT),
+            capture_output=True, text=True, check=True)
+
+def create(slides, tmp, args=()):
+    # Create a presentation from the slides with the blank template, returns
+    # the presentation and the output of pptx-creator.py
+    from pptx import Presentation
+
+    path_input = pathlib.Path(tmp, "input.xml")
+    path_input.write_text('<?xml version="1.0"?>\n<presentation>{}'\
+            '</presentation>\n'.format(slides))
+
+    output = str(pathlib.Path(tmp, "output.pptx"))
+    result = run(["-t", "test/templates/blank", "-o", output] + list(args) +
+            [str(path_input)])
+
+    return Presentation(output), result.stdout
+
+def load():
+    # Load pptx-creator.py as a module (its name isn't a valid module name)
+    if "pptx_creator" not in sys.modules:
+        spec = importlib.util.spec_from_file_location("pptx_creator",
+                str(SCRIPT))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules["pptx_creator"] = module
+
+    return sys.modules["pptx_creator"]
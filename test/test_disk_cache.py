@@ -0,0 +1,139 @@
+import datetime
+import os
+import pathlib
+import tempfile
+import unittest
+import zlib
+
+from helpers import load, run
+
+pptx_creator = load()
+DiskCache = pptx_creator.DiskCache
+
+class Emu(int):
+    # Subclass of int, as the lengths of python-pptx
+    pass
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmp.name, "cache")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add_entries(self, cache, num, size):
+        # Add num entries of size bytes, from least to most recently used,
+        # returns their keys
+        keys = ["key{}".format(i) for i in range(num)]
+        for i,key in enumerate(keys):
+            cache.set("imports", key, bytes(size))
+            os.utime(str(cache._entry_path("imports", key)), (1000 + i,
+                1000 + i))
+
+        return keys
+
+    # Data of built-in types is stored with marshal as is
+    def test_encode(self):
+        data = [("a", 1, 2.5, None, True), {"b": [b"c"]}]
+
+        blob = DiskCache.encode(data)
+
+        self.assertEqual(zlib.decompress(blob)[:1], b"M")
+        self.assertEqual(DiskCache.decode(blob), data)
+
+    # Dates, times and durations are stored as tagged tuples and restored,
+    # subclasses of built-in types are stored as the built-in type
+    def test_encode_dates(self):
+        data = [(datetime.datetime(2020, 1, 2, 3, 4, 5),
+                datetime.date(2020, 1, 2)), {"t": datetime.time(3, 4, 5)},
+                [datetime.timedelta(days=1, seconds=2, microseconds=3),
+                    Emu(914400)], ("plain", "tuple", "x")]
+
+        blob = DiskCache.encode(data)
+        decoded = DiskCache.decode(blob)
+
+        self.assertEqual(zlib.decompress(blob)[:1], b"T")
+        self.assertEqual(decoded, data)
+        self.assertIs(type(decoded[0][0]), datetime.datetime)
+        self.assertIs(type(decoded[0][1]), datetime.date)
+        self.assertIs(type(decoded[2][1]), int)
+
+    # Entries that weren't written by encode() aren't loaded
+    def test_decode_invalid(self):
+        self.assertIsNone(DiskCache.decode(b"invalid"))
+        self.assertIsNone(DiskCache.decode(zlib.compress(b"P" +
+            b"\x80\x04N.")))
+
+        with self.assertRaises(ValueError):
+            DiskCache.encode([object()])
+
+    # Least recently used entries are removed when the cache is too large,
+    # getting an entry makes it the most recently used
+    def test_prune(self):
+        cache = DiskCache(self.path)
+        keys = self.add_entries(cache, 5, 100)
+        cache.get("imports", keys[0])
+
+        cache.max_size = 350
+        cache.set("imports", "new", bytes(100))
+
+        self.assertEqual([key for key in keys + ["new"]
+            if cache.has("imports", key)], [keys[0], keys[4], "new"])
+        self.assertEqual(cache.size, 300)
+        self.assertEqual(cache.stats(), {"imports": (3, 300)})
+
+    # Replacing an entry only counts its new size
+    def test_replace_size(self):
+        cache = DiskCache(self.path, max_size=1000)
+        cache.set("imports", "key", bytes(400))
+        cache.set("imports", "key", bytes(600))
+
+        self.assertEqual(cache.size, 600)
+        self.assertTrue(cache.has("imports", "key"))
+
+    # --cache-prune removes the least recently used entries until the
+    # cache is smaller than --cache-size
+    def test_cache_prune(self):
+        keys = self.add_entries(DiskCache(self.path), 5, 400)
+
+        run(["--cache-dir", str(self.path), "--cache-size", "0.001",
+            "--cache-prune"])
+
+        cache = DiskCache(self.path)
+        self.assertEqual([key for key in keys if cache.has("imports", key)],
+                keys[3:])
+
+    # Parsed data is loaded from the disk cache by later builds until the
+    # modification time or size of the file changes
+    def test_stale(self):
+        filename = pathlib.Path(self.tmp.name, "data.csv")
+        filename.write_text("a,b\n")
+        os.utime(str(filename), (1000, 1000))
+
+        def build():
+            # Get the parsed data of the file in a new build
+            import_cache = pptx_creator.ImportCache(DiskCache(self.path))
+            data = import_cache.get(str(filename), "csv",
+                    lambda f: pathlib.Path(f).read_text().split(","),
+                    persist=True)
+
+            return data, import_cache.disk_hits, import_cache.misses
+
+        self.assertEqual(build(), (["a", "b\n"], 0, 1))
+        self.assertEqual(build(), (["a", "b\n"], 1, 0))
+
+        # Same size, new modification time
+        filename.write_text("c,d\n")
+        os.utime(str(filename), (2000, 2000))
+        self.assertEqual(build(), (["c", "d\n"], 0, 1))
+        self.assertEqual(build(), (["c", "d\n"], 1, 0))
+
+        # Same modification time, new size
+        filename.write_text("e,fg\n")
+        os.utime(str(filename), (2000, 2000))
+        self.assertEqual(build(), (["e", "fg\n"], 0, 1))
+        self.assertEqual(build(), (["e", "fg\n"], 1, 0))
+
+if __name__ == "__main__":
+    unittest.main()
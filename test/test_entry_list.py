@@ -0,0 +1,141 @@
+import unittest
+
+from helpers import load
+
+pptx_creator = load()
+
+def entry_list(num):
+    # Parent entry with num child entries "e0".."e{num-1}", returns the
+    # parent and the children
+    parent = pptx_creator.PreprocessorEntry("parent")
+    children = [pptx_creator.PreprocessorEntry("e{}".format(i), parent=parent)
+            for i in range(num)]
+
+    return parent, children
+
+class TestEntryList(unittest.TestCase):
+    # Every item stores its slot in the list
+    def test_pos(self):
+        parent, children = entry_list(5)
+
+        self.assertEqual([child._pos for child in children], list(range(5)))
+        self.assertEqual(list(parent.data), children)
+
+    # Removing an item only empties its slot, the other items keep their
+    # slots and the empty slot is skipped by iteration, len and reversed
+    def test_remove(self):
+        parent, children = entry_list(5)
+
+        parent.data.remove(children[1])
+        children[3].delete()
+
+        self.assertEqual([child._pos for child in children], list(range(5)))
+        self.assertEqual(list(parent.data), [children[0], children[2],
+            children[4]])
+        self.assertEqual(list(reversed(parent.data)), [children[4],
+            children[2], children[0]])
+        self.assertEqual(len(parent.data), 3)
+
+        # Indexing compacts the list first
+        self.assertIs(parent.data[1], children[2])
+        self.assertEqual([child._pos for child in parent.data], [0, 1, 2])
+
+    # Items that aren't in the list can't be removed or replaced
+    def test_not_in_list(self):
+        parent, children = entry_list(3)
+        other = pptx_creator.PreprocessorEntry("other")
+        other._pos = 1
+
+        children[1].delete()
+        with self.assertRaises(ValueError):
+            parent.data.remove(children[1])
+        with self.assertRaises(ValueError):
+            parent.data.replace(other, pptx_creator.PreprocessorValue(
+                value="x"))
+
+    # The list is compacted once more than half of its slots are empty
+    def test_compact(self):
+        parent, children = entry_list(20)
+
+        for child in children[:10]:
+            child.delete()
+        self.assertEqual(list.__len__(parent.data), 20)
+
+        children[10].delete()
+        self.assertEqual(list.__len__(parent.data), 9)
+        self.assertEqual([child._pos for child in parent.data],
+                list(range(9)))
+        self.assertEqual(list(parent.data), children[11:])
+
+    # Replacing an item puts the new item in its slot
+    def test_replace(self):
+        parent, children = entry_list(3)
+
+        children[1].to_value("x")
+        value = list(parent.data)[1]
+
+        self.assertIsInstance(value, pptx_creator.PreprocessorValue)
+        self.assertEqual(value._pos, 1)
+        self.assertIs(value.parent, parent)
+        self.assertEqual(len(parent.data), 3)
+
+    # Inserting an item renumbers the following items
+    def test_insert(self):
+        parent, children = entry_list(4)
+        children[0].delete()
+
+        entry = pptx_creator.PreprocessorEntry("new")
+        parent.data.insert(1, entry)
+
+        self.assertEqual(list(parent.data), [children[1], entry,
+            children[2], children[3]])
+        self.assertEqual([child._pos for child in parent.data],
+                list(range(4)))
+
+    # The tag index is rebuilt after every change of the list
+    def test_find(self):
+        parent, children = entry_list(3)
+        children[2].tag = "e0"
+
+        self.assertEqual(parent.data.find("e0"), [children[0], children[2]])
+
+        entry = pptx_creator.PreprocessorEntry("e0", parent=parent)
+        self.assertEqual(parent.data.find("e0"), [children[0], children[2],
+            entry])
+
+        first = pptx_creator.PreprocessorEntry("e0")
+        parent.data.insert(0, first)
+        self.assertEqual(parent.data.find("e0"), [first, children[0],
+            children[2], entry])
+
+        children[0].delete()
+        self.assertEqual(parent.data.find("e0"), [first, children[2],
+            entry])
+
+        children[2].to_value("x")
+        self.assertEqual(parent.data.find("e0"), [first, entry])
+
+        entry.tag = "e1"
+        self.assertEqual(parent.data.find("e0"), [first])
+        self.assertEqual(parent.data.find("e1"), [children[1], entry])
+
+    # The joined text is rebuilt after every change of the list
+    def test_text(self):
+        parent, children = entry_list(2)
+
+        self.assertEqual(parent.get_values(join=True), "")
+
+        parent.add_value("a")
+        self.assertEqual(parent.get_values(join=True), "a")
+
+        parent.data.insert(0, pptx_creator.PreprocessorValue(value="b"))
+        self.assertEqual(parent.get_values(join=True), "ba")
+
+        children[0].to_value("c")
+        self.assertEqual(parent.get_values(join=True), "bca")
+
+        parent.data.remove(list(parent.data)[0])
+        self.assertEqual(parent.get_values(join=True), "ca")
+
+if __name__ == "__main__":
+    unittest.main()
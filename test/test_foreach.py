@@ -0,0 +1,73 @@
+import csv
+import tempfile
+import unittest
+
+from helpers import ROOT, create
+
+CSV = ROOT / "test" / "instrument_types.csv"
+
+# Slides of a foreach over instrument_types.csv, with each column read
+# through both its letter and number variable
+FOREACH = """
+  <foreach var="inst" col="a-b" {attrib}>
+    {spec}{csv}
+    <slide layout="1content">
+      <title><get var="inst.a"/>/<get var="inst.1"/></title>
+      <content><get var="inst.b"/>/<get var="inst.2"/></content>
+    </slide>
+  </foreach>
+"""
+
+def instruments():
+    # Rows of instrument_types.csv without the header
+    with open(str(CSV), newline="") as f:
+        return list(csv.reader(f))[1:]
+
+def slide_text(prs):
+    # Title and content text of each slide
+    return [(slide.shapes.title.text, slide.placeholders[1].text_frame.text)
+            for slide in prs.slides]
+
+def expected_text(rows):
+    return [("{0}/{0}".format(row[0]), "{0}/{0}".format(row[1]))
+            for row in rows]
+
+class TestForeach(unittest.TestCase):
+    def build(self, attrib="", spec=""):
+        # Build the foreach deck normally and with --stream, which must give
+        # the same slides, returns the text of the slides
+        texts = []
+        for args in ((), ("--stream",)):
+            with tempfile.TemporaryDirectory() as tmp:
+                prs = create(FOREACH.format(attrib=attrib, spec=spec,
+                        csv=CSV), tmp, args)[0]
+                texts.append(slide_text(prs))
+
+        self.assertEqual(texts[0], texts[1])
+        return texts[0]
+
+    # One slide is created for each row of the row spec, in the order of the
+    # spec, with the column letter and number variables set to the cells
+    def test_rows(self):
+        rows = instruments()
+
+        self.assertEqual(self.build(attrib='row="5-7,2"'),
+                expected_text(rows[3:6] + rows[0:1]))
+
+    # Without a row spec every row of the file is read
+    def test_all_rows(self):
+        texts = self.build()
+
+        self.assertEqual(texts[1:], expected_text(instruments()))
+        self.assertEqual(texts[0], ("Instrument/Instrument", "Type/Type"))
+
+    # Regular expression row keys only create slides for the matching rows
+    def test_row_key(self):
+        rows = [row for row in instruments()
+                if row[1] in ("Brass", "Percussion")]
+
+        self.assertEqual(self.build(spec='<row_key col="b" re="1">'\
+                'Brass|Percussion</row_key>'), expected_text(rows))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import csv
+import pathlib
+import tempfile
+import unittest
+
+from helpers import load
+
+pptx_creator = load()
+
+# Rows of the test spreadsheet: a header and parts with repeated types
+ROWS = [["Part", "Type", "Price"]] + [["P{}".format(i),
+        ["Bolt", "Nut", "Washer"][i % 3], str(i)] for i in range(1, 31)]
+
+class TestImportKeys(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = str(pathlib.Path(self.tmp.name, "parts.csv"))
+
+        with open(self.filename, "w", newline="") as f:
+            csv.writer(f).writerows(ROWS)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, cache=None, row=None, col="a-c", row_key=None,
+            key_col=None, is_re=False):
+        # Read an import of the test spreadsheet, returns the rows of the
+        # import and the values of the cells
+        importer = pptx_creator.ImportCSV(self.filename,
+                entry=pptx_creator.PreprocessorEntry("import"), cache=cache)
+        if row is not None:
+            importer.add_row(row)
+        importer.add_col(col)
+        if row_key is not None:
+            importer.add_row_key(row_key, col=key_col, is_re=is_re)
+
+        data = importer.read()
+
+        return importer.rows, [[cell.get_values(join=True) for cell in row]
+            for row in data]
+
+    def expected(self, rows, cols=(1, 2, 3)):
+        return [[ROWS[r-1][c-1] for c in cols] for r in rows]
+
+    # Exact key without a row spec returns the matching rows in file order
+    def test_exact_key(self):
+        rows, values = self.read(row_key="Nut", key_col="b")
+
+        self.assertEqual(rows, list(range(2, 32, 3)))
+        self.assertEqual(values, self.expected(rows))
+
+    # Exact key searches every column when no key column is set
+    def test_exact_key_all_cols(self):
+        rows, values = self.read(row_key="P7")
+
+        self.assertEqual(rows, [8])
+        self.assertEqual(values, self.expected([8]))
+
+    # Exact key with a row spec only returns the matching rows of the spec,
+    # in the order of the spec
+    def test_exact_key_rows(self):
+        rows, values = self.read(row="13,5-12", row_key="Bolt", key_col="b")
+
+        self.assertEqual(rows, [13, 7, 10])
+        self.assertEqual(values, self.expected([13, 7, 10]))
+
+    # Regular expression keys give the same rows as the index
+    def test_re_key(self):
+        rows = self.read(row_key="Washer", key_col="b")[0]
+        re_rows = self.read(row_key="Wash.*", key_col="b", is_re=True)[0]
+
+        self.assertEqual(re_rows, rows)
+
+    # Keys without a match raise KeyError
+    def test_no_match(self):
+        with self.assertRaises(KeyError):
+            self.read(row_key="Screw", key_col="b")
+
+    # Keyed imports of streamed files, read alone or with the other imports
+    # of the file, give the same data as when the file is loaded whole
+    def test_streamed(self):
+        expected = self.read(row_key="Nut", key_col="b")
+
+        cache = pptx_creator.ImportCache()
+        cache.stream_size = 0
+        self.assertEqual(self.read(cache=cache, row_key="Nut", key_col="b"),
+                expected)
+
+        cache = pptx_creator.ImportCache()
+        cache.stream_size = 0
+        importers = []
+        for key in ("Nut", "Bolt"):
+            importer = pptx_creator.ImportCSV(self.filename, cache=cache)
+            importer.add_col("a-c")
+            importer.add_row_key(key, col="b")
+            importers.append(importer)
+
+        pptx_creator.ImportSpreadsheet.read_shared(importers)
+        self.assertEqual(self.read(cache=cache, row_key="Nut", key_col="b"),
+                expected)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import pathlib
+import re
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from helpers import SCRIPT, run
+
+# Run --help and print the heavy modules that were imported
+CHECK = """
+import runpy
+import sys
+
+sys.argv = [{script!r}, "--help"]
+try:
+    runpy.run_path({script!r}, run_name="__main__")
+except SystemExit:
+    pass
+
+print("imported:" + ",".join(name for name in ("pptx", "openpyxl", "PIL")
+        if name in sys.modules))
+"""
+
+# Line of -X importtime output: self and cumulative time and the module name
+# (indented by nesting level)
+IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+def import_times(stderr):
+    # Total cumulative import time in microseconds and the names of the
+    # imported modules of the -X importtime output
+    total = 0
+    modules = set()
+    for line in stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match is None:
+            continue
+
+        modules.add(match.group(4))
+
+        # Nested imports are included in the time of their top level import
+        if len(match.group(3)) == 0:
+            total += int(match.group(2))
+
+    return total, modules
+
+def eager_import_time():
+    # Import time of python-pptx and openpyxl imported eagerly, as
+    # pptx-creator.py did before they were imported where they are used
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c",
+            "import pptx, openpyxl"], capture_output=True, text=True,
+            check=True)
+
+    return import_times(result.stderr)[0]
+
+class TestLazyImports(unittest.TestCase):
+    # --help must not import python-pptx, openpyxl or pillow
+    def test_help(self):
+        result = subprocess.run([sys.executable, "-c",
+                CHECK.format(script=str(SCRIPT))], capture_output=True,
+                text=True, check=True)
+
+        imported = result.stdout.splitlines()[-1][len("imported:"):]
+        self.assertEqual(imported, "", "imported by --help: " + imported)
+
+    # --help doesn't pay for the heavy imports: its whole import time is
+    # below the time of only importing python-pptx and openpyxl eagerly,
+    # measured on the same machine
+    def test_help_import_time(self):
+        total, modules = import_times(run(["--help"],
+                python_args=["-X", "importtime"]).stderr)
+        eager = eager_import_time()
+
+        self.assertTrue(modules.isdisjoint({"pptx", "openpyxl", "PIL"}))
+        self.assertLess(total, eager, "--help import time {} us is not "\
+                "below the eager import time {} us".format(total, eager))
+
+    # A deck with only csv imports must not import openpyxl
+    def test_csv_deck_imports(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            modules = import_times(run(["-t", "test/templates/blank", "-o",
+                    str(pathlib.Path(tmp, "example.pptx")),
+                    "test/example_paginate.xml"],
+                    python_args=["-X", "importtime"]).stderr)[1]
+
+        self.assertIn("pptx", modules)
+        self.assertNotIn("openpyxl", modules)
+
+if __name__ == "__main__":
+    unittest.main()
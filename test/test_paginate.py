@@ -0,0 +1,97 @@
+import tempfile
+import unittest
+
+from helpers import ROOT, create
+
+CSV = ROOT / "test" / "instrument_types.csv"
+
+# Slide with a table of the 38 rows of instrument_types.csv followed by a
+# row that is wider than the imported rows
+TABLE = """
+  <slide layout="1content">
+    <title>Instrument Types</title>
+    <content type="table">
+      {setting}
+      <import col="a-b">{csv}</import>
+      <row><cell>x</cell><cell>y</cell><cell>z</cell></row>
+    </content>
+  </slide>
+"""
+
+# Slide with a paginated table and a second table with an import that
+# fails, which is on every continuation slide
+INVALID = """
+  <slide layout="2content">
+    <title>Instrument Types</title>
+    <content0 type="table">
+      <setting>
+        <paginate rows="10" repeat_header="1"/>
+      </setting>
+      <import col="a-b">{csv}</import>
+    </content0>
+    <content1 type="table">
+      <row>
+        <import col="a" row="500">{csv}</import>
+      </row>
+    </content1>
+  </slide>
+"""
+
+def tables(prs):
+    # Tables of each slide of a presentation
+    return [[shape.table for shape in slide.shapes if shape.has_table]
+            for slide in prs.slides]
+
+class TestPaginate(unittest.TestCase):
+    # Every page of a paginated table has the number of columns of the
+    # table when it isn't paginated
+    def test_num_col(self):
+        for args in ((), ("--stream",)):
+            with tempfile.TemporaryDirectory() as tmp:
+                prs = create(TABLE.format(setting="", csv=CSV), tmp,
+                        args)[0]
+                num_col = len(tables(prs)[0][0].columns)
+
+                prs = create(TABLE.format(setting='<setting><paginate '\
+                        'rows="10" repeat_header="1"/></setting>', csv=CSV),
+                        tmp, args)[0]
+
+            self.assertEqual(num_col, 3)
+            self.assertEqual(len(prs.slides), 5)
+            for slide_tables in tables(prs):
+                self.assertEqual([len(table.columns)
+                    for table in slide_tables], [num_col])
+
+    # The other placeholders are filled once and copied to the continuation
+    # slides, so the errors of their imports are only reported once
+    def test_errors(self):
+        for args in ((), ("--stream",)):
+            with tempfile.TemporaryDirectory() as tmp:
+                prs, stdout = create(INVALID.format(csv=CSV), tmp, args)
+
+            self.assertEqual(stdout.count('row "500": index out of range'),
+                    1)
+            self.assertEqual(stdout.count("column number mismatch"), 1)
+
+            self.assertEqual(len(prs.slides), 5)
+            for slide in prs.slides:
+                self.assertEqual(slide.shapes.title.text, "Instrument Types")
+                self.assertEqual(len([shape for shape in slide.shapes
+                    if shape.has_table]), 2)
+
+    # Incremental builds reuse slides with their continuation slides
+    def test_incremental(self):
+        slides = TABLE.format(setting='<setting><paginate rows="10" '\
+                'repeat_header="1"/></setting>', csv=CSV)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            create(slides, tmp, ["-i"])
+            prs, stdout = create(slides, tmp, ["-i"])
+
+        self.assertIn("Reused 1 of 1 slides", stdout)
+        self.assertEqual(len(prs.slides), 5)
+        self.assertEqual([len(slide_tables[0].rows)
+            for slide_tables in tables(prs)], [10, 10, 10, 10, 3])
+
+if __name__ == "__main__":
+    unittest.main()
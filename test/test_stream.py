@@ -0,0 +1,71 @@
+import tempfile
+import unittest
+
+from helpers import ROOT, create
+
+CSV = ROOT / "test" / "instrument_types.csv"
+
+# Slides with links to slides that come before and after them, to the slide
+# itself and to a website, and a paginated table whose continuation slides
+# have copies of the links of the other placeholder
+SLIDES = """
+  <slide label="first" layout="1content">
+    <title>First</title>
+    <content>
+      <item><link ref="last">To the last slide</link></item>
+      <item><link addr="www.example.com">Example</link></item>
+      <item><link ref="first">This slide</link></item>
+    </content>
+  </slide>
+  <slide label="types" layout="2content">
+    <title>Types</title>
+    <content0 type="table">
+      <setting><paginate rows="10" repeat_header="1"/></setting>
+      <import col="a-b">{csv}</import>
+    </content0>
+    <content1>
+      <item><link ref="last">To the last slide</link></item>
+      <item><link addr="www.example.org">Example</link></item>
+      <item><link ref="first">Back to the first slide</link></item>
+    </content1>
+  </slide>
+  <slide label="last" layout="1content">
+    <title>Last</title>
+    <content>
+      <item><link ref="first">Back to the first slide</link></item>
+      <item><link ref="types">Back to the types</link></item>
+      <item><link addr="www.example.com">Example</link></item>
+    </content>
+  </slide>
+"""
+
+def slide_parts(prs):
+    # XML and relationships (id, type and target) of each slide
+    return [(str(slide.part.partname), slide._element.xml,
+        sorted((rId, rel.reltype, rel.target_ref if rel.is_external else
+            str(rel.target_part.partname))
+            for rId,rel in slide.part.rels.items()))
+        for slide in prs.slides]
+
+class TestStream(unittest.TestCase):
+    # Streamed slides have the same XML and relationships as the slides of
+    # the normal build, including links to slides that come later
+    def test_same_slides(self):
+        parts = []
+        for args in ((), ("--stream",)):
+            with tempfile.TemporaryDirectory() as tmp:
+                prs = create(SLIDES.format(csv=CSV), tmp, args)[0]
+                parts.append(slide_parts(prs))
+
+        self.assertEqual(len(parts[0]), 7)
+        for normal, streamed in zip(*parts):
+            self.assertEqual(normal, streamed)
+
+        # The slides before the last slide (including the continuation
+        # slides) link to it
+        for name, xml, rels in parts[1][:-1]:
+            self.assertIn("/ppt/slides/slide7.xml", [rel[2] for rel in rels
+                if rel[1].endswith("/slide")])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import pathlib
+import tempfile
+import unittest
+
+from helpers import run
+
+# Weights of test/example_table_weights.xml, which don't divide the size of
+# the placeholder evenly
+COL_WEIGHTS = [3, 1, 2.5, 1, 7]
+ROW_WEIGHTS = [2, 1, 3]
+
+def old_table_sizes(prs, ph, num_row, num_col):
+    # Get column widths and row heights of a table created with
+    # shapes.add_table() at the placeholder ph and sized by setting the
+    # width and height of each column and row, as tables were created before
+    # their XML was written at once
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    prs_table = slide.shapes.add_table(num_row, num_col, ph.left, ph.top,
+            ph.width, ph.height).table
+
+    col_weights = [COL_WEIGHTS[i] if i < len(COL_WEIGHTS) else 1
+            for i in range(num_col)]
+    tot_width = sum(col.width for col in prs_table.columns)
+    for i,col in enumerate(prs_table.columns):
+        col.width = int(tot_width * col_weights[i] / sum(col_weights))
+
+    row_weights = [ROW_WEIGHTS[i] if i < len(ROW_WEIGHTS) else 1
+            for i in range(num_row)]
+    tot_height = sum(row.height for row in prs_table.rows)
+    for i,row in enumerate(prs_table.rows):
+        row.height = int(tot_height * row_weights[i] / sum(row_weights))
+
+    return ([col.width for col in prs_table.columns],
+            [row.height for row in prs_table.rows])
+
+class TestTableSizes(unittest.TestCase):
+    # Columns and rows with weights have the same size as when the table
+    # was created and sized through python-pptx
+    def test_weights(self):
+        from pptx import Presentation
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output = str(pathlib.Path(tmp, "example.pptx"))
+            run(["-t", "test/templates/blank", "-o", output,
+                    "test/example_table_weights.xml"])
+
+            prs = Presentation(output)
+
+        shapes = [shape for shape in prs.slides[0].shapes if shape.has_table]
+        self.assertEqual(len(shapes), 1)
+
+        # Content placeholder of the 1content layout of the template
+        ph = prs.slide_layouts[1].placeholders[1]
+
+        shape = shapes[0]
+        num_row = len(shape.table.rows)
+        num_col = len(shape.table.columns)
+        col_widths, row_heights = old_table_sizes(prs, ph, num_row, num_col)
+
+        self.assertEqual([col.width for col in shape.table.columns],
+                col_widths)
+        self.assertEqual([row.height for row in shape.table.rows],
+                row_heights)
+        self.assertEqual(shape.width, sum(col_widths))
+        self.assertEqual(shape.height, sum(row_heights))
+
+if __name__ == "__main__":
+    unittest.main()
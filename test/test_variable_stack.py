@@ -0,0 +1,81 @@
+import unittest
+
+from helpers import load
+
+pptx_creator = load()
+
+class TestVariableStack(unittest.TestCase):
+    def setUp(self):
+        self.stack = pptx_creator.VariableStack()
+
+    # A variable set in a scope is seen by its sub-scopes until it is set
+    # again in a sub-scope, and the sub-scope value is removed on pop
+    def test_scopes(self):
+        self.stack.set("a", "1")
+        self.stack.push()
+        self.assertEqual(self.stack.get("a"), "1")
+
+        self.stack.push()
+        self.stack.set("a", "2")
+        self.assertEqual(self.stack.get("a"), "2")
+        self.assertEqual(self.stack.variables["a"], [(0, "1"), (2, "2")])
+
+        self.stack.pop()
+        self.assertEqual(self.stack.get("a"), "1")
+        self.assertEqual(self.stack.variables["a"], [(0, "1")])
+
+    # A variable set again in the same scope is overwritten
+    def test_overwrite(self):
+        self.stack.push()
+        self.stack.set("a", "1")
+        self.stack.set("a", "2")
+
+        self.assertEqual(self.stack.variables["a"], [(1, "2")])
+        self.assertEqual(self.stack.scopes, [(1, ["a"])])
+
+        self.stack.pop()
+        self.assertNotIn("a", self.stack.variables)
+        self.assertEqual(self.stack.scopes, [])
+
+    # Variables defined only in a scope are removed when it is popped
+    def test_pop(self):
+        self.stack.push()
+        self.stack.set("a", "1")
+        self.stack.set("b", "2")
+        self.stack.push()
+        self.stack.push()
+        self.stack.set("c", "3")
+
+        self.stack.pop()
+        self.assertNotIn("c", self.stack.variables)
+        self.stack.pop()
+        self.assertEqual(self.stack.get("b"), "2")
+        self.stack.pop()
+
+        self.assertEqual(self.stack.depth, 0)
+        self.assertEqual(self.stack.variables, {})
+        for var in ("a", "b", "c"):
+            with self.assertRaises(ValueError):
+                self.stack.get(var)
+
+    # mod changes the closest definition, which is kept after the sub-scope
+    # is popped
+    def test_mod(self):
+        self.stack.set("a", "1")
+        self.stack.push()
+        self.stack.set("a", "2")
+        self.stack.push()
+
+        self.stack.mod("a", "3")
+        self.stack.pop()
+        self.assertEqual(self.stack.get("a"), "3")
+
+        self.stack.pop()
+        self.stack.mod("a", "4")
+        self.assertEqual(self.stack.get("a"), "4")
+
+        with self.assertRaises(ValueError):
+            self.stack.mod("b", "1")
+
+if __name__ == "__main__":
+    unittest.main()